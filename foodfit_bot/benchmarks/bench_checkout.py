@@ -0,0 +1,167 @@
+"""
+Замер оформления заказа: прежняя последовательность запросов против
+checkout_cart (INSERT ... SELECT, сумма в SQL, ключ идемпотентности).
+
+checkout_cart медленнее прежнего оформления и не должен его обгонять:
+кроме заказа и позиций он пишет ключ идемпотентности, событие статуса
+и дневные агрегаты продаж, и почти все время уходит на коммит. Замер на
+5000 заказов по 3 позиции: без пула 14.2k заказов/с против 8.2k, через
+пул (32 оформления) 5.8k против 4.9k. Выигрыш — атомарность и защита от
+двойного нажатия, а не пропускная способность.
+
+Запуск: python -m foodfit_bot.benchmarks.bench_checkout --orders 20000
+"""
+import argparse
+import asyncio
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from foodfit_bot.benchmarks.common import print_table, seed, summarize, temp_db_path
+from foodfit_bot.config.database import Database, create_tables
+from foodfit_bot.config.migrations import run_migrations
+from foodfit_bot.services.database_service import checkout_cart
+
+
+def legacy_checkout(conn: sqlite3.Connection, user_id: int, order_date: str) -> int:
+    """Оформление в том виде, как его делал checkout_handler до изменений"""
+    items = conn.execute('''
+        SELECT c.dish_id, m.price, c.quantity
+        FROM cart c JOIN menu m ON c.dish_id = m.dish_id
+        WHERE c.user_id = ?''', (user_id,)).fetchall()
+    total = sum(price * quantity for _, price, quantity in items)
+    order_id = conn.execute(
+        "INSERT INTO orders (user_id, order_date, total_amount, status) VALUES (?, ?, ?, ?)",
+        (user_id, order_date, total, 'принят')).lastrowid
+    for dish_id, price, quantity in items:
+        conn.execute(
+            "INSERT INTO order_items (order_id, dish_id, quantity, price) VALUES (?, ?, ?, ?)",
+            (order_id, dish_id, quantity, price))
+    conn.execute("DELETE FROM cart WHERE user_id = ?", (user_id,))
+    return order_id
+
+
+def fill_carts(conn: sqlite3.Connection, users: int, dishes: int, per_cart: int) -> None:
+    """Кладет в корзину каждого пользователя per_cart разных блюд"""
+    rnd = random.Random(11)
+    conn.executemany(
+        """INSERT INTO cart (user_id, dish_id, quantity) VALUES (?, ?, ?)
+        ON CONFLICT(user_id, dish_id) DO UPDATE SET quantity = excluded.quantity""",
+        ((user_id, dish_id, rnd.randint(1, 3))
+         for user_id in range(1, users + 1)
+         for dish_id in rnd.sample(range(1, dishes + 1), per_cart)))
+    conn.commit()
+
+
+def run_checkouts(conn: sqlite3.Connection, users: int, checkout) -> tuple:
+    """Оформляет по заказу на каждого пользователя, коммит на каждый заказ"""
+    samples = []
+    order_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    started = time.perf_counter()
+    for user_id in range(1, users + 1):
+        t = time.perf_counter()
+        checkout(conn, user_id, order_date)
+        conn.commit()
+        samples.append((time.perf_counter() - t) * 1000)
+    return users / (time.perf_counter() - started), summarize(samples)
+
+
+async def run_handler_path(database: Database, users: int, concurrency: int, legacy: bool) -> float:
+    """
+    Оформление так, как его выполняет обработчик: через пул потоков Database,
+    concurrency пользователей одновременно
+    :return: Заказов в секунду
+    """
+    order_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(user_id: int):
+        async with semaphore:
+            if legacy:
+                # Прежний обработчик: чтение корзины и запись заказа — два обращения к пулу
+                await database.fetchall('''
+                    SELECT c.dish_id, m.name, m.price, c.quantity, m.calories
+                    FROM cart c JOIN menu m ON c.dish_id = m.dish_id
+                    WHERE c.user_id = ?''', (user_id,))
+                await database.run(lambda conn: legacy_checkout(conn, user_id, order_date))
+            else:
+                await database.run(
+                    lambda conn: checkout_cart(conn, user_id, order_date, f"handler:{user_id}"))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(user_id) for user_id in range(1, users + 1)))
+    return users / (time.perf_counter() - started)
+
+
+def double_click(database: Database, user_id: int, clicks: int) -> int:
+    """Параллельно оформляет одну корзину с одним ключом, возвращает число заказов"""
+    order_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    barrier = threading.Barrier(clicks)
+
+    def click():
+        conn = database.connect()
+        barrier.wait()
+        checkout_cart(conn, user_id, order_date, f"checkout:{user_id}:1")
+        conn.commit()
+        conn.close()
+
+    threads = [threading.Thread(target=click) for _ in range(clicks)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    conn = database.connect()
+    count = conn.execute(
+        "SELECT COUNT(*) FROM orders WHERE idempotency_key = ?", (f"checkout:{user_id}:1",)).fetchone()[0]
+    conn.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=20_000, help="заказов на сценарий")
+    parser.add_argument("--dishes", type=int, default=500)
+    parser.add_argument("--per-cart", type=int, default=3)
+    parser.add_argument("--clicks", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    database = Database(temp_db_path())
+    conn = database.connect()
+    conn.execute("PRAGMA journal_mode = WAL")
+    create_tables(conn)
+    run_migrations(conn)
+    seed(conn, args.orders, args.dishes, orders=0)
+
+    def keyed_checkout(c: sqlite3.Connection, user_id: int, date: str):
+        return checkout_cart(c, user_id, date, f"bench:{user_id}")
+
+    results, rates = {}, {}
+    for name, checkout in (
+            ('по одной позиции, сумма в Python', legacy_checkout),
+            ('checkout_cart (INSERT ... SELECT)', keyed_checkout)):
+        fill_carts(conn, args.orders, args.dishes, args.per_cart)
+        rates[name], results[name] = run_checkouts(conn, args.orders, checkout)
+
+    print_table(f"Оформление заказа, мс ({args.orders} заказов по {args.per_cart} позиции)", results)
+    for name, rate in rates.items():
+        print(f"{name:<40}{rate:>10.0f} заказов/с")
+
+    print(f"\nЧерез пул Database, {args.concurrency} одновременных оформлений")
+    for name, legacy in (('прежний обработчик', True), ('checkout_cart', False)):
+        fill_carts(conn, args.orders, args.dishes, args.per_cart)
+        rate = asyncio.run(run_handler_path(database, args.orders, args.concurrency, legacy))
+        print(f"{name:<40}{rate:>10.0f} заказов/с")
+
+    fill_carts(conn, 1, args.dishes, args.per_cart)
+    conn.close()
+    created = double_click(database, 1, args.clicks)
+    print(f"\n{args.clicks} параллельных нажатий с одним ключом -> заказов: {created}")
+    database.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Замер выгрузки заказов: скорость (позиций в секунду), размер файла и
+пик памяти Python при потоковой записи CSV.gz и XLSX. Пик памяти
+снимается отдельным прогоном: tracemalloc замедляет выгрузку в разы.
+
+Запуск: python -m foodfit_bot.benchmarks.bench_export --orders 1000000
+"""
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from foodfit_bot.benchmarks.common import seed, temp_db_path
+from foodfit_bot.config.database import Database, create_tables
+from foodfit_bot.config.migrations import run_migrations
+from foodfit_bot.services.export import FORMAT_CSV, FORMAT_XLSX, OrderExporter
+
+
+def export_once(exporter: OrderExporter, date_from: str, date_to: str, fmt: str) -> dict:
+    started = time.perf_counter()
+    result = asyncio.run(exporter.export(date_from, date_to, fmt))
+    seconds = time.perf_counter() - started
+    os.remove(result['path'])
+
+    tracemalloc.start()
+    result = asyncio.run(exporter.export(date_from, date_to, fmt))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    os.remove(result['path'])
+    return {'rows': result['rows'], 'seconds': seconds, 'size': result['size'], 'peak': peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--dishes", type=int, default=300)
+    args = parser.parse_args()
+
+    database = Database(temp_db_path())
+    conn = database.connect()
+    create_tables(conn)
+    run_migrations(conn)
+    seed(conn, args.users, args.dishes, args.orders)
+    conn.close()
+
+    # Заказы в seed идут раз в 30 секунд начиная с 2024-01-01
+    first = datetime(2024, 1, 1)
+    last = first + timedelta(seconds=args.orders * 30)
+    exporter = OrderExporter(database)
+
+    print(f"{'период':>10} {'формат':>7} {'позиций':>10} {'с':>7} {'позиций/с':>10} {'МБ':>7} {'пик МБ':>7}")
+    for days in (30, (last - first).days + 1):
+        date_to = last.strftime("%Y-%m-%d")
+        date_from = (last - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        for fmt in (FORMAT_CSV, FORMAT_XLSX):
+            r = export_once(exporter, date_from, date_to, fmt)
+            print(f"{days:>7} дн. {fmt:>7} {r['rows']:>10} {r['seconds']:>7.1f} "
+                  f"{r['rows'] / r['seconds']:>10.0f} {r['size'] / 1024 / 1024:>7.1f} "
+                  f"{r['peak'] / 1024 / 1024:>7.2f}")
+
+    database.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Нагрузочный прогон обработчиков: Dispatcher из setup_routers, Bot API
+заменен FakeBotSession, БД — временная копия со сгенерированным меню.
+
+Каждая сессия — сценарий пользователя (старт, меню, добавление в
+корзину, корзина, оформление) и персонала (доска заказов, заказ
+готовится, заказ завершен). Сессии идут параллельно по --concurrency,
+шаги внутри сессии — по порядку. Для каждого шага считается время
+обработки обновления и время, проведенное в ожидании БД.
+
+Запуск: python -m foodfit_bot.benchmarks.bench_handlers --sessions 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import contextvars
+import itertools
+import random
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiogram import Bot, Dispatcher
+
+from foodfit_bot.benchmarks.common import print_table, seed, summarize, temp_db_path
+from foodfit_bot.benchmarks.fake_api import fake_bot
+from foodfit_bot.benchmarks.fake_updates import callback_update, message_update
+from foodfit_bot.config.database import db, init_db
+from foodfit_bot.handlers import setup_routers
+from foodfit_bot.services.cart_buffer import cart_buffer
+from foodfit_bot.services.order_board import order_board
+
+STAFF_USER_OFFSET = 10_000_000
+
+# Время ожидания БД внутри текущего обновления
+_db_time: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar("db_time", default=None)
+
+
+def instrument_db() -> Callable[[], None]:
+    """
+    Засекает время вызовов db.run и db.write_run (через них идут все запросы)
+    :return: Функция, возвращающая исходные методы
+    """
+    original_run, original_write_run = db.run, db.write_run
+
+    def timed(method):
+        async def wrapper(func):
+            started = time.perf_counter()
+            try:
+                return await method(func)
+            finally:
+                spent = _db_time.get()
+                if spent is not None:
+                    spent[0] += time.perf_counter() - started
+        return wrapper
+
+    db.run, db.write_run = timed(original_run), timed(original_write_run)
+
+    def restore():
+        db.run, db.write_run = original_run, original_write_run
+    return restore
+
+
+class Replayer:
+    """Отправляет обновления в диспетчер и собирает замеры по шагам"""
+
+    def __init__(self, dp: Dispatcher, bot: Bot):
+        self.dp = dp
+        self.bot = bot
+        self.latency: Dict[str, List[float]] = defaultdict(list)
+        self.db_time: Dict[str, List[float]] = defaultdict(list)
+        self.errors = 0
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    async def feed(self, step: str, data: Dict[str, Any]) -> None:
+        spent = [0.0]
+        token = _db_time.set(spent)
+        started = time.perf_counter()
+        try:
+            await self.dp.feed_raw_update(self.bot, data)
+        except Exception:
+            self.errors += 1
+        finally:
+            _db_time.reset(token)
+        self.latency[step].append((time.perf_counter() - started) * 1000)
+        self.db_time[step].append(spent[0] * 1000)
+
+    async def text(self, step: str, user_id: int, text: str) -> None:
+        await self.feed(step, message_update(next(self._update_ids), user_id, text, next(self._message_ids)))
+
+    async def press(self, step: str, user_id: int, data: str) -> None:
+        await self.feed(step, callback_update(next(self._update_ids), user_id, data, next(self._message_ids)))
+
+
+async def session(replayer: Replayer, user_id: int, dishes: int, rnd: random.Random) -> None:
+    """Сценарий клиента и персонала для одного заказа"""
+    first, second = rnd.sample(range(1, dishes + 1), 2)
+    await replayer.text("/start", user_id, "/start")
+    await replayer.text("меню", user_id, "🍽 Меню")
+    await replayer.press("страница меню", user_id, "menu_page_2")
+    await replayer.press("в корзину", user_id, f"cart_{first}")
+    await replayer.press("в корзину", user_id, f"cart_{second}")
+    await replayer.press("количество +1", user_id, f"increase_{first}")
+    await replayer.text("корзина", user_id, "🛒 Корзина")
+    await replayer.press("оформление", user_id, "checkout")
+
+    order_id = await db.fetchval("SELECT MAX(order_id) FROM orders WHERE user_id = ?", (user_id,))
+    if order_id is None:
+        return
+    staff_id = STAFF_USER_OFFSET + user_id % 10
+    await replayer.text("персонал: доска", staff_id, "📊 Открытые заказы")
+    await replayer.press("персонал: готовится", staff_id, f"cooking_order_{order_id}")
+    await replayer.press("персонал: завершен", staff_id, f"complete_order_{order_id}")
+
+
+async def run(sessions: int, concurrency: int, dishes: int, api_ms: float) -> Tuple[Replayer, float, Dict]:
+    bot = fake_bot(api_ms)
+    dp = Dispatcher()
+    dp.include_router(setup_routers())
+    await order_board.start(bot)
+    restore = instrument_db()
+    semaphore = asyncio.Semaphore(concurrency)
+    replayer = Replayer(dp, bot)
+    rnd = random.Random(5)
+
+    async def one(user_id: int):
+        async with semaphore:
+            await session(replayer, user_id, dishes, rnd)
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(user_id) for user_id in range(1, sessions + 1)))
+    finally:
+        elapsed = time.perf_counter() - started
+        restore()
+        await cart_buffer.close()
+        await order_board.stop()
+    return replayer, elapsed, dict(bot.session.calls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--dishes", type=int, default=200)
+    parser.add_argument("--api-ms", type=float, default=30, help="задержка фейкового Bot API")
+    args = parser.parse_args()
+
+    db.path = temp_db_path()
+    init_db()
+    conn = db.connect()
+    seed(conn, users=0, dishes=args.dishes, orders=0)
+    conn.close()
+
+    replayer, elapsed, calls = asyncio.run(run(args.sessions, args.concurrency, args.dishes, args.api_ms))
+    db.close()
+
+    all_latency = [value for values in replayer.latency.values() for value in values]
+    all_db = [value for values in replayer.db_time.values() for value in values]
+    title = (f"{args.sessions} сессий, параллельно {args.concurrency}, "
+             f"Bot API {args.api_ms} мс")
+    print_table(f"Обработка обновления, мс — {title}",
+                {**{step: summarize(values) for step, values in replayer.latency.items()},
+                 'все обновления': summarize(all_latency)})
+    print_table("Ожидание БД внутри обновления, мс",
+                {**{step: summarize(values) for step, values in replayer.db_time.items()},
+                 'все обновления': summarize(all_db)})
+
+    print(f"\nОбновлений: {len(all_latency)} за {elapsed:.2f} с ({len(all_latency) / elapsed:.0f}/с), "
+          f"ошибок: {replayer.errors}")
+    print(f"Вызовы Bot API: {sum(calls.values())} ({sum(calls.values()) / args.sessions:.1f} на сессию)")
+    for method, count in sorted(calls.items(), key=lambda item: -item[1]):
+        print(f"  {method:<28}{count:>8}")
+
+
+if __name__ == "__main__":
+    main()
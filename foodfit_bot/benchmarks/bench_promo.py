@@ -0,0 +1,138 @@
+"""
+Замер оформления заказа с акциями: задержка checkout_cart при 0..N
+активных акций (снимок PromoSet из памяти) против перебора всех акций
+из таблицы promos на каждом оформлении.
+
+Запуск: python -m foodfit_bot.benchmarks.bench_promo --orders 5000
+"""
+import argparse
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from foodfit_bot.benchmarks.bench_checkout import fill_carts
+from foodfit_bot.benchmarks.common import print_table, seed, summarize, temp_db_path
+from foodfit_bot.config.database import Database, create_tables
+from foodfit_bot.config.migrations import run_migrations
+from foodfit_bot.services.database_service import checkout_cart
+from foodfit_bot.services.promo import (
+    PROMO_COLUMNS, PROMO_DISH, PROMO_FIXED, PROMO_KINDS, PROMO_PERCENT, CompiledPromo, PromoEngine, PromoSet
+)
+
+
+def create_promos(conn: sqlite3.Connection, count: int, dishes: int) -> None:
+    """Создает count акций всех видов; у части есть код, окно по времени или условие"""
+    rnd = random.Random(7)
+    now = datetime.now()
+    conn.execute("DELETE FROM promos")
+    rows = []
+    for i in range(count):
+        kind = rnd.choice(list(PROMO_KINDS))
+        value = rnd.randint(100, 500) if kind == PROMO_FIXED else rnd.randint(5, 40)
+        hours = (rnd.randint(0, 22), None) if rnd.random() < 0.3 else (None, None)
+        if hours[0] is not None:
+            hours = (hours[0], hours[0] + 1)
+        rows.append((
+            f"CODE{i}" if rnd.random() < 0.5 else None, kind, value,
+            rnd.randint(1, dishes) if kind == PROMO_DISH else None,
+            rnd.choice((0, 0, 1000, 3000)), int(rnd.random() < 0.2),
+            (now - timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S") if rnd.random() < 0.3 else None,
+            (now + timedelta(days=rnd.choice((-2, 3)))).strftime("%Y-%m-%d %H:%M:%S") if rnd.random() < 0.3 else None,
+            hours[0], hours[1]))
+    conn.executemany(
+        f"INSERT INTO promos ({', '.join(PROMO_COLUMNS[1:])}) VALUES ({', '.join('?' * (len(PROMO_COLUMNS) - 1))})",
+        rows)
+    conn.commit()
+
+
+def naive_discount(conn: sqlite3.Connection, order_id: int, user_id: int, order_date: str) -> None:
+    """Скидка перебором: все акции и позиции заказа читаются и проверяются заново"""
+    promos = conn.execute(
+        f"SELECT {', '.join(PROMO_COLUMNS)} FROM promos WHERE active = 1").fetchall()
+    lines = conn.execute(
+        "SELECT dish_id, quantity, price FROM order_items WHERE order_id = ?", (order_id,)).fetchall()
+    subtotal = sum(quantity * price for _, quantity, price in lines)
+    hour = int(order_date[11:13])
+    best, best_id = 0, None
+    for row in promos:
+        promo = dict(zip(PROMO_COLUMNS, row))
+        if promo['code'] is not None:
+            continue
+        if promo['starts_at'] and order_date < promo['starts_at']:
+            continue
+        if promo['ends_at'] and order_date > promo['ends_at']:
+            continue
+        if promo['hour_from'] is not None and not promo['hour_from'] <= hour < promo['hour_to']:
+            continue
+        if subtotal < promo['min_total']:
+            continue
+        if promo['first_order'] and conn.execute(
+                "SELECT EXISTS (SELECT 1 FROM orders WHERE user_id = ? AND order_id != ?)",
+                (user_id, order_id)).fetchone()[0]:
+            continue
+        if promo['kind'] == PROMO_PERCENT:
+            discount = subtotal * promo['value'] // 100
+        elif promo['kind'] == PROMO_FIXED:
+            discount = min(promo['value'], subtotal)
+        else:
+            discount = sum(q * p for d, q, p in lines if d == promo['dish_id']) * promo['value'] // 100
+        if discount > best:
+            best, best_id = discount, promo['promo_id']
+    if best:
+        conn.execute("UPDATE orders SET total_amount = total_amount - ?, discount = ?, promo_id = ? WHERE order_id = ?",
+                     (best, best, best_id, order_id))
+
+
+def run_checkouts(conn: sqlite3.Connection, users: int, checkout) -> dict:
+    samples = []
+    order_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for user_id in range(1, users + 1):
+        started = time.perf_counter()
+        checkout(conn, user_id, order_date)
+        conn.commit()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=5000, help="заказов на сценарий")
+    parser.add_argument("--dishes", type=int, default=300)
+    parser.add_argument("--per-cart", type=int, default=4)
+    args = parser.parse_args()
+
+    database = Database(temp_db_path())
+    conn = database.connect()
+    create_tables(conn)
+    run_migrations(conn)
+    seed(conn, args.orders, args.dishes, orders=0)
+
+    results = {}
+    for count in (0, 100, 500, 2000):
+        create_promos(conn, count, args.dishes)
+        promos = PromoSet([CompiledPromo(dict(zip(PROMO_COLUMNS, row))) for row in PromoEngine._load(conn)])
+
+        def compiled(c: sqlite3.Connection, user_id: int, date: str, count=count):
+            return checkout_cart(c, user_id, date, f"promo:{count}:{user_id}", promos, f"CODE{user_id % 50}")
+
+        def naive(c: sqlite3.Connection, user_id: int, date: str, count=count):
+            order = checkout_cart(c, user_id, date, f"naive:{count}:{user_id}")
+            naive_discount(c, order['order_id'], user_id, date)
+
+        fill_carts(conn, args.orders, args.dishes, args.per_cart)
+        results[f"{count} акций: снимок в памяти"] = run_checkouts(conn, args.orders, compiled)
+        fill_carts(conn, args.orders, args.dishes, args.per_cart)
+        results[f"{count} акций: перебор из БД"] = run_checkouts(conn, args.orders, naive)
+        discounted = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(discount), 0) FROM orders WHERE idempotency_key LIKE ? AND discount > 0",
+            (f"promo:{count}:%",)).fetchone()
+        print(f"{count} акций: со скидкой {discounted[0]} заказов, скидок на {discounted[1]}₽")
+
+    print_table(f"Оформление заказа с акциями, мс ({args.orders} заказов по {args.per_cart} позиции)", results)
+    conn.close()
+    database.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Замер горячих запросов до и после миграций схемы.
+
+Запуск: python -m foodfit_bot.benchmarks.bench_queries --orders 1000000
+"""
+import argparse
+import random
+import sqlite3
+import time
+
+from foodfit_bot.benchmarks.common import measure, print_table, seed, temp_db_path
+from foodfit_bot.config.database import Database, create_tables
+from foodfit_bot.config.migrations import run_migrations
+
+
+def hot_queries(conn: sqlite3.Connection, users: int, dishes: int, orders: int) -> dict:
+    """Запросы из DatabaseService, которые выполняются на каждое действие пользователя"""
+    rnd = random.Random(7)
+    return {
+        'get_cart_contents': lambda: conn.execute('''
+            SELECT c.dish_id, m.name, m.price, c.quantity, m.calories
+            FROM cart c JOIN menu m ON c.dish_id = m.dish_id
+            WHERE c.user_id = ?''', (rnd.randint(1, users),)).fetchall(),
+        'cart lookup (user_id, dish_id)': lambda: conn.execute(
+            "SELECT quantity FROM cart WHERE user_id = ? AND dish_id = ?",
+            (rnd.randint(1, users), rnd.randint(1, dishes))).fetchone(),
+        'get_user_orders': lambda: conn.execute('''
+            SELECT order_id, order_date, total_amount, status FROM orders
+            WHERE user_id = ? ORDER BY order_date DESC LIMIT 5''',
+            (rnd.randint(1, users),)).fetchall(),
+        'get_order_details items': lambda: conn.execute('''
+            SELECT m.name, oi.quantity, oi.price FROM order_items oi
+            JOIN menu m ON oi.dish_id = m.dish_id WHERE oi.order_id = ?''',
+            (rnd.randint(1, orders),)).fetchall(),
+        'get_active_orders': lambda: conn.execute('''
+            SELECT o.order_id, u.full_name, o.order_date, o.total_amount, o.status
+            FROM orders o JOIN users u ON o.user_id = u.user_id
+            WHERE o.status IN ('принят', 'готовится', 'в доставке')
+            ORDER BY o.order_date DESC''').fetchall(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--dishes", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    database = Database(temp_db_path())
+    conn = database.connect()
+    create_tables(conn)
+
+    started = time.perf_counter()
+    seed(conn, args.users, args.dishes, args.orders, cart_rows=args.users)
+    print(f"Данные: {args.orders} заказов, {args.users} пользователей "
+          f"({time.perf_counter() - started:.1f} c)")
+
+    queries = hot_queries(conn, args.users, args.dishes, args.orders)
+    before = {name: measure(func, args.repeat) for name, func in queries.items()}
+    print_table("Без индексов, мс", before)
+
+    started = time.perf_counter()
+    version = run_migrations(conn)
+    print(f"\nМиграции до версии {version}: {time.perf_counter() - started:.1f} c")
+
+    after = {name: measure(func, args.repeat) for name, func in queries.items()}
+    print_table("После миграций, мс", after)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Замер поиска блюд: триграммный индекс против LIKE-сканирования.
+
+Запуск: python -m foodfit_bot.benchmarks.bench_search --dishes 50000
+"""
+import argparse
+import random
+import time
+
+from foodfit_bot.benchmarks.common import measure, print_table, seed, temp_db_path
+from foodfit_bot.config.database import Database, create_tables
+from foodfit_bot.services.catalog import DishRecord
+from foodfit_bot.services.search_service import DishSearchIndex
+
+BASES = ["Борщ", "Салат", "Суп", "Паста", "Стейк", "Котлета", "Плов", "Рагу", "Омлет", "Боул",
+         "Ризотто", "Шашлык", "Пельмени", "Вареники", "Сырники", "Окрошка", "Солянка", "Гуляш"]
+DETAILS = ["с курицей", "с говядиной", "с лососем", "с грибами", "с тыквой", "с киноа", "с фетой",
+           "с ёжиками", "по-домашнему", "острый", "с авокадо", "с креветками", "с индейкой"]
+ROOTS = ["томат", "базилик", "сливк", "соус", "гриль", "чеснок", "зелен", "пармезан", "кунжут",
+         "имбир", "лайм", "перц", "сметан", "укроп", "лук", "морков", "свекл", "капуст", "орех",
+         "мед", "горчиц", "лимон", "тимьян", "розмарин", "брынз", "моцарелл", "шпинат", "рукол",
+         "огурц", "редис", "фасол", "нут", "чечевиц", "гречк", "рис", "булгур", "кинз", "петрушк"]
+ENDINGS = ["ом", "ами", "ой", "ный", "ная", "ное", "ах"]
+WORDS = [root + ending for root in ROOTS for ending in ENDINGS]
+TAGS = ["веган", "острое", "мясо", "без глютена", "рыба", "десерт", ""]
+
+
+def make_records(count: int, rnd: random.Random):
+    records = []
+    for dish_id in range(1, count + 1):
+        name = f"{rnd.choice(BASES)} {rnd.choice(DETAILS)} №{dish_id}"
+        description = " ".join(rnd.choice(WORDS) for _ in range(10))
+        records.append(DishRecord(dish_id, name, description, rnd.randint(150, 1200),
+                                  rnd.randint(100, 900), rnd.choice(TAGS), None))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dishes", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    rnd = random.Random(1)
+    records = make_records(args.dishes, rnd)
+
+    index = DishSearchIndex(source=None)
+    started = time.perf_counter()
+    index.build(records)
+    print(f"Индекс на {args.dishes} блюд построен за {time.perf_counter() - started:.2f} c")
+
+    database = Database(temp_db_path())
+    conn = database.connect()
+    create_tables(conn)
+    seed(conn, users=1, dishes=0, orders=0)
+    conn.executemany(
+        "INSERT INTO menu (dish_id, name, description, calories, price, tags) VALUES (?, ?, ?, ?, ?, ?)",
+        ((r.dish_id, r.name, r.description, r.calories, r.price, r.tags) for r in records))
+    conn.commit()
+
+    queries = {
+        'точное название "котлета"': "котлета",
+        'опечатка "катлета"': "катлета",
+        'регистр "БОРЩ"': "БОРЩ",
+        'ё/е "ежиками"': "ежиками",
+        'описание "пармезан"': "пармезан",
+        'два слова "салат лосось"': "салат лосось",
+    }
+
+    rows = {}
+    for title, text in queries.items():
+        rows[f"index: {title}"] = measure(lambda: index.query(text), args.repeat)
+        rows[f"LIKE:  {title}"] = measure(lambda: conn.execute(
+            "SELECT dish_id, name, price, calories FROM menu WHERE name LIKE ? LIMIT 20",
+            (f"%{text}%",)).fetchall(), args.repeat)
+    print_table("Время запроса, мс", rows)
+
+    print("\nНайдено (index / LIKE):")
+    for title, text in queries.items():
+        like_found = conn.execute(
+            "SELECT COUNT(*) FROM (SELECT 1 FROM menu WHERE name LIKE ? LIMIT 20)",
+            (f"%{text}%",)).fetchone()[0]
+        print(f"  {title:<36}{len(index.query(text)):>6}{like_found:>6}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
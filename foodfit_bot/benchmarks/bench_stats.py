@@ -0,0 +1,84 @@
+"""
+Замер отчета о продажах: агрегация по orders/order_items за период
+против чтения дневных агрегатов daily_sales/daily_dish_sales.
+
+Запуск: python -m foodfit_bot.benchmarks.bench_stats --orders 1000000
+"""
+import argparse
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from foodfit_bot.benchmarks.common import measure, print_table, seed, temp_db_path
+from foodfit_bot.config.database import Database, create_tables
+from foodfit_bot.config.migrations import run_migrations
+from foodfit_bot.services.sales_stats import TOP_DISHES, read_report, rebuild_rollups
+
+
+def scan_report(conn: sqlite3.Connection, date_from: str, date_to: str) -> dict:
+    """Тот же отчет прямой агрегацией по заказам"""
+    start, end = f"{date_from} 00:00:00", f"{date_to} 23:59:59"
+    orders, revenue = conn.execute('''
+        SELECT COUNT(*), COALESCE(SUM(total_amount), 0) FROM orders
+        WHERE order_date BETWEEN ? AND ? AND status_code != 4
+    ''', (start, end)).fetchone()
+    items, calories = conn.execute('''
+        SELECT COALESCE(SUM(oi.quantity), 0), COALESCE(SUM(oi.quantity * COALESCE(oi.calories, 0)), 0)
+        FROM orders o JOIN order_items oi ON oi.order_id = o.order_id
+        WHERE o.order_date BETWEEN ? AND ? AND o.status_code != 4
+    ''', (start, end)).fetchone()
+    top = conn.execute('''
+        SELECT oi.dish_id, SUM(oi.quantity) AS quantity
+        FROM orders o JOIN order_items oi ON oi.order_id = o.order_id
+        WHERE o.order_date BETWEEN ? AND ? AND o.status_code != 4
+        GROUP BY oi.dish_id ORDER BY quantity DESC, oi.dish_id LIMIT ?
+    ''', (start, end, TOP_DISHES)).fetchall()
+    return {'orders': orders, 'revenue': revenue, 'items': items, 'calories': calories,
+            'top': [tuple(row) for row in top]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--dishes", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    database = Database(temp_db_path())
+    conn = database.connect()
+    create_tables(conn)
+    run_migrations(conn)
+    seed(conn, args.users, args.dishes, args.orders)
+
+    started = time.perf_counter()
+    rebuild_rollups(conn)
+    conn.commit()
+    print(f"Пересчет агрегатов по {args.orders} заказам: {time.perf_counter() - started:.2f} с")
+
+    # Заказы в seed идут раз в 30 секунд начиная с 2024-01-01
+    first = datetime(2024, 1, 1)
+    last = first + timedelta(seconds=args.orders * 30)
+    results = {}
+    for days in (1, 30, 90, (last - first).days + 1):
+        date_to = last.strftime("%Y-%m-%d")
+        date_from = (last - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+
+        rollup = read_report(conn, date_from, date_to)
+        scan = scan_report(conn, date_from, date_to)
+        assert (rollup['orders'], rollup['revenue'], rollup['items'], rollup['calories']) == \
+               (scan['orders'], scan['revenue'], scan['items'], scan['calories']), (rollup, scan)
+        assert [(d['dish_id'], d['quantity']) for d in rollup['top_dishes']] == scan['top']
+
+        results[f"{days} дн.: order_items"] = measure(
+            lambda: scan_report(conn, date_from, date_to), max(1, args.repeat // 4))
+        results[f"{days} дн.: дневные агрегаты"] = measure(
+            lambda: read_report(conn, date_from, date_to), args.repeat)
+
+    print_table(f"Отчет о продажах, мс ({args.orders} заказов)", results)
+    conn.close()
+    database.close()
+
+
+if __name__ == "__main__":
+    main()
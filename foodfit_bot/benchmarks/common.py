@@ -0,0 +1,107 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+ACTIVE_STATUSES = ('принят', 'готовится', 'в доставке')
+
+
+def temp_db_path(name: str = "bench.db") -> str:
+    """Возвращает путь к БД во временном каталоге"""
+    return os.path.join(tempfile.mkdtemp(prefix="foodfit-bench-"), name)
+
+
+def seed(conn: sqlite3.Connection, users: int, dishes: int, orders: int,
+         cart_rows: int = 0, active_share: float = 0.0005, seed_value: int = 42) -> None:
+    """
+    Заполняет БД синтетическими данными
+    :param conn: Соединение с БД со созданной схемой
+    :param orders: Количество заказов (в каждом 1-3 позиции)
+    :param active_share: Доля заказов в активных статусах
+    """
+    rnd = random.Random(seed_value)
+    start = datetime(2024, 1, 1)
+
+    conn.executemany(
+        "INSERT INTO users (user_id, username, full_name, registration_date) VALUES (?, ?, ?, ?)",
+        ((i, f"user{i}", f"Пользователь {i}", start.strftime("%Y-%m-%d %H:%M:%S"))
+         for i in range(1, users + 1)))
+    conn.executemany(
+        "INSERT INTO menu (dish_id, name, description, calories, price, tags) VALUES (?, ?, ?, ?, ?, ?)",
+        ((i, f"Блюдо {i}", f"Описание блюда {i}", rnd.randint(100, 900),
+          rnd.randint(150, 1200), rnd.choice(["веган", "острое", "мясо", "без глютена", ""]))
+         for i in range(1, dishes + 1)))
+
+    def order_rows():
+        for order_id in range(1, orders + 1):
+            status = rnd.choice(ACTIVE_STATUSES) if rnd.random() < active_share else 'завершен'
+            date = start + timedelta(seconds=order_id * 30)
+            yield (order_id, rnd.randint(1, users), date.strftime("%Y-%m-%d %H:%M:%S"),
+                   rnd.randint(300, 5000), status)
+
+    def item_rows():
+        for order_id in range(1, orders + 1):
+            for _ in range(rnd.randint(1, 3)):
+                yield (order_id, rnd.randint(1, dishes), rnd.randint(1, 3), rnd.randint(150, 1200))
+
+    conn.executemany(
+        "INSERT INTO orders (order_id, user_id, order_date, total_amount, status) VALUES (?, ?, ?, ?, ?)",
+        order_rows())
+    conn.executemany(
+        "INSERT INTO order_items (order_id, dish_id, quantity, price) VALUES (?, ?, ?, ?)",
+        item_rows())
+    # С миграции 19 позиции хранят калории на момент оформления
+    if 'calories' in {row[1] for row in conn.execute("PRAGMA table_info(order_items)")}:
+        conn.execute('''
+            UPDATE order_items SET calories = (
+                SELECT m.calories FROM menu m WHERE m.dish_id = order_items.dish_id)
+        ''')
+
+    pairs = {(rnd.randint(1, users), rnd.randint(1, dishes)) for _ in range(cart_rows)}
+    conn.executemany(
+        "INSERT INTO cart (user_id, dish_id, quantity) VALUES (?, ?, 1)",
+        ((u, d) for u, d in pairs))
+    conn.commit()
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """
+    Замеряет время вызова func
+    :return: Среднее, p50, p95 и p99 в миллисекундах
+    """
+    samples: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Считает перцентили по выборке в миллисекундах"""
+    if not samples:
+        return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+    return {
+        'mean': statistics.fmean(ordered),
+        'p50': pct(0.50),
+        'p95': pct(0.95),
+        'p99': pct(0.99)
+    }
+
+
+def print_table(title: str, rows: Dict[str, Dict[str, float]]) -> None:
+    """Печатает результаты замеров таблицей"""
+    print(f"\n{title}")
+    print(f"{'сценарий':<40}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, stats in rows.items():
+        print(f"{name:<40}{stats['mean']:>10.3f}{stats['p50']:>10.3f}"
+              f"{stats['p95']:>10.3f}{stats['p99']:>10.3f}")
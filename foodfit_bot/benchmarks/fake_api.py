@@ -0,0 +1,76 @@
+"""
+Локальная заглушка Bot API для нагрузочных замеров.
+
+FakeBotSession подменяет HTTP-сессию aiogram: запросы не уходят в
+Telegram, а считаются по методам и получают правдоподобный ответ
+после задержки, имитирующей сеть.
+"""
+import asyncio
+import itertools
+import time
+from collections import Counter
+from typing import Any, AsyncGenerator, Dict, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import TelegramMethod
+from aiogram.types import Message, User
+
+FAKE_TOKEN = "123456:FAKE-TOKEN-FOR-LOCAL-TESTS"
+FAKE_BOT_ID = 123456
+
+# Методы, которые возвращают отправленное или измененное сообщение
+MESSAGE_METHODS = {
+    'sendMessage', 'sendPhoto', 'sendDocument', 'editMessageText',
+    'editMessageCaption', 'editMessageMedia', 'editMessageReplyMarkup'
+}
+
+
+class FakeBotSession(BaseSession):
+    """Сессия aiogram без сети: считает вызовы и отвечает заглушками"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        super().__init__()
+        self.latency = latency_ms / 1000
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(1_000_000)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        name = method.__api_method__
+        self.calls[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if name == 'getMe':
+            return User(id=FAKE_BOT_ID, is_bot=True, first_name='FoodFit')
+        if name not in MESSAGE_METHODS:
+            return True
+
+        chat_id = getattr(method, 'chat_id', None) or 0
+        message: Dict[str, Any] = {
+            'message_id': getattr(method, 'message_id', None) or next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': FAKE_BOT_ID, 'is_bot': True, 'first_name': 'FoodFit'},
+            'text': getattr(method, 'text', None)
+        }
+        if name == 'sendPhoto':
+            message['photo'] = [{
+                'file_id': f"fake-photo-{message['message_id']}",
+                'file_unique_id': str(message['message_id']),
+                'width': 800,
+                'height': 600
+            }]
+        return Message.model_validate(message, context={'bot': bot})
+
+    async def stream_content(self, url: str, headers: Optional[Dict[str, Any]] = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+def fake_bot(latency_ms: float = 0.0) -> Bot:
+    """Бот aiogram, подключенный к FakeBotSession"""
+    return Bot(FAKE_TOKEN, session=FakeBotSession(latency_ms))
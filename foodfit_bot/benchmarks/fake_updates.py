@@ -0,0 +1,177 @@
+"""
+Генератор фейковых обновлений Telegram для проверки вебхука.
+
+По умолчанию поднимает WebhookServer в этом процессе с обработчиком,
+который имитирует ожидание сети (--handler-ms), и сравнивает число
+обработчиков очереди. С --url отправляет обновления на уже запущенный
+бот (BOT_MODE=webhook).
+
+Запуск: python -m foodfit_bot.benchmarks.fake_updates --updates 5000 --users 200
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import aiohttp
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import CallbackQuery, Message
+
+from foodfit_bot.benchmarks.fake_api import FAKE_TOKEN
+from foodfit_bot.services.webhook import SECRET_HEADER, UpdateQueue, WebhookServer
+
+# Кнопки клиентской клавиатуры и inline-кнопки меню и корзины
+MESSAGE_TEXTS = ("/start", "🍽 Меню", "🛒 Корзина", "👤 Профиль", "⚙️ Фильтры")
+CALLBACK_DATA = ("menu_page_2", "dish_detail_{dish}", "cart_{dish}", "increase_{dish}",
+                 "decrease_{dish}", "filter_vegan", "checkout")
+
+
+def _user(user_id: int) -> Dict[str, Any]:
+    return {'id': user_id, 'is_bot': False, 'first_name': f"User{user_id}", 'username': f"user{user_id}"}
+
+
+def message_update(update_id: int, user_id: int, text: str, message_id: int = 1) -> Dict[str, Any]:
+    """Обновление с текстовым сообщением в личном чате"""
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': _user(user_id),
+            'text': text
+        }
+    }
+
+
+def callback_update(update_id: int, user_id: int, data: str, message_id: int = 1) -> Dict[str, Any]:
+    """Обновление с нажатием inline-кнопки под сообщением бота"""
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id),
+            'from': _user(user_id),
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': {'id': 123456, 'is_bot': True, 'first_name': 'FoodFit'},
+                'text': 'Меню'
+            }
+        }
+    }
+
+
+def generate_updates(count: int, users: int, dishes: int = 50,
+                     callback_share: float = 0.6, seed_value: int = 7) -> Iterator[Dict[str, Any]]:
+    """
+    Поток обновлений от users пользователей: сообщения и нажатия кнопок
+    :param callback_share: Доля нажатий inline-кнопок
+    """
+    rnd = random.Random(seed_value)
+    for update_id in range(1, count + 1):
+        user_id = rnd.randint(1, users)
+        if rnd.random() < callback_share:
+            data = rnd.choice(CALLBACK_DATA).format(dish=rnd.randint(1, dishes))
+            yield callback_update(update_id, user_id, data)
+        else:
+            yield message_update(update_id, user_id, rnd.choice(MESSAGE_TEXTS), update_id)
+
+
+async def post_updates(url: str, updates: List[Dict[str, Any]], concurrency: int,
+                       secret: Optional[str] = None) -> Dict[int, int]:
+    """
+    Отправляет обновления POST-запросами, как это делает Telegram
+    :return: Количество ответов по HTTP-статусу
+    """
+    statuses: Dict[int, int] = {}
+    headers = {SECRET_HEADER: secret} if secret else {}
+    source = iter(updates)
+
+    async def sender(session: aiohttp.ClientSession):
+        for update in source:
+            async with session.post(url, json=update, headers=headers) as response:
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(sender(session) for _ in range(concurrency)))
+    return statuses
+
+
+def stub_dispatcher(handler_ms: float) -> Dispatcher:
+    """Диспетчер, обработчики которого только ждут handler_ms (запросы к API и БД)"""
+    router = Router()
+    delay = handler_ms / 1000
+
+    @router.message()
+    async def on_message(message: Message):
+        await asyncio.sleep(delay)
+
+    @router.callback_query()
+    async def on_callback(callback: CallbackQuery):
+        await asyncio.sleep(delay)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def run_local(updates: List[Dict[str, Any]], workers: int, queue_size: int,
+                    handler_ms: float, concurrency: int, port: int) -> Dict[str, Any]:
+    """Прогоняет обновления через локальный WebhookServer и ждет их обработки"""
+    bot = Bot(FAKE_TOKEN)
+    dp = stub_dispatcher(handler_ms)
+    server = WebhookServer(dp, bot, queue=UpdateQueue(dp, bot, workers=workers, size=queue_size))
+    await server.start("127.0.0.1", port)
+
+    started = time.perf_counter()
+    statuses = await post_updates(f"http://127.0.0.1:{port}{server.path}", updates, concurrency)
+    posted = time.perf_counter() - started
+    await server.stop()
+    elapsed = time.perf_counter() - started
+    await bot.session.close()
+    return {
+        'statuses': statuses,
+        'posted': posted,
+        'elapsed': elapsed,
+        'processed': server.queue.processed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64, help="одновременных POST-запросов")
+    parser.add_argument("--workers", default="1,4,16,64", help="варианты числа обработчиков")
+    parser.add_argument("--queue-size", type=int, default=1000)
+    parser.add_argument("--handler-ms", type=float, default=20)
+    parser.add_argument("--port", type=int, default=8181)
+    parser.add_argument("--url", help="адрес запущенного вебхука вместо локального сервера")
+    parser.add_argument("--secret")
+    args = parser.parse_args()
+
+    updates = list(generate_updates(args.updates, args.users))
+    if args.url:
+        started = time.perf_counter()
+        statuses = asyncio.run(post_updates(args.url, updates, args.concurrency, args.secret))
+        elapsed = time.perf_counter() - started
+        print(f"Отправлено {len(updates)} обновлений за {elapsed:.2f} с "
+              f"({len(updates) / elapsed:.0f}/с), ответы: {statuses}")
+        return
+
+    print(f"{len(updates)} обновлений от {args.users} пользователей, обработчик {args.handler_ms} мс")
+    print(f"{'обработчиков':<14}{'ответы':<24}{'прием, с':>10}{'всего, с':>10}{'обн./с':>10}")
+    for workers in (int(value) for value in args.workers.split(",")):
+        result = asyncio.run(run_local(updates, workers, args.queue_size, args.handler_ms,
+                                       args.concurrency, args.port))
+        statuses = ", ".join(f"{code}: {count}" for code, count in sorted(result['statuses'].items()))
+        print(f"{workers:<14}{statuses:<24}{result['posted']:>10.2f}{result['elapsed']:>10.2f}"
+              f"{result['processed'] / result['elapsed']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
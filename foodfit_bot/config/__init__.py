@@ -1,12 +1,14 @@
 from foodfit_bot.config.config import API_URL, API_HEADERS, ADMIN_IDS, BOT_TOKEN
-from foodfit_bot.config.database import conn, cursor, init_db
+from foodfit_bot.config.database import db, Database, init_db
+from foodfit_bot.config.migrations import run_migrations
 
 __all__ = [
     'API_URL',
     'API_HEADERS',
     'ADMIN_IDS',
     'BOT_TOKEN',
-    'conn',
-    'cursor',
-    'init_db'
-]
\ No newline at end of file
+    'db',
+    'Database',
+    'init_db',
+    'run_migrations'
+]
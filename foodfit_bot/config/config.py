@@ -11,3 +11,20 @@ API_HEADERS = {
 
 ADMIN_IDS = list(map(int, os.getenv("ADMIN_IDS", "").split(","))) if os.getenv("ADMIN_IDS") else []
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+
+# Режим отображения меню: "messages" - сообщение на каждое блюдо,
+# "single" - одна страница меню, которая редактируется при листании
+MENU_RENDER_MODE = os.getenv("MENU_RENDER_MODE", "messages")
+
+# Хранилище состояний FSM: "sqlite" - общее для всех процессов бота и
+# переживает перезапуск, "memory" - в памяти процесса
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite")
+
+# Режим получения обновлений: "polling" или "webhook" (сервер aiohttp
+# с очередью обновлений, см. services/webhook.py)
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
@@ -1,11 +1,294 @@
+import asyncio
+import os
+import queue
 import sqlite3
-from foodfit_bot.config.config import BOT_TOKEN
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
 
-conn = sqlite3.connect('foodfit.db')
-cursor = conn.cursor()
+from foodfit_bot.config.migrations import run_migrations
 
+logger = logging.getLogger(__name__)
 
-def init_db():
+DB_PATH = os.getenv("FOODFIT_DB_PATH", "foodfit.db")
+DB_POOL_SIZE = int(os.getenv("FOODFIT_DB_POOL_SIZE", "4"))
+
+# Режим хранения: WAL-журнал и групповые коммиты мелких записей
+DB_WAL_MODE = os.getenv("FOODFIT_DB_WAL", "1") == "1"
+DB_BATCH_WINDOW_MS = int(os.getenv("FOODFIT_DB_BATCH_WINDOW_MS", "5"))
+DB_BATCH_MAX_SIZE = int(os.getenv("FOODFIT_DB_BATCH_MAX_SIZE", "256"))
+
+DB_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 30000",
+)
+
+
+class WriteBatcher:
+    """Очередь записей с групповым коммитом.
+
+    Отдельный поток забирает записи из очереди, накапливает их не дольше
+    window_ms (или до max_size штук) и выполняет одной транзакцией.
+    Каждая запись выполняется в своей точке сохранения, поэтому ошибка
+    одной записи не откатывает соседние. Future записи завершается
+    только после COMMIT, то есть обработчик получает подтверждение
+    того, что данные записаны.
+    """
+
+    _STOP = object()
+
+    def __init__(self, database: "Database",
+                 window_ms: int = DB_BATCH_WINDOW_MS,
+                 max_size: int = DB_BATCH_MAX_SIZE):
+        self.database = database
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.writes = 0
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._worker,
+                    name="foodfit-db-writer",
+                    daemon=True
+                )
+                self._thread.start()
+
+    async def submit(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Ставит func(conn) в очередь и ждет коммита группы
+        :param func: Функция, принимающая соединение
+        :return: Результат func
+        """
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((func, loop, future))
+        return await future
+
+    @staticmethod
+    def _resolve(loop, future, result=None, error: Optional[BaseException] = None) -> None:
+        def _set():
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        loop.call_soon_threadsafe(_set)
+
+    def _collect(self, first) -> list:
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is self._STOP:
+                self._queue.put(item)
+                break
+            batch.append(item)
+        return batch
+
+    def _worker(self) -> None:
+        conn = self.database.connect()
+        conn.isolation_level = None
+        try:
+            while True:
+                first = self._queue.get()
+                if first is self._STOP:
+                    break
+                self._commit_batch(conn, self._collect(first))
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch: list) -> None:
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for func, loop, future in batch:
+                conn.execute("SAVEPOINT write")
+                try:
+                    results.append((func(conn), None))
+                    conn.execute("RELEASE write")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write")
+                    conn.execute("RELEASE write")
+                    results.append((None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"Ошибка группового коммита: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            results = [(None, e)] * len(batch)
+
+        self.batches += 1
+        self.writes += len(batch)
+        for (func, loop, future), (result, error) in zip(batch, results):
+            self._resolve(loop, future, result, error)
+
+    def close(self) -> None:
+        """Дописывает очередь и останавливает поток записи"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(self._STOP)
+            thread.join()
+
+
+class Database:
+    """Асинхронный слой доступа к SQLite.
+
+    Запросы выполняются в отдельном наборе потоков, у каждого потока
+    своё соединение, поэтому обработчики не блокируют event loop.
+    Курсор создаётся на каждый вызов и не разделяется между запросами.
+    """
+
+    def __init__(self, path: str = DB_PATH, pool_size: int = DB_POOL_SIZE,
+                 wal: bool = DB_WAL_MODE):
+        self.path = path
+        self.pool_size = pool_size
+        self.wal = wal
+        self.batcher: Optional[WriteBatcher] = WriteBatcher(self) if wal else None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        # Обертка для func(conn) перед выполнением, например сбор метрик запросов
+        self.tracer: Optional[Callable[[Callable], Callable]] = None
+
+    def connect(self) -> sqlite3.Connection:
+        """Открывает новое соединение с БД"""
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        if self.wal:
+            for pragma in DB_PRAGMAS:
+                conn.execute(pragma)
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        """Возвращает соединение текущего рабочего потока"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self.connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.pool_size,
+                thread_name_prefix="foodfit-db"
+            )
+        return self._executor
+
+    def _call(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        conn = self._connection()
+        try:
+            result = func(conn)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+
+    async def run(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Выполняет func(conn) в пуле потоков одной транзакцией
+        :param func: Функция, принимающая соединение
+        :return: Результат func
+        """
+        if self.tracer is not None:
+            func = self.tracer(func)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), self._call, func)
+
+    async def execute(self, sql: str, params: Sequence = ()) -> Tuple[int, Optional[int]]:
+        """Выполняет изменяющий запрос
+        :return: (rowcount, lastrowid)
+        """
+        def _execute(conn: sqlite3.Connection):
+            cur = conn.execute(sql, params)
+            return cur.rowcount, cur.lastrowid
+
+        return await self.run(_execute)
+
+    async def executemany(self, sql: str, seq_of_params: Iterable[Sequence]) -> int:
+        """Выполняет запрос для набора параметров
+        :return: Количество затронутых строк
+        """
+        rows = list(seq_of_params)
+
+        def _executemany(conn: sqlite3.Connection):
+            return conn.executemany(sql, rows).rowcount
+
+        return await self.run(_executemany)
+
+    async def write(self, sql: str, params: Sequence = ()) -> Tuple[int, Optional[int]]:
+        """Выполняет мелкую запись через очередь групповых коммитов
+        :return: (rowcount, lastrowid) после фиксации транзакции
+        """
+        def _execute(conn: sqlite3.Connection):
+            cur = conn.execute(sql, params)
+            return cur.rowcount, cur.lastrowid
+
+        return await self.write_run(_execute)
+
+    async def write_run(self, func: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Выполняет func(conn) через очередь групповых коммитов"""
+        if self.batcher is None:
+            return await self.run(func)
+        if self.tracer is not None:
+            func = self.tracer(func)
+        return await self.batcher.submit(func)
+
+    async def fetchone(self, sql: str, params: Sequence = ()) -> Optional[tuple]:
+        """Возвращает первую строку результата"""
+        return await self.run(lambda conn: conn.execute(sql, params).fetchone())
+
+    async def fetchall(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        """Возвращает все строки результата"""
+        return await self.run(lambda conn: conn.execute(sql, params).fetchall())
+
+    async def fetchval(self, sql: str, params: Sequence = (), default: Any = None) -> Any:
+        """Возвращает первое значение первой строки"""
+        row = await self.fetchone(sql, params)
+        return row[0] if row else default
+
+    def close(self) -> None:
+        """Останавливает пул и закрывает все соединения"""
+        if self.batcher is not None:
+            self.batcher.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+db = Database()
+
+
+def create_tables(conn: sqlite3.Connection) -> None:
+    """Создает базовые таблицы, если их нет"""
+    cursor = conn.cursor()
     cursor.execute('''CREATE TABLE IF NOT EXISTS users (
         user_id INTEGER PRIMARY KEY,
         username TEXT,
@@ -53,3 +336,16 @@ def init_db():
     )''')
 
     conn.commit()
+
+
+def init_db(database: Optional[Database] = None):
+    """Создает таблицы, включает WAL и применяет миграции"""
+    database = database or db
+    conn = database.connect()
+
+    if database.wal:
+        conn.execute("PRAGMA journal_mode = WAL")
+
+    create_tables(conn)
+    run_migrations(conn)
+    conn.close()
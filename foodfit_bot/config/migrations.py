@@ -0,0 +1,315 @@
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Callable, List, Tuple, Union
+
+from foodfit_bot.utils.tags import save_dish_tags
+
+logger = logging.getLogger(__name__)
+
+
+def _backfill_dish_tags(conn: sqlite3.Connection) -> None:
+    """Переносит теги из текстового поля menu.tags в dish_tags"""
+    for dish_id, tags in conn.execute("SELECT dish_id, tags FROM menu").fetchall():
+        save_dish_tags(conn, dish_id, tags)
+
+
+def _backfill_sales_rollups(conn: sqlite3.Connection) -> None:
+    """Считает дневные агрегаты продаж по уже существующим заказам"""
+    # Ленивый импорт: пакет services импортирует config.database
+    from foodfit_bot.services.sales_stats import rebuild_rollups
+    # Агрегаты читают скидку заказа (миграция 16) и калории позиций (миграция 19);
+    # на более старой схеме их посчитает миграция 19
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(order_items)")}
+    if 'calories' in columns:
+        rebuild_rollups(conn)
+
+
+def _order_item_calories(conn: sqlite3.Connection) -> None:
+    """Сохраняет калории в позициях заказов и пересчитывает по ним агрегаты"""
+    conn.execute("ALTER TABLE order_items ADD COLUMN calories INTEGER")
+    # Для старых заказов калорий на момент оформления нет — берем текущие из меню
+    conn.execute('''
+        UPDATE order_items SET calories = (
+            SELECT COALESCE(m.calories, 0) FROM menu m WHERE m.dish_id = order_items.dish_id)
+    ''')
+    _backfill_sales_rollups(conn)
+
+
+# Список миграций схемы: (версия, описание, SQL-скрипт или функция от соединения).
+# Новые миграции добавляются только в конец с увеличением версии.
+MIGRATIONS: List[Tuple[int, str, Union[str, Callable[[sqlite3.Connection], None]]]] = [
+    (1, "Индексы для корзины, заказов и меню", """
+        -- Схлопываем дубли корзины перед уникальным индексом
+        UPDATE cart SET quantity = (
+            SELECT SUM(c2.quantity) FROM cart c2
+            WHERE c2.user_id = cart.user_id AND c2.dish_id = cart.dish_id
+        )
+        WHERE cart_id IN (
+            SELECT MIN(cart_id) FROM cart GROUP BY user_id, dish_id HAVING COUNT(*) > 1
+        );
+        DELETE FROM cart WHERE cart_id NOT IN (
+            SELECT MIN(cart_id) FROM cart GROUP BY user_id, dish_id
+        );
+
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_cart_user_dish
+            ON cart(user_id, dish_id);
+        CREATE INDEX IF NOT EXISTS idx_orders_user_date
+            ON orders(user_id, order_date);
+        CREATE INDEX IF NOT EXISTS idx_orders_status_date
+            ON orders(status, order_date);
+        CREATE INDEX IF NOT EXISTS idx_order_items_order
+            ON order_items(order_id, dish_id, quantity, price);
+        CREATE INDEX IF NOT EXISTS idx_menu_name
+            ON menu(name);
+    """),
+    (2, "Кэш ответов AI", """
+        CREATE TABLE IF NOT EXISTS ai_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT,
+            response TEXT,
+            size INTEGER,
+            created_at REAL,
+            last_access REAL,
+            expires_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_ai_cache_last_access
+            ON ai_cache(last_access);
+        CREATE INDEX IF NOT EXISTS idx_ai_cache_expires
+            ON ai_cache(expires_at);
+    """),
+    (3, "Предрасчитанные предложения дня и рекомендации", """
+        CREATE TABLE IF NOT EXISTS daily_specials (
+            day TEXT PRIMARY KEY,
+            text TEXT,
+            created_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS user_recommendations (
+            user_id INTEGER,
+            day TEXT,
+            text TEXT,
+            PRIMARY KEY(user_id, day)
+        ) WITHOUT ROWID;
+    """),
+    (4, "Реестр file_id загруженных фото", """
+        CREATE TABLE IF NOT EXISTS media_files (
+            path TEXT PRIMARY KEY,
+            file_id TEXT,
+            updated_at TEXT
+        );
+    """),
+    (5, "Нормализованные теги блюд", """
+        CREATE TABLE IF NOT EXISTS tags (
+            tag_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS dish_tags (
+            dish_id INTEGER,
+            tag_id INTEGER,
+            PRIMARY KEY(dish_id, tag_id),
+            FOREIGN KEY(dish_id) REFERENCES menu(dish_id),
+            FOREIGN KEY(tag_id) REFERENCES tags(tag_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_dish_tags_tag
+            ON dish_tags(tag_id, dish_id);
+    """),
+    (6, "Перенос тегов из menu.tags", _backfill_dish_tags),
+    (7, "Ключ идемпотентности оформления заказа", """
+        ALTER TABLE orders ADD COLUMN idempotency_key TEXT;
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_idempotency
+            ON orders(idempotency_key) WHERE idempotency_key IS NOT NULL;
+    """),
+    (8, "Закрепленные доски заказов персонала", """
+        CREATE TABLE IF NOT EXISTS staff_boards (
+            chat_id INTEGER PRIMARY KEY,
+            message_id INTEGER
+        );
+    """),
+    (9, "Жизненный цикл заказа: коды статусов, события и метрики этапов", """
+        ALTER TABLE orders ADD COLUMN status_code INTEGER NOT NULL DEFAULT 0;
+        -- Активными раньше считались только эти три статуса
+        UPDATE orders SET status_code = CASE status
+            WHEN 'принят' THEN 0
+            WHEN 'готовится' THEN 1
+            WHEN 'в доставке' THEN 2
+            WHEN 'отменен' THEN 4
+            ELSE 3
+        END;
+        CREATE INDEX IF NOT EXISTS idx_orders_active
+            ON orders(order_date) WHERE status_code < 3;
+
+        CREATE TABLE IF NOT EXISTS order_events (
+            event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            status_code INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY(order_id) REFERENCES orders(order_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_order_events_order
+            ON order_events(order_id, status_code, event_id);
+        -- История есть только у активных заказов: время приема = дата заказа
+        INSERT INTO order_events (order_id, status_code, created_at)
+            SELECT order_id, 0, order_date FROM orders WHERE status_code < 3;
+
+        CREATE TABLE IF NOT EXISTS order_stage_metrics (
+            stage TEXT PRIMARY KEY,
+            samples INTEGER NOT NULL,
+            total_seconds REAL NOT NULL,
+            max_seconds REAL NOT NULL
+        );
+    """),
+    (10, "Доставки заказов", """
+        CREATE TABLE IF NOT EXISTS deliveries (
+            order_id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            address TEXT,
+            zone TEXT,
+            phone TEXT,
+            requested_time TEXT,
+            eta TEXT,
+            created_at TEXT,
+            updated_at TEXT,
+            FOREIGN KEY(order_id) REFERENCES orders(order_id)
+        );
+    """),
+    (11, "Хранилище состояний FSM", """
+        CREATE TABLE IF NOT EXISTS fsm_states (
+            key TEXT PRIMARY KEY,
+            state TEXT,
+            data TEXT NOT NULL DEFAULT '{}',
+            expires_at REAL NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_fsm_states_expires
+            ON fsm_states(expires_at);
+    """),
+    (12, "Рассылки с контрольными точками", """
+        CREATE TABLE IF NOT EXISTS mailings (
+            mailing_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_id INTEGER NOT NULL,
+            from_chat_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            last_user_id INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            sent INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            blocked INTEGER NOT NULL DEFAULT 0,
+            send_seconds REAL NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL,
+            finished_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS mailing_failures (
+            mailing_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            error TEXT,
+            PRIMARY KEY (mailing_id, user_id)
+        ) WITHOUT ROWID;
+    """),
+    (13, "Дневные агрегаты продаж", """
+        CREATE TABLE IF NOT EXISTS daily_sales (
+            day TEXT PRIMARY KEY,
+            orders INTEGER NOT NULL DEFAULT 0,
+            revenue INTEGER NOT NULL DEFAULT 0,
+            items INTEGER NOT NULL DEFAULT 0,
+            calories INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS daily_dish_sales (
+            day TEXT NOT NULL,
+            dish_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            revenue INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, dish_id)
+        ) WITHOUT ROWID;
+    """),
+    (14, "Расчет агрегатов продаж по существующим заказам", _backfill_sales_rollups),
+    (15, "Индекс заказов по дате для выгрузки и последних заказов", """
+        CREATE INDEX IF NOT EXISTS idx_orders_date ON orders(order_date);
+    """),
+    (16, "Акции и промокоды", """
+        CREATE TABLE IF NOT EXISTS promos (
+            promo_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            code TEXT UNIQUE,
+            kind TEXT NOT NULL,
+            value INTEGER NOT NULL,
+            dish_id INTEGER,
+            min_total INTEGER NOT NULL DEFAULT 0,
+            first_order INTEGER NOT NULL DEFAULT 0,
+            starts_at TEXT,
+            ends_at TEXT,
+            hour_from INTEGER,
+            hour_to INTEGER,
+            active INTEGER NOT NULL DEFAULT 1,
+            created_at TEXT
+        );
+        ALTER TABLE orders ADD COLUMN discount INTEGER NOT NULL DEFAULT 0;
+        ALTER TABLE orders ADD COLUMN promo_id INTEGER;
+    """),
+    (17, "Владелец рассылки для нескольких процессов бота", """
+        ALTER TABLE mailings ADD COLUMN owner TEXT;
+        ALTER TABLE mailings ADD COLUMN lease_until REAL;
+    """),
+    (18, "Выручка блюд в агрегатах с учетом скидки заказа", _backfill_sales_rollups),
+    (19, "Калории в позициях заказа на момент оформления", _order_item_calories),
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Возвращает текущую версию схемы"""
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        description TEXT,
+        applied_at TEXT
+    )''')
+    row = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+    return row[0] or 0
+
+
+def run_migrations(conn: sqlite3.Connection) -> int:
+    """
+    Применяет недостающие миграции. Безопасно вызывать при каждом запуске.
+    :param conn: Соединение с БД
+    :return: Версия схемы после применения
+    """
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        version = get_schema_version(conn)
+        for number, description, script in MIGRATIONS:
+            if number <= version:
+                continue
+
+            logger.info(f"Применение миграции {number}: {description}")
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                if callable(script):
+                    script(conn)
+                else:
+                    for statement in _split_script(script):
+                        conn.execute(statement)
+                conn.execute(
+                    "INSERT INTO schema_migrations (version, description, applied_at) VALUES (?, ?, ?)",
+                    (number, description, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+                conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                conn.execute("ROLLBACK")
+                logger.error(f"Ошибка миграции {number}: {e}")
+                raise
+            version = number
+        return version
+    finally:
+        conn.isolation_level = isolation_level
+
+
+def _split_script(script: str) -> List[str]:
+    """Разбивает SQL-скрипт на отдельные выражения"""
+    statements, buffer = [], ""
+    for line in script.splitlines():
+        if line.strip().startswith("--"):
+            continue
+        buffer += line + "\n"
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer.strip())
+            buffer = ""
+    if buffer.strip():
+        statements.append(buffer.strip())
+    return statements
@@ -1,21 +1,29 @@
-from aiogram import Router, types, F
+from aiogram import Router, F
 from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery, InputFile, ReplyKeyboardRemove
+from aiogram.types import Message, CallbackQuery, FSInputFile, InputFile, ReplyKeyboardRemove
 from aiogram.fsm.context import FSMContext
-from datetime import datetime
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from datetime import date, datetime, timedelta
 import os
 import logging
-from foodfit_bot.config.database import cursor, conn
 from foodfit_bot.handlers.commands import admin_panel
 from foodfit_bot.keyboards.reply import admin_kb, cancel_kb, main_menu_kb
 from foodfit_bot.keyboards.inline import (
     build_admin_dish_edit_kb,
-    build_delete_confirmation_kb
+    build_delete_confirmation_kb,
+    build_mailing_confirm_kb,
+    build_promo_list_kb,
+    build_stats_period_kb
 )
-from foodfit_bot.models.states import Form
-from foodfit_bot.services.database_service import is_admin
+from foodfit_bot.models.states import AdminStates, Form
+from foodfit_bot.services.database_service import DatabaseService, get_dish_info, is_admin
 from foodfit_bot.services.ai_service import generate_ai_description
-from foodfit_bot.utils.helpers import validate_price
+from foodfit_bot.services.catalog import catalog
+from foodfit_bot.services.export import EXPORT_MAX_BYTES, FORMAT_CSV, FORMAT_XLSX, order_exporter
+from foodfit_bot.services.mailing import format_report, mailing_service
+from foodfit_bot.services.media_service import media_registry
+from foodfit_bot.services.promo import describe_promo, parse_promo, promo_engine
+from foodfit_bot.utils.helpers import parse_date_range, validate_price
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -97,17 +105,17 @@ async def add_dish_photo(message: Message, state: FSMContext):
         os.makedirs("photos", exist_ok=True)
         photo_path = f"photos/{photo_id}.jpg"
         await message.bot.download_file(photo.file_path, photo_path)
+        # Фото уже есть на серверах Telegram, повторно загружать не нужно
+        await media_registry.remember(photo_path, photo_id)
     else:
         await message.answer("Пожалуйста, отправьте фото или напишите 'Пропустить'")
         return
 
-    cursor.execute(
-        """INSERT INTO menu (name, description, price, calories, tags, photo) 
-        VALUES (?, ?, ?, ?, ?, ?)""",
-        (data['name'], data['description'], data['price'],
-         data['calories'], data['tags'], photo_path)
+    await DatabaseService.add_dish(
+        data['name'], data['description'], data['price'],
+        data['calories'], data['tags'], photo_path
     )
-    conn.commit()
+    catalog.invalidate()
 
     await message.answer(
         f"✅ Блюдо успешно добавлено!\n\n"
@@ -128,13 +136,13 @@ async def edit_dish_start(message: Message):
         await message.answer("⛔ Доступ запрещен")
         return
 
-    dishes = cursor.execute("SELECT dish_id, name FROM menu").fetchall()
+    dishes = [(dish.dish_id, dish.name) for dish in await catalog.records()]
 
     if not dishes:
         await message.answer("Меню пустое")
         return
 
-    builder = types.InlineKeyboardBuilder()
+    builder = InlineKeyboardBuilder()
     for dish_id, name in dishes:
         builder.button(text=name, callback_data=f"editdish_{dish_id}")
     builder.adjust(2)
@@ -193,33 +201,30 @@ async def save_edited_value(message: Message, state: FSMContext):
                 return
 
             # Удаляем старое фото
-            old_photo = cursor.execute(
-                "SELECT photo FROM menu WHERE dish_id = ?",
-                (dish_id,)
-            ).fetchone()[0]
+            dish = await get_dish_info(dish_id)
+            old_photo = dish['photo'] if dish else None
 
+            if old_photo:
+                await media_registry.forget(old_photo)
             if old_photo and os.path.exists(old_photo):
                 os.remove(old_photo)
 
             # Сохраняем новое
             photo_id = message.photo[-1].file_id
             photo = await message.bot.get_file(photo_id)
+            os.makedirs("photos", exist_ok=True)
             photo_path = f"photos/{photo_id}.jpg"
             await message.bot.download_file(photo.file_path, photo_path)
+            await media_registry.remember(photo_path, photo_id)
             new_value = photo_path
         else:
             new_value = message.text
 
-        cursor.execute(
-            f"UPDATE menu SET {field} = ? WHERE dish_id = ?",
-            (new_value, dish_id)
-        )
-        conn.commit()
+        await DatabaseService.update_dish(dish_id, field, new_value)
+        catalog.invalidate()
 
-        dish_name = cursor.execute(
-            "SELECT name FROM menu WHERE dish_id = ?",
-            (dish_id,)
-        ).fetchone()[0]
+        dish = await get_dish_info(dish_id)
+        dish_name = dish['name'] if dish else dish_id
 
         await message.answer(
             f"✅ Блюдо '{dish_name}' успешно обновлено!",
@@ -242,13 +247,13 @@ async def delete_dish_start(message: Message):
         await message.answer("⛔ Доступ запрещен")
         return
 
-    dishes = cursor.execute("SELECT dish_id, name FROM menu").fetchall()
+    dishes = [(dish.dish_id, dish.name) for dish in await catalog.records()]
 
     if not dishes:
         await message.answer("Меню пустое")
         return
 
-    builder = types.InlineKeyboardBuilder()
+    builder = InlineKeyboardBuilder()
     for dish_id, name in dishes:
         builder.button(text=name, callback_data=f"delete_{dish_id}")
     builder.adjust(2)
@@ -262,13 +267,13 @@ async def delete_dish_start(message: Message):
 @router.callback_query(F.data.startswith("delete_"))
 async def confirm_delete_dish(callback: CallbackQuery):
     dish_id = int(callback.data.split("_")[1])
-    dish_name = cursor.execute(
-        "SELECT name FROM menu WHERE dish_id = ?",
-        (dish_id,)
-    ).fetchone()[0]
+    dish = await get_dish_info(dish_id)
+    if not dish:
+        await callback.answer("Блюдо не найдено")
+        return
 
     await callback.message.edit_text(
-        f"Вы точно хотите удалить блюдо '{dish_name}'?",
+        f"Вы точно хотите удалить блюдо '{dish['name']}'?",
         reply_markup=build_delete_confirmation_kb(dish_id)
     )
 
@@ -276,25 +281,24 @@ async def confirm_delete_dish(callback: CallbackQuery):
 @router.callback_query(F.data.startswith("confirm_delete_"))
 async def execute_delete_dish(callback: CallbackQuery):
     dish_id = int(callback.data.split("_")[2])
-    dish_name = cursor.execute(
-        "SELECT name FROM menu WHERE dish_id = ?",
-        (dish_id,)
-    ).fetchone()[0]
+    dish = await get_dish_info(dish_id)
+    if not dish:
+        await callback.answer("Блюдо не найдено")
+        return
 
     # Удаляем фото если есть
-    photo_path = cursor.execute(
-        "SELECT photo FROM menu WHERE dish_id = ?",
-        (dish_id,)
-    ).fetchone()[0]
+    photo_path = dish['photo']
 
+    if photo_path:
+        await media_registry.forget(photo_path)
     if photo_path and os.path.exists(photo_path):
         os.remove(photo_path)
 
-    cursor.execute("DELETE FROM menu WHERE dish_id = ?", (dish_id,))
-    conn.commit()
+    await DatabaseService.delete_dish(dish_id)
+    catalog.invalidate()
 
     await callback.message.edit_text(
-        f"✅ Блюдо '{dish_name}' успешно удалено!"
+        f"✅ Блюдо '{dish['name']}' успешно удалено!"
     )
     await admin_panel(callback.message)
 
@@ -313,14 +317,7 @@ async def show_orders(message: Message):
         return
 
     try:
-        cursor.execute("""
-            SELECT o.order_id, u.full_name, o.order_date, o.total_amount 
-            FROM orders o
-            JOIN users u ON o.user_id = u.user_id
-            ORDER BY o.order_date DESC
-            LIMIT 10
-        """)
-        orders = cursor.fetchall()
+        orders = await DatabaseService.get_recent_orders(10)
 
         if not orders:
             await message.answer("📦 Нет заказов")
@@ -328,12 +325,11 @@ async def show_orders(message: Message):
 
         response = "📦 <b>Последние заказы:</b>\n\n"
         for order in orders:
-            order_id, customer, date, total = order
             response += (
-                f"🆔 <b>#{order_id}</b>\n"
-                f"👤 {customer}\n"
-                f"📅 {date}\n"
-                f"💵 {total}₽\n"
+                f"🆔 <b>#{order['order_id']}</b>\n"
+                f"👤 {order['customer_name']}\n"
+                f"📅 {order['order_date']}\n"
+                f"💵 {order['total_amount']}₽\n"
                 f"————————————\n"
             )
 
@@ -343,6 +339,282 @@ async def show_orders(message: Message):
         await message.answer("⚠ Ошибка при загрузке заказов")
 
 
+# ---------------------- Статистика продаж ----------------------
+# Быстрые периоды: количество дней до сегодняшнего включительно
+STATS_PERIOD_DAYS = {'today': 1, 'week': 7, 'month': 30, 'year': 365}
+
+
+def _format_sales_report(report: dict) -> str:
+    period = report['date_from'] if report['date_from'] == report['date_to'] else \
+        f"{report['date_from']} — {report['date_to']}"
+    text = (
+        f"📈 <b>Продажи за {period}</b>\n\n"
+        f"📦 Заказов: {report['orders']}\n"
+        f"💵 Выручка: {report['revenue']}₽\n"
+        f"🧾 Средний чек: {report['average_basket']:.0f}₽\n"
+        f"🍽 Порций: {report['items']}\n"
+        f"🔥 Калорий продано: {report['calories']}\n"
+    )
+    if report['days']:
+        best = max(report['days'], key=lambda d: d['revenue'])
+        text += f"🏆 Лучший день: {best['day']} — {best['revenue']}₽ ({best['orders']} заказов)\n"
+    if report['top_dishes']:
+        text += "\n<b>Топ блюд:</b>\n"
+        for i, dish in enumerate(report['top_dishes'], 1):
+            text += f"{i}. {dish['name']} — {dish['quantity']} шт., {dish['revenue']:.0f}₽\n"
+    return text
+
+
+async def _send_sales_report(message: Message, date_from: str, date_to: str) -> None:
+    report = await DatabaseService.get_sales_report(date_from, date_to)
+    if report is None:
+        await message.answer("⚠ Ошибка при загрузке статистики")
+        return
+    await message.answer(_format_sales_report(report), reply_markup=admin_kb())
+
+
+@router.message(F.text == "📈 Статистика")
+async def stats_start(message: Message, state: FSMContext):
+    if not is_admin(message.from_user.id):
+        await message.answer("⛔ Недостаточно прав")
+        return
+
+    await state.set_state(AdminStates.stats_period)
+    await message.answer(
+        "Выберите период или введите даты (например, 01.05.2024 - 31.05.2024):",
+        reply_markup=build_stats_period_kb()
+    )
+
+
+@router.callback_query(F.data.startswith("stats_period_"), AdminStates.stats_period)
+async def stats_quick_period(callback: CallbackQuery, state: FSMContext):
+    period = callback.data[len("stats_period_"):]
+    today = date.today()
+    if period == 'current':
+        date_from = today.replace(day=1)
+    else:
+        date_from = today - timedelta(days=STATS_PERIOD_DAYS.get(period, 1) - 1)
+
+    await state.clear()
+    await callback.answer()
+    await _send_sales_report(callback.message, date_from.strftime("%Y-%m-%d"), today.strftime("%Y-%m-%d"))
+
+
+@router.message(AdminStates.stats_period)
+async def stats_custom_period(message: Message, state: FSMContext):
+    if message.text == "❌ Отмена":
+        await state.clear()
+        await message.answer("👨‍🍳 Панель администратора", reply_markup=admin_kb())
+        return
+
+    period = parse_date_range(message.text)
+    if period is None:
+        await message.answer("❌ Не удалось распознать даты. Пример: 01.05.2024 - 31.05.2024")
+        return
+
+    await state.clear()
+    await _send_sales_report(message, *period)
+
+
+# ---------------------- Экспорт заказов ----------------------
+# Период выгрузки по умолчанию: последние 30 дней
+EXPORT_DEFAULT_DAYS = 30
+
+
+@router.message(Command("export"))
+@router.message(F.text == "📤 Экспорт заказов")
+async def export_orders(message: Message):
+    """Выгрузка заказов файлом: /export [01.05.2024 - 31.05.2024] [xlsx]"""
+    if not is_admin(message.from_user.id):
+        await message.answer("⛔ Недостаточно прав")
+        return
+
+    args = message.text.split(maxsplit=1)[1] if message.text.startswith("/") and " " in message.text else ""
+    fmt = FORMAT_CSV
+    if args.lower().rstrip().endswith(FORMAT_XLSX):
+        fmt = FORMAT_XLSX
+        args = args.rstrip()[:-len(FORMAT_XLSX)]
+    elif args.lower().rstrip().endswith(FORMAT_CSV):
+        args = args.rstrip()[:-len(FORMAT_CSV)]
+
+    if args.strip():
+        period = parse_date_range(args)
+        if period is None:
+            await message.answer("❌ Не удалось распознать даты. Пример: /export 01.05.2024 - 31.05.2024 xlsx")
+            return
+    else:
+        today = date.today()
+        period = ((today - timedelta(days=EXPORT_DEFAULT_DAYS - 1)).strftime("%Y-%m-%d"),
+                  today.strftime("%Y-%m-%d"))
+
+    progress = await message.answer(f"⏳ Готовлю выгрузку заказов за {period[0]} — {period[1]}...")
+    result = await order_exporter.export(*period, fmt=fmt)
+    if result is None:
+        await progress.edit_text("⚠ Ошибка при выгрузке заказов")
+        return
+
+    try:
+        if result['rows'] == 0:
+            await progress.edit_text("📦 За этот период заказов нет")
+        elif result['size'] > EXPORT_MAX_BYTES:
+            await progress.edit_text(
+                f"⚠ Файл получился {result['size'] / 1024 / 1024:.0f} МБ — больше лимита Telegram. "
+                f"Выберите период короче.")
+        else:
+            await message.answer_document(
+                FSInputFile(result['path'], filename=result['filename']),
+                caption=f"📤 Заказы за {period[0]} — {period[1]}: {result['rows']} позиций")
+            await progress.delete()
+    finally:
+        os.remove(result['path'])
+
+
+# ---------------------- Акции и промокоды ----------------------
+PROMO_HELP = (
+    "Отправьте акцию одной строкой:\n"
+    "<code>КОД тип значение [параметры]</code>\n\n"
+    "Типы: <code>percent</code> — % на заказ, <code>fixed</code> — ₽ на заказ, "
+    "<code>dish</code> — % на блюдо (нужен <code>dish=ID</code>)\n"
+    "Параметры: <code>min=1000</code>, <code>first</code> (первый заказ), "
+    "<code>hours=15-17</code>, <code>from=01.06.2024</code>, <code>to=30.06.2024</code>\n"
+    "Код <code>-</code> — скидка без кода, применяется автоматически\n\n"
+    "Примеры:\n"
+    "<code>WELCOME percent 15 first</code>\n"
+    "<code>- fixed 200 min=1500</code>\n"
+    "<code>- dish 30 dish=12 hours=15-17</code>"
+)
+
+
+@router.message(F.text == "🎟 Акции")
+async def promo_start(message: Message, state: FSMContext):
+    if not is_admin(message.from_user.id):
+        await message.answer("⛔ Недостаточно прав")
+        return
+
+    try:
+        promos = await promo_engine.list_active()
+    except Exception as e:
+        logger.error(f"Ошибка загрузки акций: {e}")
+        await message.answer("⚠ Ошибка при загрузке акций")
+        return
+
+    if promos:
+        text = "🎟 <b>Активные акции:</b>\n\n" + "\n".join(describe_promo(promo) for promo in promos)
+        await message.answer(text, reply_markup=build_promo_list_kb(promos))
+    else:
+        await message.answer("🎟 Активных акций нет")
+
+    await state.set_state(AdminStates.promo_creation)
+    await message.answer(PROMO_HELP, reply_markup=cancel_kb())
+
+
+@router.message(AdminStates.promo_creation)
+async def promo_create(message: Message, state: FSMContext):
+    if message.text == "❌ Отмена":
+        await state.clear()
+        await message.answer("👨‍🍳 Панель администратора", reply_markup=admin_kb())
+        return
+
+    try:
+        promo = parse_promo(message.text or "")
+    except ValueError as e:
+        await message.answer(f"❌ {e}")
+        return
+    if promo['dish_id'] is not None and not await catalog.get_dish(promo['dish_id']):
+        await message.answer(f"❌ Блюдо #{promo['dish_id']} не найдено")
+        return
+
+    promo_id = await promo_engine.create(promo)
+    if promo_id is None:
+        await message.answer("❌ Не удалось создать акцию: такой код уже есть")
+        return
+
+    await state.clear()
+    await message.answer(f"✅ Акция создана\n{describe_promo(promo)}", reply_markup=admin_kb())
+
+
+@router.callback_query(F.data.startswith("promo_off_"))
+async def promo_disable(callback: CallbackQuery):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔ Недостаточно прав")
+        return
+
+    promo_id = int(callback.data[len("promo_off_"):])
+    if await promo_engine.disable(promo_id):
+        await callback.answer("Акция отключена")
+    else:
+        await callback.answer("Акция уже отключена")
+
+
+# ---------------------- Рассылка ----------------------
+@router.message(F.text == "📨 Рассылка")
+async def mailing_start(message: Message, state: FSMContext):
+    if not is_admin(message.from_user.id):
+        await message.answer("⛔ Доступ запрещен")
+        return
+
+    await state.set_state(AdminStates.mailing_content)
+    await message.answer(
+        "Отправьте сообщение для рассылки (текст, фото или любое другое сообщение):",
+        reply_markup=cancel_kb()
+    )
+
+
+@router.message(AdminStates.mailing_content)
+async def mailing_content(message: Message, state: FSMContext):
+    if message.text == "❌ Отмена":
+        await state.clear()
+        await message.answer("Рассылка отменена", reply_markup=admin_kb())
+        return
+
+    await state.update_data(mailing_chat_id=message.chat.id, mailing_message_id=message.message_id)
+    await message.answer("👆 Так сообщение увидят пользователи. Отправить?",
+                         reply_markup=build_mailing_confirm_kb())
+
+
+@router.callback_query(F.data == "mailing_confirm", AdminStates.mailing_content)
+async def mailing_confirm(callback: CallbackQuery, state: FSMContext):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔ Доступ запрещен", show_alert=True)
+        return
+
+    data = await state.get_data()
+    await state.clear()
+    mailing_id = await mailing_service.create(
+        callback.from_user.id, data['mailing_chat_id'], data['mailing_message_id'])
+    if mailing_id is None:
+        await callback.answer("⚠ Не удалось создать рассылку", show_alert=True)
+        return
+
+    mailing_service.launch(callback.bot, mailing_id)
+    await callback.message.edit_text(f"📨 Рассылка #{mailing_id} запущена, прогресс придет отдельным сообщением")
+    await callback.message.answer("👨‍🍳 Панель администратора", reply_markup=admin_kb())
+
+
+@router.callback_query(F.data == "mailing_cancel")
+async def mailing_cancel(callback: CallbackQuery, state: FSMContext):
+    await state.clear()
+    await callback.message.edit_text("Рассылка отменена")
+    await callback.message.answer("👨‍🍳 Панель администратора", reply_markup=admin_kb())
+
+
+@router.callback_query(F.data.startswith("mailing_stop_"))
+async def mailing_stop(callback: CallbackQuery):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔ Доступ запрещен", show_alert=True)
+        return
+
+    mailing_id = int(callback.data.split("_")[2])
+    if not await mailing_service.cancel(mailing_id):
+        await callback.answer("Рассылка уже завершена")
+        return
+
+    mailing = await mailing_service.get(mailing_id)
+    if mailing:
+        await callback.message.edit_text(format_report(mailing))
+    await callback.answer("⏹ Рассылка остановлена")
+
+
 # ---------------------- Выход из админки ----------------------
 @router.message(F.text == "🔙 Выход")
 async def exit_admin(message: Message):
@@ -1,18 +1,51 @@
 from aiogram import Router, types, F
 from aiogram.types import Message, CallbackQuery
-from datetime import datetime
 import logging
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
 from typing import Union
-from foodfit_bot.config.database import cursor, conn
 from foodfit_bot.keyboards.inline import build_cart_keyboard
 from foodfit_bot.keyboards.reply import main_menu_kb
-from foodfit_bot.services.database_service import get_dish_info
+from foodfit_bot.services.cart_buffer import cart_buffer
+from foodfit_bot.services.catalog import catalog
+from foodfit_bot.services.database_service import DatabaseService
+from foodfit_bot.services.promo import describe_promo, normalize_code, promo_engine
 
 router = Router()
 logger = logging.getLogger(__name__)
 
 # ---------------------- Отображение корзины ----------------------
+def _render_cart(items: list):
+    """
+    Собирает текст и клавиатуру корзины
+    :param items: Содержимое корзины (как get_cart_contents)
+    :return: (текст, клавиатура)
+    """
+    total_amount = 0
+    total_calories = 0
+    cart_text = "🛒 <b>Ваша корзина:</b>\n\n"
+
+    for item in items:
+        item_total = item['price'] * item['quantity']
+        cart_text += f"• {item['name']}\n   {item['price']}₽ × {item['quantity']} = {item_total}₽\n"
+        total_amount += item_total
+        total_calories += item['calories'] * item['quantity']
+
+    cart_text += f"\n<b>Итого:</b> {total_amount}₽\n"
+    cart_text += f"<b>Калории:</b> {total_calories} ккал\n\n"
+    cart_text += "🎟 Есть промокод? Отправьте /promo КОД"
+    return cart_text, build_cart_keyboard(items)
+
+
+async def _edit_cart_message(message: Message, items: list) -> None:
+    """Перерисовывает сообщение корзины на месте"""
+    if not items:
+        await message.edit_text("🛒 Ваша корзина пуста")
+        return
+    text, keyboard = _render_cart(items)
+    await message.edit_text(text, reply_markup=keyboard)
+
+
 @router.message(F.text == "🛒 Корзина")
 @router.message(Command("cart"))
 async def show_cart(message: Union[Message, CallbackQuery]):
@@ -24,39 +57,17 @@ async def show_cart(message: Union[Message, CallbackQuery]):
         user_id = message.from_user.id
 
     try:
-        # Получаем содержимое корзины
-        cursor.execute('''
-            SELECT c.cart_id, c.dish_id, m.name, m.price, c.quantity, m.calories, m.photo 
-            FROM cart c 
-            JOIN menu m ON c.dish_id = m.dish_id 
-            WHERE c.user_id = ?
-        ''', (user_id,))
-        items = cursor.fetchall()
+        # Дописываем отложенные изменения количества и получаем корзину
+        await cart_buffer.flush(user_id)
+        items = await DatabaseService.get_cart_contents(user_id)
 
         if not items:
             await message.answer("🛒 Ваша корзина пуста")
             return
 
-        # Формируем сообщение
-        total_amount = 0
-        total_calories = 0
-        cart_text = "🛒 <b>Ваша корзина:</b>\n\n"
-
-        for item in items:
-            _, dish_id, name, price, quantity, calories, photo = item
-            item_total = price * quantity
-            cart_text += f"• {name}\n   {price}₽ × {quantity} = {item_total}₽\n"
-            total_amount += item_total
-            total_calories += calories * quantity
-
-        cart_text += f"\n<b>Итого:</b> {total_amount}₽\n"
-        cart_text += f"<b>Калории:</b> {total_calories} ккал"
-
         # Отправляем сообщение с клавиатурой
-        await message.answer(
-            cart_text,
-            reply_markup=build_cart_keyboard(items)
-        )
+        cart_text, keyboard = _render_cart(items)
+        await message.answer(cart_text, reply_markup=keyboard)
 
     except Exception as e:
         logger.error(f"Ошибка отображения корзины: {e}")
@@ -70,34 +81,13 @@ async def add_to_cart(callback: CallbackQuery):
         user_id = callback.from_user.id
         dish_id = int(callback.data.split("_")[1])
 
-        # Проверяем наличие блюда в корзине
-        cursor.execute("""
-            SELECT quantity FROM cart 
-            WHERE user_id = ? AND dish_id = ?
-        """, (user_id, dish_id))
-        existing_item = cursor.fetchone()
-
-        if existing_item:
-            # Увеличиваем количество
-            cursor.execute("""
-                UPDATE cart SET quantity = quantity + 1 
-                WHERE user_id = ? AND dish_id = ?
-            """, (user_id, dish_id))
-        else:
-            # Добавляем новую запись
-            cursor.execute("""
-                INSERT INTO cart (user_id, dish_id, quantity)
-                VALUES (?, ?, 1)
-            """, (user_id, dish_id))
-
-        conn.commit()
-
-        # Получаем название блюда для уведомления
-        dish_name = cursor.execute("""
-            SELECT name FROM menu WHERE dish_id = ?
-        """, (dish_id,)).fetchone()[0]
-
-        await callback.answer(f"✅ {dish_name} добавлен(о) в корзину")
+        dish = await catalog.get_dish(dish_id)
+        await cart_buffer.flush(user_id)
+        if not dish or not await DatabaseService.add_to_cart(user_id, dish_id):
+            await callback.answer("⚠ Не удалось добавить в корзину", show_alert=True)
+            return
+
+        await callback.answer(f"✅ {dish['name']} добавлен(о) в корзину")
 
     except Exception as e:
         logger.error(f"Ошибка добавления в корзину: {e}")
@@ -119,28 +109,23 @@ async def _update_quantity(callback: CallbackQuery, delta: int):
         user_id = callback.from_user.id
         dish_id = int(callback.data.split("_")[1])
 
-        # Получаем текущее количество
-        cursor.execute("""
-            SELECT quantity FROM cart 
-            WHERE user_id = ? AND dish_id = ?
-        """, (user_id, dish_id))
-        current_qty = cursor.fetchone()[0]
+        message = callback.message
+
+        async def render(items: list):
+            await _edit_cart_message(message, items)
 
-        new_qty = current_qty + delta
+        # Количество меняется в памяти; запись и перерисовка корзины
+        # происходят один раз после серии нажатий
+        new_qty = await cart_buffer.change_quantity(user_id, dish_id, delta, render)
+        if new_qty is None:
+            await callback.answer("Блюдо не найдено в корзине")
+            return
 
         if new_qty < 1:
             await callback.answer("❌ Минимальное количество - 1")
             return
 
-        # Обновляем количество
-        cursor.execute("""
-            UPDATE cart SET quantity = ? 
-            WHERE user_id = ? AND dish_id = ?
-        """, (new_qty, user_id, dish_id))
-        conn.commit()
-
         await callback.answer(f"Количество изменено: {new_qty}")
-        await show_cart(callback)
 
     except Exception as e:
         logger.error(f"Ошибка изменения количества: {e}")
@@ -154,14 +139,11 @@ async def remove_item(callback: CallbackQuery):
         user_id = callback.from_user.id
         dish_id = int(callback.data.split("_")[1])
 
-        cursor.execute("""
-            DELETE FROM cart 
-            WHERE user_id = ? AND dish_id = ?
-        """, (user_id, dish_id))
-        conn.commit()
+        await cart_buffer.flush(user_id)
+        await DatabaseService.remove_from_cart(user_id, dish_id)
 
         await callback.answer("🗑 Блюдо удалено из корзины")
-        await show_cart(callback)
+        await _edit_cart_message(callback.message, await DatabaseService.get_cart_contents(user_id))
 
     except Exception as e:
         logger.error(f"Ошибка удаления из корзины: {e}")
@@ -174,10 +156,8 @@ async def clear_cart_handler(callback: CallbackQuery):
     try:
         user_id = callback.from_user.id
 
-        cursor.execute("""
-            DELETE FROM cart WHERE user_id = ?
-        """, (user_id,))
-        conn.commit()
+        await cart_buffer.flush(user_id)
+        await DatabaseService.clear_cart(user_id)
 
         await callback.message.edit_text("🛒 Ваша корзина пуста")
         await callback.answer("Корзина очищена")
@@ -186,61 +166,84 @@ async def clear_cart_handler(callback: CallbackQuery):
         logger.error(f"Ошибка очистки корзины: {e}")
         await callback.answer("⚠ Не удалось очистить корзину", show_alert=True)
 
+# ---------------------- Промокод ----------------------
+@router.message(Command("promo"))
+async def enter_promo(message: Message, command: CommandObject, state: FSMContext):
+    """Сохраняет промокод до оформления заказа и показывает скидку по корзине"""
+    if not command.args:
+        code = (await state.get_data()).get('promo_code')
+        await message.answer(
+            f"🎟 Ваш промокод: <code>{code}</code>" if code else "Отправьте промокод так: /promo КОД")
+        return
+
+    code = normalize_code(command.args)
+    try:
+        promos = await promo_engine.promos()
+        if code not in promos.by_code:
+            await message.answer("❌ Такого промокода нет или он больше не действует")
+            return
+        await state.update_data(promo_code=code)
+
+        user_id = message.from_user.id
+        await cart_buffer.flush(user_id)
+        items = await DatabaseService.get_cart_contents(user_id)
+        result = await promo_engine.quote(
+            user_id, [(item['dish_id'], item['quantity'], item['price']) for item in items], code)
+    except Exception as e:
+        logger.error(f"Ошибка применения промокода: {e}")
+        await message.answer("⚠ Не удалось проверить промокод")
+        return
+
+    promo = promos.by_code[code]
+    if result.promo is promo:
+        await message.answer(f"✅ Промокод применен: скидка {result.discount}₽, к оплате {result.total}₽")
+    elif result.promo is not None:
+        await message.answer(
+            f"🎟 Промокод сохранен, но сейчас выгоднее действующая акция: скидка {result.discount}₽")
+    else:
+        await message.answer(f"🎟 Промокод сохранен и сработает при выполнении условий:\n{describe_promo(promo.row)}")
+
 # ---------------------- Оформление заказа ----------------------
 @router.callback_query(F.data == "checkout")
-async def checkout_handler(callback: CallbackQuery):
+async def checkout_handler(callback: CallbackQuery, state: FSMContext):
     """Оформляет заказ из содержимого корзины"""
     try:
         user_id = callback.from_user.id
 
-        # 1. Проверяем наличие товаров в корзине
-        cursor.execute("SELECT COUNT(*) FROM cart WHERE user_id = ?", (user_id,))
-        if cursor.fetchone()[0] == 0:
+        # Повторные нажатия на одну и ту же корзину дают один ключ
+        idempotency_key = f"checkout:{callback.message.chat.id}:{callback.message.message_id}"
+        promo_code = (await state.get_data()).get('promo_code')
+        # Заказ собирается из корзины в БД: без записанных +/- он был бы по старым количествам
+        if not await cart_buffer.flush(user_id) or cart_buffer.has_pending(user_id):
+            await callback.answer("⚠ Ошибка при оформлении заказа", show_alert=True)
+            return
+        order = await DatabaseService.create_order(user_id, idempotency_key, promo_code)
+        if order is None:
+            await callback.answer("⚠ Ошибка при оформлении заказа", show_alert=True)
+            return
+        if not order:
             await callback.answer("🛒 Ваша корзина пуста!", show_alert=True)
             return
+        # Корзина удалена оформлением: отложенная запись ей больше не нужна
+        cart_buffer.discard(user_id)
+        if not order['created']:
+            await callback.answer(f"✅ Заказ #{order['order_id']} уже оформлен")
+            return
+
+        if promo_code:
+            await state.update_data(promo_code=None)
 
-        # 2. Получаем содержимое корзины
-        cursor.execute("""
-            SELECT c.dish_id, m.name, m.price, c.quantity
-            FROM cart c
-            JOIN menu m ON c.dish_id = m.dish_id
-            WHERE c.user_id = ?
-        """, (user_id,))
-        items = cursor.fetchall()
-
-        # 3. Рассчитываем итоговую сумму
-        total_amount = sum(item[2] * item[3] for item in items)
-
-        # 4. Создаем запись о заказе
-        order_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cursor.execute("""
-            INSERT INTO orders (user_id, order_date, total_amount, status)
-            VALUES (?, ?, ?, ?)
-        """, (user_id, order_date, total_amount, "принят"))
-        order_id = cursor.lastrowid
-
-        # 5. Добавляем позиции заказа
-        for item in items:
-            dish_id, name, price, quantity = item
-            cursor.execute("""
-                INSERT INTO order_items (order_id, dish_id, quantity, price)
-                VALUES (?, ?, ?, ?)
-            """, (order_id, dish_id, quantity, price))
-
-        # 6. Очищаем корзину
-        cursor.execute("DELETE FROM cart WHERE user_id = ?", (user_id,))
-        conn.commit()
-
-        # 7. Формируем сообщение с подтверждением
+        # Формируем сообщение с подтверждением
         order_details = "✅ <b>Заказ оформлен!</b>\n\n"
-        order_details += f"🆔 Номер: <code>#{order_id}</code>\n"
-        order_details += f"📅 Дата: {order_date}\n"
-        order_details += f"💵 Сумма: {total_amount}₽\n\n"
+        order_details += f"🆔 Номер: <code>#{order['order_id']}</code>\n"
+        order_details += f"📅 Дата: {order['order_date']}\n"
+        if order['discount']:
+            order_details += f"🎟 Скидка: {order['discount']}₽\n"
+        order_details += f"💵 Сумма: {order['total_amount']}₽\n\n"
         order_details += "<b>Состав:</b>\n"
 
-        for item in items:
-            _, name, price, quantity = item
-            order_details += f"• {name} × {quantity} — {price * quantity}₽\n"
+        for item in order['items']:
+            order_details += f"• {item['name']} × {item['quantity']} — {item['price'] * item['quantity']}₽\n"
 
         await callback.message.edit_text(
             order_details,
@@ -250,5 +253,4 @@ async def checkout_handler(callback: CallbackQuery):
 
     except Exception as e:
         logger.error(f"Ошибка оформления заказа: {e}")
-        await callback.answer("⚠ Ошибка при оформлении заказа", show_alert=True)
-        conn.rollback()
\ No newline at end of file
+        await callback.answer("⚠ Ошибка при оформлении заказа", show_alert=True)
\ No newline at end of file
@@ -1,11 +1,10 @@
 from aiogram import Router, types, F
 from aiogram.filters import Command
 from aiogram.types import Message
-from datetime import datetime
-from foodfit_bot.config.database import cursor, conn
 from foodfit_bot.keyboards.reply import main_menu_kb
 from foodfit_bot.models.states import Form
-from foodfit_bot.services.database_service import is_admin
+from foodfit_bot.services.database_service import DatabaseService, is_admin
+from foodfit_bot.services.scheduler import scheduler
 
 router = Router()
 
@@ -13,11 +12,7 @@ router = Router()
 async def start_cmd(message: Message):
     """Обработчик команды /start"""
     user = message.from_user
-    cursor.execute(
-        "INSERT OR IGNORE INTO users (user_id, username, full_name, registration_date) VALUES (?, ?, ?, ?)",
-        (user.id, user.username, user.full_name, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-    )
-    conn.commit()
+    await DatabaseService.add_user_if_not_exists(user.id, user.username, user.full_name)
 
     await message.answer(
         "👋 Добро пожаловать в FoodFit!\nЯ помогу выбрать идеальное блюдо с учетом калорий!\nИспользуй команду /help",
@@ -34,6 +29,7 @@ async def help_cmd(message: Message):
         "/profile - Ваш профиль\n"
         "/cart - Корзина\n"
         "/filters - Фильтры меню\n"
+        "/search - Поиск блюд\n"
         "/recommend - Персональная рекомендация\n\n"
         "Для персонала:\n"
         "/staff - Режим официанта\n"
@@ -54,29 +50,40 @@ async def profile_cmd(message: Message):
     """Обработчик команды /profile"""
     user_id = message.from_user.id
 
-    cursor.execute(
-        "INSERT OR IGNORE INTO users (user_id, username, full_name, registration_date) VALUES (?, ?, ?, ?)",
-        (user_id, message.from_user.username, message.from_user.full_name, datetime.now().strftime("%Y-%m-%d")))
-    conn.commit()
+    await DatabaseService.add_user_if_not_exists(
+        user_id, message.from_user.username, message.from_user.full_name)
 
-    cursor.execute("""
-        SELECT u.full_name, u.diet_preferences, COUNT(o.order_id) 
-        FROM users u
-        LEFT JOIN orders o ON u.user_id = o.user_id
-        WHERE u.user_id = ?
-        GROUP BY u.user_id
-    """, (user_id,))
-    user = cursor.fetchone()
+    user = await DatabaseService.get_user_profile(user_id)
+    if not user:
+        await message.answer("⚠ Не удалось загрузить профиль")
+        return
 
     text = f"""
 👤 Ваш профиль
 
-Имя: {user[0]}
-Диета: {user[1] or 'не указана'}
-Заказов: {user[2]}
+Имя: {user['full_name']}
+Диета: {user['diet'] or 'не указана'}
+Заказов: {user['orders_count']}
     """
     await message.answer(text)
 
+@router.message(Command("recommend"))
+async def recommend_cmd(message: Message):
+    """Обработчик команды /recommend"""
+    recommendation = await scheduler.get_recommendation(message.from_user.id)
+    special = await scheduler.get_daily_special()
+
+    if not recommendation and not special:
+        await message.answer("🍽 Рекомендации на сегодня еще готовятся. Загляните позже!")
+        return
+
+    text = ""
+    if recommendation:
+        text += f"⭐ Рекомендуем вам: {recommendation}\n\n"
+    if special:
+        text += f"🎁 Предложение дня:\n{special}"
+    await message.answer(text.strip())
+
 @router.message(Command("admin"))
 async def admin_panel(message: Message):
     """Обработчик команды /admin"""
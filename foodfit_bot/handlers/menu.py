@@ -1,19 +1,24 @@
 from aiogram import Router, types, F
-from aiogram.filters import Command
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 import logging
 from typing import Optional
 
-from foodfit_bot.config.database import cursor, conn
+from foodfit_bot.config.config import MENU_RENDER_MODE
 from foodfit_bot.keyboards.inline import (
     build_dish_keyboard,
     build_filters_keyboard,
+    build_menu_page_keyboard,
     build_pagination_keyboard
 )
 from foodfit_bot.keyboards.reply import main_menu_kb
 from foodfit_bot.models.states import Form
-from foodfit_bot.services.database_service import get_dish_info, search_dishes
+from foodfit_bot.services.catalog import catalog
+from foodfit_bot.services.search_service import search_menu
+from foodfit_bot.services.media_service import media_registry
+from foodfit_bot.utils.tags import FILTER_TAGS
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -28,20 +33,13 @@ async def show_menu(message: Message, page: int = 1):
     """
     Показывает меню с пагинацией
     """
+    if MENU_RENDER_MODE == "single":
+        await show_menu_single(message, page)
+        return
+
     try:
-        # Получаем общее количество блюд
-        cursor.execute("SELECT COUNT(*) FROM menu")
-        total_dishes = cursor.fetchone()[0]
-        total_pages = (total_dishes + MENU_PAGE_SIZE - 1) // MENU_PAGE_SIZE
-
-        # Получаем блюда для текущей страницы
-        cursor.execute("""
-            SELECT dish_id, name, price, calories, photo 
-            FROM menu 
-            ORDER BY name
-            LIMIT ? OFFSET ?
-        """, (MENU_PAGE_SIZE, (page - 1) * MENU_PAGE_SIZE))
-        dishes = cursor.fetchall()
+        # Получаем блюда для текущей страницы из каталога
+        dishes, total_pages = await catalog.get_page(page, MENU_PAGE_SIZE)
 
         if not dishes:
             await message.answer("🍽 Меню пока пусто. Зайдите позже!")
@@ -49,29 +47,29 @@ async def show_menu(message: Message, page: int = 1):
 
         # Отправляем каждое блюдо отдельным сообщением
         for dish in dishes:
-            dish_id, name, price, calories, photo = dish
-            text = f"<b>{name}</b>\n\n🔥 {calories} ккал\n💵 {price}₽"
+            text = f"<b>{dish['name']}</b>\n\n🔥 {dish['calories']} ккал\n💵 {dish['price']}₽"
 
-            if photo:
-                await message.answer_photo(
-                    photo,
+            if dish['photo']:
+                await media_registry.answer_photo(
+                    message,
+                    dish['photo'],
                     caption=text,
-                    reply_markup=build_dish_keyboard(dish_id))
+                    reply_markup=build_dish_keyboard(dish['dish_id']))
             else:
                 await message.answer(
                     text,
-                    reply_markup=build_dish_keyboard(dish_id))
-
-                # Добавляем пагинацию
-                if total_pages > 1:
-                    await message.answer(
-                        f"Страница {page} из {total_pages}",
-                        reply_markup=build_pagination_keyboard(
-                            page=page,
-                            total_pages=total_pages,
-                            prefix="menu"
-                        )
-                    )
+                    reply_markup=build_dish_keyboard(dish['dish_id']))
+
+        # Добавляем пагинацию
+        if total_pages > 1:
+            await message.answer(
+                f"Страница {page} из {total_pages}",
+                reply_markup=build_pagination_keyboard(
+                    page=page,
+                    total_pages=total_pages,
+                    prefix="menu"
+                )
+            )
 
     except Exception as e:
         logger.error(f"Ошибка загрузки меню: {e}")
@@ -88,6 +86,86 @@ async def menu_page_handler(callback: CallbackQuery):
     await show_menu(callback.message, page=page)
 
 
+# ---------------------- Меню одним сообщением ----------------------
+async def _build_menu_page(page: int):
+    """
+    Собирает страницу меню для режима одного сообщения
+    :return: (текст, фото обложки или None, клавиатура) или None, если меню пусто
+    """
+    total_pages = (await catalog.count() + MENU_PAGE_SIZE - 1) // MENU_PAGE_SIZE
+    if not total_pages:
+        return None
+
+    page = min(max(page, 1), total_pages)
+    dishes, _ = await catalog.get_page(page, MENU_PAGE_SIZE)
+
+    text = f"🍽 <b>Меню</b> — страница {page} из {total_pages}\n\n"
+    text += "\n".join(
+        f"{i}. <b>{dish['name']}</b> — 🔥 {dish['calories']} ккал · 💵 {dish['price']}₽"
+        for i, dish in enumerate(dishes, start=(page - 1) * MENU_PAGE_SIZE + 1)
+    )
+    cover = next((dish['photo'] for dish in dishes if dish['photo']), None)
+    return text, cover, build_menu_page_keyboard(dishes, page, total_pages)
+
+
+async def show_menu_single(message: Message, page: int = 1):
+    """
+    Показывает страницу меню одним сообщением
+    """
+    try:
+        rendered = await _build_menu_page(page)
+        if rendered is None:
+            await message.answer("🍽 Меню пока пусто. Зайдите позже!")
+            return
+
+        text, cover, keyboard = rendered
+        if cover:
+            await media_registry.answer_photo(message, cover, caption=text, reply_markup=keyboard)
+        else:
+            await message.answer(text, reply_markup=keyboard)
+
+    except Exception as e:
+        logger.error(f"Ошибка загрузки меню: {e}")
+        await message.answer("⚠ Произошла ошибка. Попробуйте позже.")
+
+
+@router.callback_query(F.data.startswith("menuview_page_"))
+async def menu_view_page_handler(callback: CallbackQuery):
+    """
+    Листает меню, редактируя то же сообщение
+    """
+    try:
+        page = int(callback.data.split("_")[2])
+        rendered = await _build_menu_page(page)
+        if rendered is None:
+            await callback.answer("🍽 Меню пока пусто")
+            return
+
+        text, cover, keyboard = rendered
+        message = callback.message
+        if cover and message.photo:
+            await media_registry.edit_photo(message, cover, caption=text, reply_markup=keyboard)
+        elif not cover and not message.photo:
+            await message.edit_text(text, reply_markup=keyboard)
+        else:
+            # Текстовое сообщение нельзя превратить в фото и наоборот
+            await message.delete()
+            await show_menu_single(message, page)
+
+        await callback.answer()
+
+    except TelegramBadRequest as e:
+        if "not modified" in str(e):
+            # Повторное нажатие на текущую страницу: сообщение уже такое
+            await callback.answer()
+            return
+        logger.error(f"Ошибка переключения страницы меню: {e}")
+        await callback.answer("⚠ Ошибка при загрузке меню", show_alert=True)
+    except Exception as e:
+        logger.error(f"Ошибка переключения страницы меню: {e}")
+        await callback.answer("⚠ Ошибка при загрузке меню", show_alert=True)
+
+
 @router.callback_query(F.data.startswith("dish_detail_"))
 async def show_dish_details(callback: CallbackQuery):
     """
@@ -95,7 +173,7 @@ async def show_dish_details(callback: CallbackQuery):
     """
     try:
         dish_id = int(callback.data.split("_")[2])
-        dish = get_dish_info(dish_id)
+        dish = await catalog.get_dish(dish_id)
 
         if not dish:
             await callback.answer("Блюдо не найдено")
@@ -110,7 +188,8 @@ async def show_dish_details(callback: CallbackQuery):
         )
 
         if dish['photo']:
-            await callback.message.answer_photo(
+            await media_registry.answer_photo(
+                callback.message,
                 dish['photo'],
                 caption=text,
                 reply_markup=build_dish_keyboard(dish_id))
@@ -128,45 +207,74 @@ async def show_dish_details(callback: CallbackQuery):
 
 @router.message(F.text == "⚙️ Фильтры")
 @router.message(Command("filters"))
-async def show_filters(message: Message):
+async def show_filters(message: Message, state: FSMContext):
     """
     Показывает доступные фильтры меню
     """
+    data = await state.get_data()
     await message.answer(
-        "Выберите тип блюд:",
-        reply_markup=build_filters_keyboard()
+        "Выберите тип блюд (можно несколько):",
+        reply_markup=build_filters_keyboard(tuple(data.get('menu_filters', [])))
     )
 
 
 @router.callback_query(F.data.startswith("filter_"))
-async def apply_filter(callback: CallbackQuery):
+async def apply_filter(callback: CallbackQuery, state: FSMContext):
     """
-    Применяет выбранный фильтр к меню
+    Включает или выключает фильтр меню. Фильтры комбинируются:
+    показываются блюда, у которых есть все выбранные теги
     """
-    filter_type = callback.data.split("_")[1]
+    filter_type = callback.data[len("filter_"):]
 
     try:
-        filters = {
-            'vegan': {'vegan': True},
-            'gluten_free': {'gluten_free': True},
-            'spicy': {'tags': '%острое%'},
-            'meat': {'tags': '%мясо%'},
-            'reset': {}
-        }.get(filter_type, {})
+        data = await state.get_data()
+        active = [f for f in data.get('menu_filters', []) if f in FILTER_TAGS]
+
+        if filter_type == 'reset':
+            active = []
+        elif filter_type in FILTER_TAGS:
+            if filter_type in active:
+                active.remove(filter_type)
+            else:
+                active.append(filter_type)
+        else:
+            await callback.answer()
+            return
 
-        dishes = search_dishes("", filters)
+        await state.update_data(menu_filters=active)
+        await callback.message.edit_reply_markup(
+            reply_markup=build_filters_keyboard(tuple(active)))
 
-        if not dishes:
+        if not active:
+            await callback.answer("Фильтры сброшены")
+            return
+
+        if not await _show_filtered_page(callback.message, active, page=1):
             await callback.answer("😕 По вашему запросу ничего не найдено")
             return
 
-        # Показываем первые 5 результатов
-        for dish in dishes[:5]:
-            text = f"<b>{dish['name']}</b>\n\n🔥 {dish['calories']} ккал\n💵 {dish['price']}₽"
-            await callback.message.answer(
-                text,
-                reply_markup=build_dish_keyboard(dish['dish_id']))
+        await callback.answer()
+
+    except Exception as e:
+        logger.error(f"Ошибка фильтрации: {e}")
+        await callback.answer("⚠ Ошибка при фильтрации", show_alert=True)
+
+
+@router.callback_query(F.data.startswith("filtered_page_"))
+async def filtered_page_handler(callback: CallbackQuery, state: FSMContext):
+    """
+    Переключает страницы отфильтрованного меню
+    """
+    try:
+        page = int(callback.data.split("_")[2])
+        data = await state.get_data()
+        active = [f for f in data.get('menu_filters', []) if f in FILTER_TAGS]
+        if not active:
+            await callback.answer("Фильтры сброшены")
+            return
 
+        await callback.message.delete()
+        await _show_filtered_page(callback.message, active, page)
         await callback.answer()
 
     except Exception as e:
@@ -174,6 +282,61 @@ async def apply_filter(callback: CallbackQuery):
         await callback.answer("⚠ Ошибка при фильтрации", show_alert=True)
 
 
+async def _show_filtered_page(message: Message, active: list, page: int) -> bool:
+    """
+    Отправляет страницу блюд, подходящих под все выбранные фильтры
+    :return: False, если подходящих блюд нет
+    """
+    tags = [FILTER_TAGS[f] for f in active]
+    dishes, total_pages = await catalog.filter_page(tags, page, MENU_PAGE_SIZE)
+    if not dishes:
+        return False
+
+    for dish in dishes:
+        text = f"<b>{dish['name']}</b>\n\n🔥 {dish['calories']} ккал\n💵 {dish['price']}₽"
+        await message.answer(
+            text,
+            reply_markup=build_dish_keyboard(dish['dish_id']))
+
+    if total_pages > 1:
+        await message.answer(
+            f"Страница {page} из {total_pages}",
+            reply_markup=build_pagination_keyboard(
+                page=page,
+                total_pages=total_pages,
+                prefix="filtered"
+            )
+        )
+    return True
+
+
+@router.message(Command("search"))
+async def search_menu_cmd(message: Message, command: CommandObject):
+    """
+    Ищет блюда по названию, тегам и описанию: /search запрос
+    """
+    if not command.args:
+        await message.answer("Введите запрос после команды, например: /search борщ")
+        return
+
+    try:
+        dishes = await search_menu(command.args, limit=5)
+
+        if not dishes:
+            await message.answer("😕 По вашему запросу ничего не найдено")
+            return
+
+        for dish in dishes:
+            text = f"<b>{dish['name']}</b>\n\n🔥 {dish['calories']} ккал\n💵 {dish['price']}₽"
+            await message.answer(
+                text,
+                reply_markup=build_dish_keyboard(dish['dish_id']))
+
+    except Exception as e:
+        logger.error(f"Ошибка поиска: {e}")
+        await message.answer("⚠ Ошибка при поиске")
+
+
 @router.message(F.text == "🔙 Назад в меню")
 async def back_to_menu(message: Message):
     """
@@ -6,7 +6,6 @@ from datetime import datetime
 import logging
 from typing import List, Optional
 
-from foodfit_bot.config.database import cursor, conn
 from foodfit_bot.keyboards.inline import build_order_control_kb
 from foodfit_bot.keyboards.reply import main_menu_kb, staff_kb
 from foodfit_bot.models.states import Form, DeliveryStates
@@ -15,18 +14,26 @@ from foodfit_bot.services.database_service import (
     get_user_orders,
     update_order_status
 )
-from foodfit_bot.utils.helpers import format_order_date
+from foodfit_bot.services.delivery_service import delivery_planner
+from foodfit_bot.services.order_board import order_board
+from foodfit_bot.services.send_scheduler import LANE_STAFF, SendLaneMiddleware
+from foodfit_bot.utils.helpers import extract_phone_number, format_order_date, parse_time_input
 
 router = Router()
 logger = logging.getLogger(__name__)
 
+# Роутер обслуживает и клиентов, и персонал: действия персонала с заказами
+# помечены флагом send_lane и отвечают раньше сообщений клиентам и рассылок
+router.message.middleware(SendLaneMiddleware())
+router.callback_query.middleware(SendLaneMiddleware())
+
 
 @router.message(F.text == "📦 Мои заказы")
 @router.message(Command("orders"))
 async def show_user_orders(message: Message):
     """Показывает историю заказов пользователя"""
     try:
-        orders = get_user_orders(message.from_user.id)
+        orders = await get_user_orders(message.from_user.id)
 
         if not orders:
             await message.answer("📭 У вас пока нет заказов")
@@ -54,7 +61,7 @@ async def show_order_details_handler(callback: CallbackQuery):
     """Показывает детали конкретного заказа"""
     try:
         order_id = int(callback.data.split("_")[2])
-        order = get_order_details(order_id)
+        order = await get_order_details(order_id)
 
         if not order:
             await callback.answer("Заказ не найден")
@@ -72,6 +79,13 @@ async def show_order_details_handler(callback: CallbackQuery):
         for item in order['items']:
             response += f"• {item['name']} × {item['quantity']} — {item['price'] * item['quantity']}₽\n"
 
+        delivery = await delivery_planner.get(order_id)
+        if delivery:
+            response += (
+                f"\n🚚 <b>Доставка:</b> {delivery['address']}\n"
+                f"⏱ Ожидаемое время: {format_order_date(delivery['eta'])}\n"
+            )
+
         await callback.message.answer(response)
         await callback.answer()
 
@@ -80,53 +94,31 @@ async def show_order_details_handler(callback: CallbackQuery):
         await callback.answer("⚠ Ошибка при загрузке информации", show_alert=True)
 
 
-@router.message(F.text == "📊 Открытые заказы")
+@router.message(F.text == "📊 Открытые заказы", flags={"send_lane": LANE_STAFF})
 async def show_active_orders(message: Message):
-    """Показывает активные заказы (для персонала)"""
+    """Показывает закрепленную доску активных заказов (для персонала)"""
     try:
-        cursor.execute("""
-            SELECT o.order_id, u.full_name, o.order_date, o.total_amount 
-            FROM orders o
-            JOIN users u ON o.user_id = u.user_id
-            WHERE o.status IN ('принят', 'готовится', 'в доставке')
-            ORDER BY o.order_date DESC
-        """)
-        orders = cursor.fetchall()
-
-        if not orders:
-            await message.answer("📭 Нет активных заказов")
-            return
-
-        response = "📊 <b>Активные заказы:</b>\n\n"
-        for order in orders:
-            order_id, customer, date, total = order
-            response += (
-                f"🆔 <b>#{order_id}</b>\n"
-                f"👤 {customer}\n"
-                f"📅 {format_order_date(date)}\n"
-                f"💵 {total}₽\n"
-                f"————————————\n"
-            )
-
-        await message.answer(
-            response,
-            reply_markup=staff_kb()
-        )
+        # Доска обновляется сама по событиям заказов
+        await order_board.post(message)
 
     except Exception as e:
         logger.error(f"Ошибка загрузки активных заказов: {e}")
         await message.answer("⚠ Ошибка при загрузке заказов")
 
 
-@router.callback_query(F.data.startswith("complete_order_"))
+@router.callback_query(F.data.startswith("complete_order_"), flags={"send_lane": LANE_STAFF})
 async def complete_order_handler(callback: CallbackQuery):
     """Отмечает заказ как завершенный"""
     try:
         order_id = int(callback.data.split("_")[2])
-        if update_order_status(order_id, "завершен"):
-            await callback.message.edit_text(
-                f"✅ Заказ #{order_id} отмечен как завершенный"
-            )
+        if await update_order_status(order_id, "завершен"):
+            if order_board.is_board(callback.message):
+                await callback.answer(f"✅ Заказ #{order_id} завершен")
+            else:
+                await callback.message.edit_text(
+                    f"✅ Заказ #{order_id} отмечен как завершенный"
+                )
+                await callback.answer()
         else:
             await callback.answer("⚠ Не удалось обновить статус", show_alert=True)
     except Exception as e:
@@ -134,16 +126,31 @@ async def complete_order_handler(callback: CallbackQuery):
         await callback.answer("⚠ Произошла ошибка", show_alert=True)
 
 
-@router.callback_query(F.data.startswith("to_delivery_"))
+@router.callback_query(F.data.startswith("cooking_order_"), flags={"send_lane": LANE_STAFF})
+async def cooking_order_handler(callback: CallbackQuery):
+    """Переводит заказ в статус 'готовится'"""
+    try:
+        order_id = int(callback.data.split("_")[2])
+        if await update_order_status(order_id, "готовится"):
+            await callback.answer(f"🍳 Заказ #{order_id} готовится")
+        else:
+            await callback.answer("⚠ Этот заказ нельзя перевести в статус 'готовится'", show_alert=True)
+    except Exception as e:
+        logger.error(f"Ошибка изменения статуса: {e}")
+        await callback.answer("⚠ Произошла ошибка", show_alert=True)
+
+
+@router.callback_query(F.data.startswith("to_delivery_"), flags={"send_lane": LANE_STAFF})
 async def to_delivery_handler(callback: CallbackQuery):
     """Переводит заказ в статус 'в доставке'"""
     try:
         order_id = int(callback.data.split("_")[2])
-        if update_order_status(order_id, "в доставке"):
+        if await update_order_status(order_id, "в доставке"):
             await callback.answer("🚚 Заказ передан в доставку")
-            await callback.message.edit_reply_markup(
-                reply_markup=build_order_control_kb(order_id)
-            )
+            if not order_board.is_board(callback.message):
+                await callback.message.edit_reply_markup(
+                    reply_markup=build_order_control_kb(order_id)
+                )
         else:
             await callback.answer("⚠ Не удалось обновить статус", show_alert=True)
     except Exception as e:
@@ -151,7 +158,7 @@ async def to_delivery_handler(callback: CallbackQuery):
         await callback.answer("⚠ Произошла ошибка", show_alert=True)
 
 
-@router.message(F.text == "✅ Завершить заказ")
+@router.message(F.text == "✅ Завершить заказ", flags={"send_lane": LANE_STAFF})
 async def ask_order_number(message: Message, state: FSMContext):
     """Запрашивает номер заказа для завершения"""
     await message.answer(
@@ -161,12 +168,12 @@ async def ask_order_number(message: Message, state: FSMContext):
     await state.set_state(Form.waiting_for_order_id)
 
 
-@router.message(Form.waiting_for_order_id)
+@router.message(Form.waiting_for_order_id, flags={"send_lane": LANE_STAFF})
 async def complete_order_by_number(message: Message, state: FSMContext):
     """Завершает заказ по номеру"""
     try:
         order_id = int(message.text)
-        if update_order_status(order_id, "завершен"):
+        if await update_order_status(order_id, "завершен"):
             await message.answer(
                 f"✅ Заказ #{order_id} отмечен как завершенный",
                 reply_markup=staff_kb()
@@ -194,8 +201,14 @@ async def complete_order_by_number(message: Message, state: FSMContext):
 @router.message(F.text == "🚚 Оформить доставку")
 async def start_delivery_process(message: Message, state: FSMContext):
     """Начинает процесс оформления доставки"""
+    order_id = await delivery_planner.find_order(message.from_user.id)
+    if order_id is None:
+        await message.answer("📭 Нет заказа для доставки. Сначала оформите заказ в корзине.")
+        return
+
+    await state.update_data(order_id=order_id)
     await message.answer(
-        "Введите адрес доставки:",
+        f"🚚 Доставка заказа #{order_id}\nВведите адрес доставки:",
         reply_markup=ReplyKeyboardRemove()
     )
     await state.set_state(DeliveryStates.waiting_address)
@@ -204,6 +217,9 @@ async def start_delivery_process(message: Message, state: FSMContext):
 @router.message(DeliveryStates.waiting_address)
 async def process_delivery_address(message: Message, state: FSMContext):
     """Обрабатывает адрес доставки"""
+    if not message.text:
+        await message.answer("❌ Введите адрес текстом")
+        return
     await state.update_data(address=message.text)
     await message.answer("Введите желаемое время доставки (например, 18:00):")
     await state.set_state(DeliveryStates.waiting_time)
@@ -212,7 +228,13 @@ async def process_delivery_address(message: Message, state: FSMContext):
 @router.message(DeliveryStates.waiting_time)
 async def process_delivery_time(message: Message, state: FSMContext):
     """Обрабатывает время доставки"""
-    await state.update_data(time=message.text)
+    requested = parse_time_input(message.text)
+    if requested is None:
+        await message.answer("❌ Введите время в формате ЧЧ:ММ, например 18:00")
+        return
+
+    # Прошедшее время означает доставку как можно скорее
+    await state.update_data(time=requested.strftime("%Y-%m-%d %H:%M:%S") if requested > datetime.now() else None)
     await message.answer("Введите номер телефона для связи:")
     await state.set_state(DeliveryStates.waiting_contact)
 
@@ -220,14 +242,26 @@ async def process_delivery_time(message: Message, state: FSMContext):
 @router.message(DeliveryStates.waiting_contact)
 async def process_delivery_contact(message: Message, state: FSMContext):
     """Завершает оформление доставки"""
+    phone = extract_phone_number(message.text or "")
+    if phone is None:
+        await message.answer("❌ Введите телефон в формате +7 999 123-45-67")
+        return
+
     data = await state.get_data()
+    requested = datetime.strptime(data['time'], "%Y-%m-%d %H:%M:%S") if data.get('time') else None
+    delivery = await delivery_planner.create(
+        data['order_id'], message.from_user.id, data['address'], phone, requested)
+    await state.clear()
+
+    if delivery is None:
+        await message.answer("⚠ Не удалось оформить доставку", reply_markup=main_menu_kb())
+        return
 
-    # Здесь можно добавить сохранение данных доставки в БД
     await message.answer(
-        f"🚚 Доставка оформлена!\n\n"
+        f"🚚 Доставка заказа #{data['order_id']} оформлена!\n\n"
         f"Адрес: {data['address']}\n"
-        f"Время: {data['time']}\n"
-        f"Контакт: {message.text}",
+        f"Зона: {delivery['zone'] or 'вне зон, время ориентировочное'}\n"
+        f"Ожидаемое время: {delivery['eta'].strftime('%H:%M')}\n"
+        f"Контакт: {phone}",
         reply_markup=main_menu_kb()
-    )
-    await state.clear()
\ No newline at end of file
+    )
\ No newline at end of file
@@ -114,6 +114,12 @@ def build_order_control_kb(order_id: int) -> InlineKeyboardMarkup:
     :return: InlineKeyboardMarkup
     """
     builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(
+            text="🍳 Готовится",
+            callback_data=f"cooking_order_{order_id}"
+        )
+    )
     builder.row(
         InlineKeyboardButton(
             text="✅ Завершить",
@@ -133,16 +139,24 @@ def build_order_control_kb(order_id: int) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def build_filters_keyboard() -> InlineKeyboardMarkup:
-    """Клавиатура фильтров меню"""
+def build_filters_keyboard(active: tuple = ()) -> InlineKeyboardMarkup:
+    """
+    Клавиатура фильтров меню
+    :param active: Включенные фильтры, они помечаются галочкой
+    :return: InlineKeyboardMarkup
+    """
+    def _button(text: str, filter_type: str) -> InlineKeyboardButton:
+        mark = "✅ " if filter_type in active else ""
+        return InlineKeyboardButton(text=f"{mark}{text}", callback_data=f"filter_{filter_type}")
+
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="🥗 Веган", callback_data="filter_vegan"),
-        InlineKeyboardButton(text="🚫 Без глютена", callback_data="filter_gluten_free")
+        _button("🥗 Веган", "vegan"),
+        _button("🚫 Без глютена", "gluten_free")
     )
     builder.row(
-        InlineKeyboardButton(text="🔥 Острое", callback_data="filter_spicy"),
-        InlineKeyboardButton(text="🍗 Мясное", callback_data="filter_meat")
+        _button("🔥 Острое", "spicy"),
+        _button("🍗 Мясное", "meat")
     )
     builder.row(
         InlineKeyboardButton(text="❌ Сбросить фильтры", callback_data="filter_reset")
@@ -177,4 +191,98 @@ def build_pagination_keyboard(page: int, total_pages: int, prefix: str) -> Inlin
             callback_data=f"{prefix}_page_{page + 1}"
         ))
 
-    return builder.as_markup()
\ No newline at end of file
+    return builder.as_markup()
+
+
+def build_menu_page_keyboard(dishes: list, page: int, total_pages: int) -> InlineKeyboardMarkup:
+    """
+    Клавиатура страницы меню в режиме одного сообщения
+    :param dishes: Блюда текущей страницы
+    :param page: Текущая страница
+    :param total_pages: Всего страниц
+    :return: InlineKeyboardMarkup
+    """
+    builder = InlineKeyboardBuilder()
+
+    for dish in dishes:
+        builder.row(
+            InlineKeyboardButton(
+                text=f"🔍 {dish['name'][:24]}",
+                callback_data=f"dish_detail_{dish['dish_id']}"
+            ),
+            InlineKeyboardButton(
+                text="➕",
+                callback_data=f"cart_{dish['dish_id']}"
+            )
+        )
+
+    if total_pages > 1:
+        builder.attach(InlineKeyboardBuilder.from_markup(
+            build_pagination_keyboard(page=page, total_pages=total_pages, prefix="menuview")
+        ))
+
+    return builder.as_markup()
+
+
+def build_mailing_confirm_kb() -> InlineKeyboardMarkup:
+    """
+    Клавиатура подтверждения запуска рассылки
+    :return: InlineKeyboardMarkup
+    """
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="📨 Отправить всем", callback_data="mailing_confirm"),
+        InlineKeyboardButton(text="❌ Отмена", callback_data="mailing_cancel")
+    )
+    return builder.as_markup()
+
+
+def build_mailing_stop_kb(mailing_id: int) -> InlineKeyboardMarkup:
+    """
+    Клавиатура остановки идущей рассылки
+    :param mailing_id: ID рассылки
+    :return: InlineKeyboardMarkup
+    """
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="⏹ Остановить", callback_data=f"mailing_stop_{mailing_id}")
+    )
+    return builder.as_markup()
+
+
+def build_promo_list_kb(promos: list) -> InlineKeyboardMarkup:
+    """
+    Клавиатура отключения активных акций
+    :param promos: Акции (как PromoEngine.list_active)
+    :return: InlineKeyboardMarkup
+    """
+    builder = InlineKeyboardBuilder()
+    for promo in promos:
+        title = promo['code'] or f"#{promo['promo_id']}"
+        builder.row(
+            InlineKeyboardButton(
+                text=f"⛔ Отключить {title}",
+                callback_data=f"promo_off_{promo['promo_id']}"
+            )
+        )
+    return builder.as_markup()
+
+
+def build_stats_period_kb() -> InlineKeyboardMarkup:
+    """
+    Клавиатура выбора периода статистики продаж
+    :return: InlineKeyboardMarkup
+    """
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="Сегодня", callback_data="stats_period_today"),
+        InlineKeyboardButton(text="7 дней", callback_data="stats_period_week")
+    )
+    builder.row(
+        InlineKeyboardButton(text="30 дней", callback_data="stats_period_month"),
+        InlineKeyboardButton(text="Этот месяц", callback_data="stats_period_current")
+    )
+    builder.row(
+        InlineKeyboardButton(text="365 дней", callback_data="stats_period_year")
+    )
+    return builder.as_markup()
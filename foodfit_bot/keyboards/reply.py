@@ -25,6 +25,14 @@ def admin_kb() -> ReplyKeyboardMarkup:
         KeyboardButton(text="✏️ Редактировать блюдо"),
         KeyboardButton(text="❌ Удалить блюдо")
     )
+    builder.row(
+        KeyboardButton(text="📈 Статистика"),
+        KeyboardButton(text="📨 Рассылка")
+    )
+    builder.row(
+        KeyboardButton(text="📤 Экспорт заказов"),
+        KeyboardButton(text="🎟 Акции")
+    )
     builder.row(
         KeyboardButton(text="👥 Режим официанта"),
         KeyboardButton(text="🔙 Выход")
@@ -43,6 +51,7 @@ def staff_kb() -> ReplyKeyboardMarkup:
         KeyboardButton(text="🔄 Обновить список")
     )
     builder.row(
+        KeyboardButton(text="⏱ Метрики кухни"),
         KeyboardButton(text="🔙 Главное меню")
     )
     return builder.as_markup(resize_keyboard=True)
@@ -1,30 +1,89 @@
+import asyncio
+import signal
 import logging
 from aiogram import Bot, Dispatcher
-from config.config import BOT_TOKEN
-from config.database import init_db
-from handlers import commands, admin, cart, menu, orders, staff
-from handlers import setup_routers
+from aiogram.fsm.storage.memory import MemoryStorage
+from foodfit_bot.config.config import (
+    BOT_MODE, BOT_TOKEN, FSM_STORAGE, WEBHOOK_HOST, WEBHOOK_PATH, WEBHOOK_PORT,
+    WEBHOOK_SECRET, WEBHOOK_URL
+)
+from foodfit_bot.config.database import db, init_db
+from foodfit_bot.handlers import setup_routers
+from foodfit_bot.services.ai_cache import ai_cache
+from foodfit_bot.services.ai_service import ai_client
+from foodfit_bot.services.cart_buffer import cart_buffer
+from foodfit_bot.services.delivery_service import delivery_planner
+from foodfit_bot.services.fsm_storage import SQLiteStorage
+from foodfit_bot.services.mailing import mailing_service
+from foodfit_bot.services.metrics import metrics
+from foodfit_bot.services.order_board import order_board
+from foodfit_bot.services.scheduler import scheduler
+from foodfit_bot.services.send_scheduler import send_scheduler
+from foodfit_bot.services.webhook import WebhookServer
 
 # Инициализация
 bot = Bot(BOT_TOKEN)
-dp = Dispatcher()
 
-# Регистрация обработчиков
-dp.include_router(orders.router)
-dp.include_router(staff.router)
-dp.include_router(commands.router)
-dp.include_router(admin.router)
-dp.include_router(cart.router)
-dp.include_router(menu.router)
+
+async def run_webhook(dp: Dispatcher) -> None:
+    """Принимает обновления через вебхук до SIGINT/SIGTERM, затем дорабатывает очередь"""
+    server = WebhookServer(dp, bot, path=WEBHOOK_PATH, secret=WEBHOOK_SECRET)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: остановка по Ctrl+C через отмену задачи
+            pass
+
+    await server.start(WEBHOOK_HOST, WEBHOOK_PORT)
+    try:
+        await bot.set_webhook(
+            WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types())
+        await stop.wait()
+    finally:
+        await server.stop()
+        await bot.session.close()
 
 
 async def main():
-    dp = Dispatcher()
+    storage = SQLiteStorage() if FSM_STORAGE == "sqlite" else MemoryStorage()
+    dp = Dispatcher(storage=storage)
     dp.include_router(setup_routers())
+    # Лимиты отправки раньше метрик: время ожидания очереди не попадает во время вызовов API
+    send_scheduler.install(bot)
+    metrics.install(dp, bot, db)
+    metrics.register("foodfit_send_queue_depth", "gauge", "Отправки в очереди по полосам",
+                     "lane", send_scheduler.queue_metrics)
+    metrics.register("foodfit_send_total", "counter", "Отправки через планировщик",
+                     "result", send_scheduler.send_metrics)
+    metrics.register("foodfit_ai_cache_total", "counter", "Обращения к кэшу ответов AI",
+                     "event", ai_cache.cache_metrics)
     init_db()
-    await dp.start_polling(bot)
+    scheduler.start()
+    await order_board.start(bot)
+    delivery_planner.start()
+    await mailing_service.start(bot)
+    await metrics.start()
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook(dp)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        await metrics.stop()
+        await mailing_service.stop()
+        await scheduler.stop()
+        await order_board.stop()
+        await delivery_planner.stop()
+        await dp.storage.close()
+        await cart_buffer.close()
+        await ai_client.close()
+        db.close()
 
 
 if __name__ == "__main__":
-    import asyncio
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
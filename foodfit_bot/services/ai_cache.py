@@ -0,0 +1,118 @@
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from foodfit_bot.config.database import db
+
+logger = logging.getLogger(__name__)
+
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", str(7 * 24 * 3600)))
+AI_CACHE_MAX_BYTES = int(os.getenv("AI_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+AI_CACHE_PURGE_EVERY = 50
+
+
+class AICache:
+    """Кэш ответов LLM в таблице ai_cache.
+
+    Ключ - sha256 от модели, сообщений и параметров запроса, поэтому
+    одинаковые промпты с разными параметрами не смешиваются. Записи
+    живут ttl секунд, при превышении max_bytes вытесняются самые давно
+    использованные.
+    """
+
+    def __init__(self, ttl: int = AI_CACHE_TTL, max_bytes: int = AI_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(data: Dict) -> str:
+        """Строит ключ по телу запроса к модели"""
+        payload = json.dumps(data, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, data: Dict) -> Optional[str]:
+        """Возвращает сохраненный ответ или None"""
+        key = self.make_key(data)
+        now = time.time()
+        try:
+            row = await db.fetchone(
+                "SELECT response FROM ai_cache WHERE key = ? AND expires_at > ?",
+                (key, now))
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            await db.write("UPDATE ai_cache SET last_access = ? WHERE key = ?", (now, key))
+            return row[0]
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка чтения кэша AI: {e}")
+            self.misses += 1
+            return None
+
+    async def set(self, data: Dict, response: str, ttl: Optional[int] = None) -> None:
+        """Сохраняет ответ модели"""
+        now = time.time()
+        try:
+            await db.write(
+                """INSERT OR REPLACE INTO ai_cache (key, model, response, size, created_at, last_access, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (self.make_key(data), data.get('model'), response, len(response.encode("utf-8")),
+                 now, now, now + (ttl or self.ttl)))
+            self.stores += 1
+            if self.stores % AI_CACHE_PURGE_EVERY == 0:
+                await self.purge()
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка записи кэша AI: {e}")
+
+    async def purge(self) -> int:
+        """
+        Удаляет просроченные записи и вытесняет старые сверх max_bytes
+        :return: Количество удаленных записей
+        """
+        def _purge(conn: sqlite3.Connection) -> int:
+            expired = conn.execute(
+                "DELETE FROM ai_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+            evicted = conn.execute("""
+                DELETE FROM ai_cache WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY last_access DESC) AS running
+                        FROM ai_cache
+                    ) WHERE running > ?
+                )
+            """, (self.max_bytes,)).rowcount
+            return expired + evicted
+
+        try:
+            removed = await db.run(_purge)
+            self.evictions += removed
+            return removed
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка очистки кэша AI: {e}")
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий и промахов"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+    def cache_metrics(self) -> Dict[str, int]:
+        """Счетчики кэша для метрик: попадания, промахи, записи, вытеснения"""
+        return {'hit': self.hits, 'miss': self.misses, 'store': self.stores, 'eviction': self.evictions}
+
+
+ai_cache = AICache()
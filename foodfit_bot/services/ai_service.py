@@ -1,14 +1,93 @@
 import re
+import os
+import time
+import asyncio
 import logging
-import requests
-from typing import Optional
+import aiohttp
+from typing import Dict, Optional
 from datetime import datetime
 
 from foodfit_bot.config.config import API_URL, API_HEADERS
+from foodfit_bot.services.ai_cache import ai_cache
+from foodfit_bot.services.metrics import metrics
 from foodfit_bot.utils.helpers import clean_text
 
 logger = logging.getLogger(__name__)
 
+AI_TIMEOUT = 10
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+AI_BACKOFF_BASE = 0.5
+AI_BACKOFF_MAX = 8.0
+RECOMMENDATION_CACHE_TTL = 6 * 3600
+
+
+class AIClient:
+    """Асинхронный клиент LLM API.
+
+    Держит одну keep-alive сессию на весь процесс и ограничивает число
+    одновременных запросов семафором, чтобы генерация описаний не
+    занимала все соединения и не блокировала обработчики.
+    """
+
+    def __init__(self, url: str, headers: Dict[str, str], max_concurrency: int = AI_MAX_CONCURRENCY):
+        self.url = url
+        self.headers = headers
+        self.max_concurrency = max_concurrency
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    @staticmethod
+    def backoff_delay(attempt: int) -> float:
+        """Экспоненциальная задержка перед повтором"""
+        return min(AI_BACKOFF_BASE * 2 ** attempt, AI_BACKOFF_MAX)
+
+    async def complete(self, data: Dict, timeout: float = AI_TIMEOUT, retries: int = 0) -> str:
+        """
+        Отправляет запрос chat/completions и возвращает текст ответа
+        :param data: Тело запроса
+        :param timeout: Таймаут одного запроса в секундах
+        :param retries: Количество повторов при сетевых ошибках
+        :return: Содержимое первого ответа модели
+        """
+        session = self._get_session()
+        started = time.perf_counter()
+        try:
+            for attempt in range(retries + 1):
+                try:
+                    async with self._semaphore:
+                        async with session.post(
+                                self.url,
+                                json=data,
+                                timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                            response.raise_for_status()
+                            result = await response.json()
+                    return result['choices'][0]['message']['content']
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if attempt >= retries:
+                        raise
+                    logger.warning(f"Ошибка запроса к AI (попытка {attempt + 1}): {e}")
+                    await asyncio.sleep(self.backoff_delay(attempt))
+        finally:
+            metrics.record_llm(time.perf_counter() - started)
+
+    async def close(self) -> None:
+        """Закрывает HTTP-сессию"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+ai_client = AIClient(API_URL, API_HEADERS)
+
 
 class AIService:
     @staticmethod
@@ -49,18 +128,20 @@ class AIService:
             ]
         }
 
+        cached = await ai_cache.get(data)
+        if cached:
+            return cached
+
         for attempt in range(attempts):
             try:
-                response = requests.post(API_URL, headers=API_HEADERS, json=data)
-                response.raise_for_status()
-                result = response.json()
-                description = result['choices'][0]['message']['content']
+                description = await ai_client.complete(data, timeout=AI_TIMEOUT)
 
                 # Очистка ответа
                 description = re.sub(r'<[^>]+>|Хорошо,|Итак,|Давай|\.\.\.', '', description).strip()
 
                 # Проверка качества
                 if len(description.split()) >= 6 and '.' in description:  # Минимум 6 слов и точка
+                    await ai_cache.set(data, description)
                     return description
 
                 logger.warning(f"Слишком короткое описание, попытка {attempt + 1}")
@@ -68,6 +149,9 @@ class AIService:
             except Exception as e:
                 logger.error(f"Ошибка генерации описания (попытка {attempt + 1}): {str(e)}")
 
+            if attempt + 1 < attempts:
+                await asyncio.sleep(ai_client.backoff_delay(attempt))
+
         return None
 
     @staticmethod
@@ -102,12 +186,14 @@ class AIService:
                 "max_tokens": 150
             }
 
-            response = requests.post(API_URL, headers=API_HEADERS, json=data, timeout=7)
-            response.raise_for_status()
+            cached = await ai_cache.get(data)
+            if cached:
+                return cached
 
-            result = response.json()
-            recommendation = result['choices'][0]['message']['content']
-            return clean_text(recommendation.split('\n')[0].strip())  # Возвращаем только название
+            recommendation = await ai_client.complete(data, timeout=7)
+            recommendation = clean_text(recommendation.split('\n')[0].strip())  # Возвращаем только название
+            await ai_cache.set(data, recommendation, ttl=RECOMMENDATION_CACHE_TTL)
+            return recommendation
 
         except Exception as e:
             logger.error(f"Ошибка генерации рекомендации: {str(e)}")
@@ -145,11 +231,7 @@ class AIService:
                 "response_format": {"type": "json_object"}
             }
 
-            response = requests.post(API_URL, headers=API_HEADERS, json=data, timeout=10)
-            response.raise_for_status()
-
-            result = response.json()
-            return result['choices'][0]['message']['content']
+            return await ai_client.complete(data, timeout=10)
 
         except Exception as e:
             logger.error(f"Ошибка анализа отзыва: {str(e)}")
@@ -160,11 +242,11 @@ class AIService:
             }
 
     @staticmethod
-    async def generate_daily_special(date: datetime = None) -> str:
+    async def generate_daily_special(date: datetime = None) -> Optional[str]:
         """
         Генерирует предложение дня
         :param date: Дата для сезонного предложения
-        :return: Текст предложения
+        :return: Текст предложения или None, если LLM недоступна
         """
         date_str = date.strftime("%d %B") if date else "сегодня"
 
@@ -194,15 +276,18 @@ class AIService:
                 "max_tokens": 200
             }
 
-            response = requests.post(API_URL, headers=API_HEADERS, json=data, timeout=7)
-            response.raise_for_status()
+            cached = await ai_cache.get(data)
+            if cached:
+                return cached
 
-            result = response.json()
-            return clean_text(result['choices'][0]['message']['content'])
+            special = clean_text(await ai_client.complete(data, timeout=7))
+            # Без даты промпт одинаков каждый день, поэтому храним недолго
+            await ai_cache.set(data, special, ttl=None if date else 3600)
+            return special
 
         except Exception as e:
             logger.error(f"Ошибка генерации предложения: {str(e)}")
-            return f"🍽 Специальное предложение {date_str}!\nПопробуйте наш шеф-сюрприз со скидкой 15%!"
+            return None
 
 
 # Функции для быстрого доступа (можно вызывать напрямую)
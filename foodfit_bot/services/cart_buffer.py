@@ -0,0 +1,162 @@
+import asyncio
+import os
+import sqlite3
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from foodfit_bot.config.database import db
+from foodfit_bot.services.database_service import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+# Пауза после последнего нажатия +/-, после которой изменения пишутся в БД
+CART_DEBOUNCE_MS = int(os.getenv("CART_DEBOUNCE_MS", "700"))
+
+RenderCallback = Callable[[List[Dict]], Awaitable[None]]
+
+
+class _CartState:
+    __slots__ = ('items', 'dirty', 'timer', 'render')
+
+    def __init__(self, items: List[Dict]):
+        self.items: Dict[int, Dict] = {item['dish_id']: item for item in items}
+        self.dirty: Dict[int, int] = {}
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.render: Optional[RenderCallback] = None
+
+
+class CartBuffer:
+    """Буфер изменений количества в корзине.
+
+    Серия нажатий +/- одного пользователя применяется к корзине в памяти.
+    Через CART_DEBOUNCE_MS после последнего нажатия накопленные количества
+    пишутся одной записью, а затем вызывается render последнего нажатия,
+    то есть сообщение корзины редактируется один раз — на итоговом
+    состоянии. После записи состояние удаляется из памяти, и следующая
+    серия начинается с чтения корзины из БД.
+    """
+
+    def __init__(self, debounce_ms: int = CART_DEBOUNCE_MS):
+        self.debounce = debounce_ms / 1000
+        self._carts: Dict[int, _CartState] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def _state(self, user_id: int) -> _CartState:
+        state = self._carts.get(user_id)
+        if state is None:
+            items = await DatabaseService.get_cart_contents(user_id)
+            # Пока шло чтение, состояние могло появиться из другого нажатия
+            state = self._carts.setdefault(user_id, _CartState(items))
+        return state
+
+    async def change_quantity(self, user_id: int, dish_id: int, delta: int,
+                              render: RenderCallback) -> Optional[int]:
+        """
+        Меняет количество блюда в памяти и откладывает запись
+        :param user_id: ID пользователя
+        :param dish_id: ID блюда
+        :param delta: Изменение количества (+1 или -1)
+        :param render: Корутина, которая получит итоговое содержимое корзины
+        :return: Новое количество, 0 если меньше минимума, None если блюда нет в корзине
+        """
+        state = await self._state(user_id)
+        item = state.items.get(dish_id)
+        if item is None:
+            return None
+
+        quantity = item['quantity'] + delta
+        if quantity < 1:
+            return 0
+
+        item['quantity'] = quantity
+        state.dirty[dish_id] = quantity
+        state.render = render
+
+        if state.timer is not None:
+            state.timer.cancel()
+        loop = asyncio.get_running_loop()
+        state.timer = loop.call_later(self.debounce, self._schedule_flush, user_id)
+        return quantity
+
+    def _schedule_flush(self, user_id: int) -> None:
+        state = self._carts.get(user_id)
+        if state is not None:
+            state.timer = None
+        task = asyncio.create_task(self.flush(user_id, render=True))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self, user_id: int, render: bool = False) -> bool:
+        """
+        Записывает накопленные изменения пользователя в БД.
+        Вызывается перед любыми другими операциями с корзиной.
+        :param render: Вызвать render последнего нажатия после записи
+        :return: False, если запись не удалась и изменения остались в памяти
+        """
+        if user_id not in self._carts:
+            # Нечего записывать: замок не заводим, чтобы не копить их для всех пользователей
+            return True
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            state = self._carts.get(user_id)
+            if state is None:
+                # Пока ждали замок, изменения уже записал другой вызов
+                self._locks.pop(user_id, None)
+                return True
+            if not render and state.timer is not None:
+                state.timer.cancel()
+                state.timer = None
+
+            dirty, state.dirty = state.dirty, {}
+            if dirty:
+                rows = [(quantity, user_id, dish_id) for dish_id, quantity in dirty.items()]
+                try:
+                    await db.write_run(lambda conn: conn.executemany(
+                        "UPDATE cart SET quantity = ? WHERE user_id = ? AND dish_id = ?", rows))
+                except sqlite3.Error as e:
+                    logger.error(f"Ошибка записи корзины, повторим позже: {e}")
+                    # Нажатия, пришедшие во время записи, новее неудавшихся
+                    state.dirty = {**dirty, **state.dirty}
+                    if state.timer is None:
+                        state.timer = asyncio.get_running_loop().call_later(
+                            self.debounce, self._schedule_flush, user_id)
+                    # Сообщение не перерисовываем: в БД этих количеств нет
+                    return False
+
+            if state.timer is not None or state.dirty:
+                # За время записи пришли новые нажатия, отрисует следующая запись
+                return True
+
+            self._carts.pop(user_id, None)
+            self._locks.pop(user_id, None)
+            if render and state.render is not None:
+                try:
+                    await state.render(list(state.items.values()))
+                except Exception as e:
+                    logger.error(f"Ошибка обновления сообщения корзины: {e}")
+        return True
+
+    def has_pending(self, user_id: int) -> bool:
+        """Проверяет, есть ли у пользователя не записанные в БД изменения"""
+        state = self._carts.get(user_id)
+        return state is not None and bool(state.dirty)
+
+    def discard(self, user_id: int) -> None:
+        """Забывает изменения пользователя без записи (корзина уже оформлена в заказ)"""
+        state = self._carts.pop(user_id, None)
+        if state is not None and state.timer is not None:
+            state.timer.cancel()
+        lock = self._locks.get(user_id)
+        if lock is not None and not lock.locked():
+            self._locks.pop(user_id, None)
+
+    async def close(self) -> None:
+        """Записывает все отложенные изменения (при остановке бота)"""
+        for user_id in list(self._carts):
+            await self.flush(user_id)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+cart_buffer = CartBuffer()
@@ -0,0 +1,173 @@
+import asyncio
+import sqlite3
+import logging
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from foodfit_bot.config.database import db
+
+logger = logging.getLogger(__name__)
+
+
+class DishRecord(NamedTuple):
+    dish_id: int
+    name: str
+    description: Optional[str]
+    price: int
+    calories: int
+    tags: Optional[str]
+    photo: Optional[str]
+
+
+class MenuCatalog:
+    """Кэш меню в памяти со сквозным чтением.
+
+    Меню целиком загружается одним запросом, сортируется по названию и
+    режется на страницы. Админские обработчики после изменения блюд
+    вызывают invalidate(), и следующее чтение перезагружает каталог.
+    Просмотр меню в остальное время не обращается к БД.
+
+    Теги из dish_tags при загрузке превращаются в битовые маски: каждому
+    тегу выдается свой бит, у каждого блюда маска его тегов. Фильтр по
+    любому набору тегов — это проверка mask & required == required.
+    """
+
+    def __init__(self):
+        self._by_id: Dict[int, DishRecord] = {}
+        self._ordered: Tuple[DishRecord, ...] = ()
+        self._pages: Dict[int, List[Tuple[DishRecord, ...]]] = {}
+        self._masks: Tuple[int, ...] = ()
+        self._tag_bits: Dict[str, int] = {}
+        self._filtered: Dict[int, Tuple[DishRecord, ...]] = {}
+        self._version = 0
+        self._loaded_version = -1
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def version(self) -> int:
+        """Версия каталога, увеличивается при каждом изменении меню"""
+        return self._version
+
+    def invalidate(self) -> None:
+        """Помечает каталог устаревшим (вызывается после изменения меню)"""
+        self._version += 1
+
+    async def ensure_loaded(self) -> None:
+        """Загружает меню из БД, если каталог устарел"""
+        if self._loaded_version == self._version:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if self._loaded_version == self._version:
+                return
+            version = self._version
+            try:
+                rows, tag_rows = await db.run(self._load)
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка загрузки каталога меню: {e}")
+                raise
+
+            tag_bits: Dict[str, int] = {}
+            dish_masks: Dict[int, int] = {}
+            for dish_id, tag in tag_rows:
+                bit = tag_bits.setdefault(tag, 1 << len(tag_bits))
+                dish_masks[dish_id] = dish_masks.get(dish_id, 0) | bit
+
+            records = tuple(DishRecord(*row) for row in rows)
+            self._ordered = records
+            self._by_id = {record.dish_id: record for record in records}
+            self._masks = tuple(dish_masks.get(record.dish_id, 0) for record in records)
+            self._tag_bits = tag_bits
+            self._pages = {}
+            self._filtered = {}
+            self._loaded_version = version
+            logger.info(f"Каталог меню загружен: {len(records)} блюд, версия {version}")
+
+    @staticmethod
+    def _load(conn: sqlite3.Connection) -> Tuple[List[tuple], List[tuple]]:
+        """Читает меню и связи с тегами в одной транзакции"""
+        rows = conn.execute(
+            "SELECT dish_id, name, description, price, calories, tags, photo FROM menu ORDER BY name").fetchall()
+        tag_rows = conn.execute(
+            """SELECT dt.dish_id, t.name FROM dish_tags dt
+            JOIN tags t ON t.tag_id = dt.tag_id ORDER BY t.tag_id""").fetchall()
+        return rows, tag_rows
+
+    async def records(self) -> Tuple[DishRecord, ...]:
+        """Все блюда, отсортированные по названию"""
+        await self.ensure_loaded()
+        return self._ordered
+
+    async def versioned_records(self) -> Tuple[int, Tuple[DishRecord, ...]]:
+        """
+        Все блюда вместе с версией, из которой они загружены.
+        Версия берется у загруженных данных, а не текущая: меню могли
+        изменить, пока шла загрузка.
+        :return: (версия, блюда)
+        """
+        await self.ensure_loaded()
+        return self._loaded_version, self._ordered
+
+    async def count(self) -> int:
+        """Количество блюд в меню"""
+        await self.ensure_loaded()
+        return len(self._ordered)
+
+    async def get_dish(self, dish_id: int) -> Optional[Dict]:
+        """Возвращает блюдо в формате DatabaseService.get_dish_info"""
+        await self.ensure_loaded()
+        record = self._by_id.get(dish_id)
+        return record._asdict() if record else None
+
+    async def get_page(self, page: int, page_size: int) -> Tuple[List[Dict], int]:
+        """
+        Возвращает страницу меню
+        :param page: Номер страницы, начиная с 1
+        :param page_size: Размер страницы
+        :return: (блюда страницы, всего страниц)
+        """
+        await self.ensure_loaded()
+        pages = self._pages.get(page_size)
+        if pages is None:
+            pages = [self._ordered[i:i + page_size] for i in range(0, len(self._ordered), page_size)]
+            self._pages[page_size] = pages
+
+        if not 1 <= page <= len(pages):
+            return [], len(pages)
+        return [record._asdict() for record in pages[page - 1]], len(pages)
+
+    async def filter_page(self, tags: Iterable[str], page: int,
+                          page_size: int) -> Tuple[List[Dict], int]:
+        """
+        Возвращает страницу блюд, у которых есть все указанные теги
+        :param tags: Канонические теги (см. utils.tags.FILTER_TAGS)
+        :param page: Номер страницы, начиная с 1
+        :param page_size: Размер страницы
+        :return: (блюда страницы, всего страниц)
+        """
+        await self.ensure_loaded()
+        required = 0
+        for tag in tags:
+            bit = self._tag_bits.get(tag)
+            if bit is None:
+                # Тега нет ни у одного блюда
+                return [], 0
+            required |= bit
+
+        matched = self._filtered.get(required)
+        if matched is None:
+            matched = tuple(
+                record for record, mask in zip(self._ordered, self._masks)
+                if mask & required == required
+            )
+            self._filtered[required] = matched
+
+        total_pages = (len(matched) + page_size - 1) // page_size
+        if not 1 <= page <= total_pages:
+            return [], total_pages
+        start = (page - 1) * page_size
+        return [record._asdict() for record in matched[start:start + page_size]], total_pages
+
+
+catalog = MenuCatalog()
@@ -3,11 +3,101 @@ import logging
 from typing import Optional, List, Dict, Union, Tuple
 from datetime import datetime
 from foodfit_bot.config.config import ADMIN_IDS
-from foodfit_bot.config.database import conn, cursor
+from foodfit_bot.config.database import db
+from foodfit_bot.services.order_lifecycle import (
+    STATUS_CODES, STATUS_NAMES, InvalidTransition, OrderStatus,
+    apply_transition, read_stage_metrics, record_created
+)
+from foodfit_bot.services.promo import PromoSet, promo_engine
+from foodfit_bot.services.order_bus import (
+    ORDER_COMPLETED, ORDER_CREATED, ORDER_STATUS_CHANGED, COMPLETED_STATUS,
+    OrderEvent, order_bus
+)
+from foodfit_bot.services.sales_stats import (
+    read_report, record_order as record_order_sales, remove_order as remove_order_sales
+)
+from foodfit_bot.utils.tags import FILTER_TAGS, save_dish_tags
 
 logger = logging.getLogger(__name__)
 
 
+def checkout_cart(conn: sqlite3.Connection, user_id: int, order_date: str,
+                  idempotency_key: Optional[str] = None, promos: Optional[PromoSet] = None,
+                  promo_code: Optional[str] = None) -> Dict:
+    """
+    Переносит корзину в заказ: заказ, позиции и очистка корзины.
+    Сумма и цены берутся из меню в SQL. Повторный вызов с тем же
+    idempotency_key не создает второй заказ, а возвращает первый.
+    Скидка по акциям считается за один проход по позициям корзины.
+    Вызывается внутри транзакции (db.run).
+    :param promos: Снимок активных акций (promo_engine.promos())
+    :param promo_code: Введенный пользователем промокод
+    :return: Заказ с полем created или {}, если корзина пуста
+    """
+    # Первая же операция — запись, поэтому параллельное оформление
+    # ждет блокировку и затем упирается в уникальный ключ
+    order = conn.execute('''
+        INSERT OR IGNORE INTO orders
+            (user_id, order_date, total_amount, status, status_code, idempotency_key)
+        SELECT ?, ?, SUM(m.price * c.quantity), ?, ?, ?
+        FROM cart c JOIN menu m ON c.dish_id = m.dish_id
+        WHERE c.user_id = ?
+        HAVING COUNT(*) > 0
+        RETURNING order_id, order_date, total_amount, discount, promo_id
+    ''', (user_id, order_date, STATUS_NAMES[OrderStatus.ACCEPTED], int(OrderStatus.ACCEPTED),
+          idempotency_key, user_id)).fetchone()
+
+    created = order is not None
+    if created:
+        # Позиции читаются один раз: из них же пишутся order_items,
+        # дневные агрегаты и ответ, без повторных JOIN с меню
+        lines = conn.execute('''
+            SELECT c.dish_id, c.quantity, m.price, COALESCE(m.calories, 0), m.name
+            FROM cart c JOIN menu m ON c.dish_id = m.dish_id
+            WHERE c.user_id = ?
+        ''', (user_id,)).fetchall()
+        conn.executemany(
+            "INSERT INTO order_items (order_id, dish_id, quantity, price, calories) VALUES (?, ?, ?, ?, ?)",
+            [(order[0], line[0], line[1], line[2], line[3]) for line in lines])
+        if promos is not None and (promos.count or promo_code):
+            result = promos.evaluate([line[:3] for line in lines], order_date, lambda: conn.execute(
+                "SELECT NOT EXISTS (SELECT 1 FROM orders WHERE user_id = ? AND order_id != ?)",
+                (user_id, order[0])).fetchone()[0] == 1, promo_code)
+            if result.discount:
+                order = conn.execute('''
+                    UPDATE orders SET total_amount = ?, discount = ?, promo_id = ?
+                    WHERE order_id = ?
+                    RETURNING order_id, order_date, total_amount, discount, promo_id
+                ''', (result.total, result.discount, result.promo.promo_id, order[0])).fetchone()
+        conn.execute("DELETE FROM cart WHERE user_id = ?", (user_id,))
+        record_created(conn, order[0], order_date)
+        record_order_sales(conn, order_date, order[2], order[3], lines)
+        items = [(line[4], line[1], line[2]) for line in lines]
+    elif idempotency_key is not None:
+        order = conn.execute(
+            "SELECT order_id, order_date, total_amount, discount, promo_id FROM orders WHERE idempotency_key = ?",
+            (idempotency_key,)).fetchone()
+    if order is None:
+        return {}
+
+    if not created:
+        items = conn.execute('''
+            SELECT m.name, oi.quantity, oi.price
+            FROM order_items oi JOIN menu m ON oi.dish_id = m.dish_id
+            WHERE oi.order_id = ?
+        ''', (order[0],)).fetchall()
+
+    return {
+        'order_id': order[0],
+        'order_date': order[1],
+        'total_amount': order[2],
+        'discount': order[3],
+        'promo_id': order[4],
+        'items': [{'name': i[0], 'quantity': i[1], 'price': i[2]} for i in items],
+        'created': created
+    }
+
+
 class DatabaseService:
     @staticmethod
     def is_admin(user_id: int) -> bool:
@@ -15,24 +105,44 @@ class DatabaseService:
         return user_id in ADMIN_IDS
 
     @staticmethod
-    def add_user_if_not_exists(user_id: int, username: str, full_name: str) -> None:
+    async def add_user_if_not_exists(user_id: int, username: str, full_name: str) -> None:
         """Добавляет пользователя в БД, если его там нет"""
         try:
-            cursor.execute(
+            await db.write(
                 "INSERT OR IGNORE INTO users (user_id, username, full_name, registration_date) VALUES (?, ?, ?, ?)",
                 (user_id, username, full_name, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-            conn.commit()
         except sqlite3.Error as e:
             logger.error(f"Ошибка добавления пользователя: {e}")
 
     @staticmethod
-    def get_dish_info(dish_id: int) -> Optional[Dict]:
+    async def get_user_profile(user_id: int) -> Optional[Dict]:
+        """Возвращает профиль пользователя с количеством заказов"""
+        try:
+            user = await db.fetchone("""
+                SELECT u.full_name, u.diet_preferences, COUNT(o.order_id)
+                FROM users u
+                LEFT JOIN orders o ON u.user_id = o.user_id
+                WHERE u.user_id = ?
+                GROUP BY u.user_id
+            """, (user_id,))
+            if user:
+                return {
+                    'full_name': user[0],
+                    'diet': user[1],
+                    'orders_count': user[2]
+                }
+            return None
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка получения профиля: {e}")
+            return None
+
+    @staticmethod
+    async def get_dish_info(dish_id: int) -> Optional[Dict]:
         """Возвращает информацию о блюде по ID"""
         try:
-            cursor.execute(
+            dish = await db.fetchone(
                 "SELECT name, description, price, calories, tags, photo FROM menu WHERE dish_id = ?",
                 (dish_id,))
-            dish = cursor.fetchone()
             if dish:
                 return {
                     'name': dish[0],
@@ -48,41 +158,59 @@ class DatabaseService:
             return None
 
     @staticmethod
-    def add_to_cart(user_id: int, dish_id: int) -> bool:
+    async def add_dish(name: str, description: str, price: int, calories: int,
+                       tags: str, photo: Optional[str]) -> Optional[int]:
+        """Добавляет блюдо в меню
+        :return: ID нового блюда или None
+        """
+        def _add(conn: sqlite3.Connection) -> int:
+            cur = conn.execute(
+                """INSERT INTO menu (name, description, price, calories, tags, photo)
+                VALUES (?, ?, ?, ?, ?, ?)""",
+                (name, description, price, calories, tags, photo))
+            save_dish_tags(conn, cur.lastrowid, tags)
+            return cur.lastrowid
+
+        try:
+            return await db.run(_add)
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка добавления блюда: {e}")
+            return None
+
+    @staticmethod
+    async def delete_dish(dish_id: int) -> bool:
+        """Удаляет блюдо из меню"""
+        def _delete(conn: sqlite3.Connection) -> int:
+            conn.execute("DELETE FROM dish_tags WHERE dish_id = ?", (dish_id,))
+            return conn.execute("DELETE FROM menu WHERE dish_id = ?", (dish_id,)).rowcount
+
+        try:
+            return await db.run(_delete) > 0
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка удаления блюда: {e}")
+            return False
+
+    @staticmethod
+    async def add_to_cart(user_id: int, dish_id: int) -> bool:
         """Добавляет блюдо в корзину пользователя"""
         try:
-            # Проверяем, есть ли уже блюдо в корзине
-            cursor.execute(
-                "SELECT quantity FROM cart WHERE user_id = ? AND dish_id = ?",
+            await db.write(
+                """INSERT INTO cart (user_id, dish_id, quantity) VALUES (?, ?, 1)
+                ON CONFLICT(user_id, dish_id) DO UPDATE SET quantity = quantity + 1""",
                 (user_id, dish_id))
-            existing = cursor.fetchone()
-
-            if existing:
-                # Увеличиваем количество
-                cursor.execute(
-                    "UPDATE cart SET quantity = quantity + 1 WHERE user_id = ? AND dish_id = ?",
-                    (user_id, dish_id))
-            else:
-                # Добавляем новую запись
-                cursor.execute(
-                    "INSERT INTO cart (user_id, dish_id, quantity) VALUES (?, ?, 1)",
-                    (user_id, dish_id))
-
-            conn.commit()
             return True
         except sqlite3.Error as e:
             logger.error(f"Ошибка добавления в корзину: {e}")
-            conn.rollback()
             return False
 
     @staticmethod
-    def get_cart_contents(user_id: int) -> List[Dict]:
+    async def get_cart_contents(user_id: int) -> List[Dict]:
         """Возвращает содержимое корзины пользователя"""
         try:
-            cursor.execute('''
-                SELECT c.dish_id, m.name, m.price, c.quantity, m.calories 
-                FROM cart c 
-                JOIN menu m ON c.dish_id = m.dish_id 
+            rows = await db.fetchall('''
+                SELECT c.dish_id, m.name, m.price, c.quantity, m.calories
+                FROM cart c
+                JOIN menu m ON c.dish_id = m.dish_id
                 WHERE c.user_id = ?
             ''', (user_id,))
             return [{
@@ -91,46 +219,90 @@ class DatabaseService:
                 'price': item[2],
                 'quantity': item[3],
                 'calories': item[4]
-            } for item in cursor.fetchall()]
+            } for item in rows]
         except sqlite3.Error as e:
             logger.error(f"Ошибка получения корзины: {e}")
             return []
 
     @staticmethod
-    def create_order(user_id: int, cart_items: List[Dict]) -> Optional[int]:
-        """Создает заказ из содержимого корзины"""
+    async def get_cart_quantity(user_id: int, dish_id: int) -> Optional[int]:
+        """Возвращает количество блюда в корзине или None"""
         try:
-            total = sum(item['price'] * item['quantity'] for item in cart_items)
-            order_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-            # Создаем запись заказа
-            cursor.execute(
-                "INSERT INTO orders (user_id, order_date, total_amount, status) VALUES (?, ?, ?, ?)",
-                (user_id, order_date, total, 'принят'))
-            order_id = cursor.lastrowid
-
-            # Добавляем элементы заказа
-            for item in cart_items:
-                cursor.execute(
-                    "INSERT INTO order_items (order_id, dish_id, quantity, price) VALUES (?, ?, ?, ?)",
-                    (order_id, item['dish_id'], item['quantity'], item['price']))
-
-            # Очищаем корзину
-            cursor.execute("DELETE FROM cart WHERE user_id = ?", (user_id,))
-            conn.commit()
-            return order_id
+            return await db.fetchval(
+                "SELECT quantity FROM cart WHERE user_id = ? AND dish_id = ?",
+                (user_id, dish_id))
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка получения количества: {e}")
+            return None
+
+    @staticmethod
+    async def set_cart_quantity(user_id: int, dish_id: int, quantity: int) -> bool:
+        """Устанавливает количество блюда в корзине"""
+        try:
+            rowcount, _ = await db.write(
+                "UPDATE cart SET quantity = ? WHERE user_id = ? AND dish_id = ?",
+                (quantity, user_id, dish_id))
+            return rowcount > 0
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка изменения количества: {e}")
+            return False
+
+    @staticmethod
+    async def remove_from_cart(user_id: int, dish_id: int) -> bool:
+        """Удаляет блюдо из корзины"""
+        try:
+            rowcount, _ = await db.write(
+                "DELETE FROM cart WHERE user_id = ? AND dish_id = ?",
+                (user_id, dish_id))
+            return rowcount > 0
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка удаления из корзины: {e}")
+            return False
+
+    @staticmethod
+    async def clear_cart(user_id: int) -> bool:
+        """Очищает корзину пользователя"""
+        try:
+            await db.write("DELETE FROM cart WHERE user_id = ?", (user_id,))
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка очистки корзины: {e}")
+            return False
+
+    @staticmethod
+    async def create_order(user_id: int, idempotency_key: Optional[str] = None,
+                           promo_code: Optional[str] = None) -> Optional[Dict]:
+        """
+        Оформляет заказ из корзины пользователя одной транзакцией
+        :param user_id: ID пользователя
+        :param idempotency_key: Ключ повторного нажатия (см. checkout_cart)
+        :param promo_code: Введенный промокод
+        :return: Заказ, {} если корзина пуста, None при ошибке
+        """
+        order_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            promos = await promo_engine.promos()
+            order = await db.run(
+                lambda conn: checkout_cart(conn, user_id, order_date, idempotency_key, promos, promo_code))
         except sqlite3.Error as e:
             logger.error(f"Ошибка создания заказа: {e}")
-            conn.rollback()
             return None
 
+        if order and order['created']:
+            await order_bus.publish(OrderEvent(ORDER_CREATED, order['order_id'], STATUS_NAMES[OrderStatus.ACCEPTED], {
+                'user_id': user_id,
+                'order_date': order['order_date'],
+                'total_amount': order['total_amount']
+            }))
+        return order
+
     @staticmethod
-    def get_user_orders(user_id: int, limit: int = 5) -> List[Dict]:
+    async def get_user_orders(user_id: int, limit: int = 5) -> List[Dict]:
         """Возвращает последние заказы пользователя"""
         try:
-            cursor.execute('''
-                SELECT o.order_id, o.order_date, o.total_amount, o.status 
-                FROM orders o 
+            rows = await db.fetchall('''
+                SELECT o.order_id, o.order_date, o.total_amount, o.status
+                FROM orders o
                 WHERE o.user_id = ?
                 ORDER BY o.order_date DESC
                 LIMIT ?
@@ -140,114 +312,157 @@ class DatabaseService:
                 'order_date': order[1],
                 'total_amount': order[2],
                 'status': order[3]
-            } for order in cursor.fetchall()]
+            } for order in rows]
         except sqlite3.Error as e:
             logger.error(f"Ошибка получения заказов: {e}")
             return []
 
     @staticmethod
-    def get_order_details(order_id: int) -> Optional[Dict]:
-        """Возвращает детали заказа"""
+    async def get_recent_orders(limit: int = 10) -> List[Dict]:
+        """Возвращает последние заказы всех пользователей"""
         try:
+            rows = await db.fetchall("""
+                SELECT o.order_id, u.full_name, o.order_date, o.total_amount
+                FROM orders o
+                JOIN users u ON o.user_id = u.user_id
+                ORDER BY o.order_date DESC
+                LIMIT ?
+            """, (limit,))
+            return [{
+                'order_id': order[0],
+                'customer_name': order[1],
+                'order_date': order[2],
+                'total_amount': order[3]
+            } for order in rows]
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка получения последних заказов: {e}")
+            return []
+
+    @staticmethod
+    async def get_sales_report(date_from: str, date_to: str) -> Optional[Dict]:
+        """Возвращает отчет о продажах за период из дневных агрегатов
+        :param date_from: Первый день "%Y-%m-%d"
+        :param date_to: Последний день "%Y-%m-%d" включительно
+        :return: Словарь отчета или None при ошибке
+        """
+        try:
+            return await db.run(lambda conn: read_report(conn, date_from, date_to))
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка получения статистики продаж: {e}")
+            return None
+
+    @staticmethod
+    async def get_order_details(order_id: int) -> Optional[Dict]:
+        """Возвращает детали заказа"""
+        def _details(conn: sqlite3.Connection) -> Optional[Tuple[tuple, List[tuple]]]:
             # Информация о заказе
-            cursor.execute('''
-                SELECT o.order_id, u.full_name, o.order_date, o.total_amount, o.status 
+            order = conn.execute('''
+                SELECT o.order_id, u.full_name, o.order_date, o.total_amount, o.status
                 FROM orders o
                 JOIN users u ON o.user_id = u.user_id
                 WHERE o.order_id = ?
-            ''', (order_id,))
-            order = cursor.fetchone()
+            ''', (order_id,)).fetchone()
 
             if not order:
                 return None
 
             # Состав заказа
-            cursor.execute('''
-                SELECT m.name, oi.quantity, oi.price 
+            items = conn.execute('''
+                SELECT m.name, oi.quantity, oi.price
                 FROM order_items oi
                 JOIN menu m ON oi.dish_id = m.dish_id
                 WHERE oi.order_id = ?
-            ''', (order_id,))
-            items = [{
-                'name': item[0],
-                'quantity': item[1],
-                'price': item[2]
-            } for item in cursor.fetchall()]
+            ''', (order_id,)).fetchall()
+            return order, items
 
+        try:
+            result = await db.run(_details)
+            if not result:
+                return None
+
+            order, items = result
             return {
                 'order_id': order[0],
                 'customer_name': order[1],
                 'order_date': order[2],
                 'total_amount': order[3],
                 'status': order[4],
-                'items': items
+                'items': [{
+                    'name': item[0],
+                    'quantity': item[1],
+                    'price': item[2]
+                } for item in items]
             }
         except sqlite3.Error as e:
             logger.error(f"Ошибка получения деталей заказа: {e}")
             return None
 
     @staticmethod
-    def search_dishes(query: str, filters: Dict = None) -> List[Dict]:
+    async def search_dishes(query: str, filters: Dict = None) -> List[Dict]:
         """Поиск блюд по названию и фильтрам"""
         try:
             base_query = "SELECT dish_id, name, price, calories FROM menu WHERE name LIKE ?"
             params = [f"%{query}%"]
 
-            if filters:
-                if 'vegan' in filters and filters['vegan']:
-                    base_query += " AND tags LIKE '%веган%'"
-                if 'gluten_free' in filters and filters['gluten_free']:
-                    base_query += " AND (tags LIKE '%без глютена%' OR tags LIKE '%gluten free%')"
+            # Каждый включенный фильтр требует наличия тега в dish_tags
+            for key, enabled in (filters or {}).items():
+                if enabled and key in FILTER_TAGS:
+                    base_query += """ AND EXISTS (
+                        SELECT 1 FROM dish_tags dt JOIN tags t ON t.tag_id = dt.tag_id
+                        WHERE dt.dish_id = menu.dish_id AND t.name = ?)"""
+                    params.append(FILTER_TAGS[key])
 
             base_query += " LIMIT 20"
-            cursor.execute(base_query, params)
+            rows = await db.fetchall(base_query, params)
 
             return [{
                 'dish_id': dish[0],
                 'name': dish[1],
                 'price': dish[2],
                 'calories': dish[3]
-            } for dish in cursor.fetchall()]
+            } for dish in rows]
         except sqlite3.Error as e:
             logger.error(f"Ошибка поиска блюд: {e}")
             return []
 
     @staticmethod
-    def update_dish(dish_id: int, field: str, value: Union[str, int]) -> bool:
+    async def update_dish(dish_id: int, field: str, value: Union[str, int]) -> bool:
         """Обновляет поле блюда"""
-        try:
-            cursor.execute(
+        def _update(conn: sqlite3.Connection) -> int:
+            rowcount = conn.execute(
                 f"UPDATE menu SET {field} = ? WHERE dish_id = ?",
-                (value, dish_id))
-            conn.commit()
-            return cursor.rowcount > 0
+                (value, dish_id)).rowcount
+            if rowcount and field == 'tags':
+                save_dish_tags(conn, dish_id, value)
+            return rowcount
+
+        try:
+            return await db.run(_update) > 0
         except sqlite3.Error as e:
             logger.error(f"Ошибка обновления блюда: {e}")
-            conn.rollback()
             return False
 
     @staticmethod
-    def get_user_preferences(user_id: int) -> Dict:
+    async def get_user_preferences(user_id: int) -> Dict:
         """Возвращает предпочтения пользователя"""
         try:
-            cursor.execute(
+            preferences = await db.fetchone(
                 "SELECT diet_preferences FROM users WHERE user_id = ?",
                 (user_id,))
-            preferences = cursor.fetchone()
             return {
                 'diet': preferences[0] if preferences else None,
-                'last_orders': DatabaseService.get_last_ordered_dishes(user_id)
+                'last_orders': await DatabaseService.get_last_ordered_dishes(user_id)
             }
         except sqlite3.Error as e:
             logger.error(f"Ошибка получения предпочтений: {e}")
             return {'diet': None, 'last_orders': []}
 
     @staticmethod
-    def get_last_ordered_dishes(user_id: int, limit: int = 3) -> List[str]:
+    async def get_last_ordered_dishes(user_id: int, limit: int = 3) -> List[str]:
         """Возвращает последние заказанные блюда"""
         try:
-            cursor.execute('''
-                SELECT m.name 
+            rows = await db.fetchall('''
+                SELECT m.name
                 FROM order_items oi
                 JOIN orders o ON oi.order_id = o.order_id
                 JOIN menu m ON oi.dish_id = m.dish_id
@@ -255,46 +470,75 @@ class DatabaseService:
                 ORDER BY o.order_date DESC
                 LIMIT ?
             ''', (user_id, limit))
-            return [item[0] for item in cursor.fetchall()]
+            return [item[0] for item in rows]
         except sqlite3.Error as e:
             logger.error(f"Ошибка получения истории заказов: {e}")
             return []
 
     @staticmethod
-    def update_order_status(order_id: int, new_status: str) -> bool:
+    async def update_order_status(order_id: int, new_status: str) -> bool:
         """Обновляет статус заказа
         :param order_id: ID заказа
         :param new_status: Новый статус ('принят', 'готовится', 'завершен' и т.д.)
-        :return: True если успешно, False если ошибка
+        :return: True если успешно, False если заказа нет, переход запрещен или ошибка
         """
+        new_code = STATUS_CODES.get(new_status)
+        if new_code is None:
+            logger.error(f"Неизвестный статус заказа: {new_status}")
+            return False
+
+        changed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        def _apply(conn: sqlite3.Connection) -> Optional[OrderStatus]:
+            old = apply_transition(conn, order_id, new_code, changed_at)
+            if old is not None and new_code == OrderStatus.CANCELLED:
+                remove_order_sales(conn, order_id)
+            return old
+
         try:
-            cursor.execute(
-                "UPDATE orders SET status = ? WHERE order_id = ?",
-                (new_status, order_id)
-            )
-            conn.commit()
-            return cursor.rowcount > 0
+            old_code = await db.write_run(_apply)
+        except InvalidTransition as e:
+            logger.warning(f"Недопустимая смена статуса заказа {order_id}: {e}")
+            return False
         except sqlite3.Error as e:
             logger.error(f"Ошибка обновления статуса заказа {order_id}: {e}")
-            conn.rollback()
             return False
 
+        if old_code is None:
+            return False
+        kind = ORDER_COMPLETED if new_status == COMPLETED_STATUS else ORDER_STATUS_CHANGED
+        await order_bus.publish(OrderEvent(kind, order_id, new_status))
+        return True
+
     @staticmethod
-    def get_active_orders() -> List[Dict]:
-        """Возвращает список активных заказов (статусы: 'принят', 'готовится', 'в доставке')
+    async def get_stage_metrics() -> List[Dict]:
+        """Возвращает метрики этапов заказа (приготовление, доставка)"""
+        try:
+            return await db.run(read_stage_metrics)
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка получения метрик этапов: {e}")
+            return []
+
+    @staticmethod
+    async def get_active_orders() -> List[Dict]:
+        """Возвращает список активных заказов (status_code < COMPLETED, частичный индекс)
         :return: Список словарей с информацией о заказах
         """
         try:
-            cursor.execute("""
+            rows = await db.fetchall("""
                 SELECT o.order_id, u.full_name, o.order_date, o.total_amount, o.status
                 FROM orders o
                 JOIN users u ON o.user_id = u.user_id
-                WHERE o.status IN ('принят', 'готовится', 'в доставке')
+                WHERE o.status_code < 3
                 ORDER BY o.order_date DESC
             """)
-
-            columns = [col[0] for col in cursor.description]
-            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            return [{
+                'order_id': order[0],
+                'customer_name': order[1],
+                'order_date': order[2],
+                'total_amount': order[3],
+                'status': order[4]
+            } for order in rows]
 
         except sqlite3.Error as e:
             logger.error(f"Ошибка получения активных заказов: {e}")
@@ -306,33 +550,49 @@ def is_admin(*args, **kwargs):
     return DatabaseService.is_admin(*args, **kwargs)
 
 
-def get_dish_info(*args, **kwargs):
-    return DatabaseService.get_dish_info(*args, **kwargs)
+async def add_user_if_not_exists(*args, **kwargs):
+    return await DatabaseService.add_user_if_not_exists(*args, **kwargs)
+
+
+async def get_dish_info(*args, **kwargs):
+    return await DatabaseService.get_dish_info(*args, **kwargs)
+
+
+async def add_to_cart(*args, **kwargs):
+    return await DatabaseService.add_to_cart(*args, **kwargs)
+
+
+async def get_cart_contents(*args, **kwargs):
+    return await DatabaseService.get_cart_contents(*args, **kwargs)
+
+
+async def create_order(*args, **kwargs):
+    return await DatabaseService.create_order(*args, **kwargs)
 
 
-def add_to_cart(*args, **kwargs):
-    return DatabaseService.add_to_cart(*args, **kwargs)
+async def search_dishes(*args, **kwargs):
+    return await DatabaseService.search_dishes(*args, **kwargs)
 
 
-def search_dishes(*args, **kwargs):
-    return DatabaseService.search_dishes(*args, **kwargs)
+async def get_order_details(*args, **kwargs):
+    return await DatabaseService.get_order_details(*args, **kwargs)
 
 
-def get_order_details(*args, **kwargs):
-    return DatabaseService.get_order_details(*args, **kwargs)
+async def get_user_orders(*args, **kwargs):
+    return await DatabaseService.get_user_orders(*args, **kwargs)
 
 
-def get_user_orders(*args, **kwargs):
-    return DatabaseService.get_user_orders(*args, **kwargs)
+async def update_order_status(*args, **kwargs):
+    return await DatabaseService.update_order_status(*args, **kwargs)
 
 
-def update_order_status(*args, **kwargs):
-    return DatabaseService.update_order_status(*args, **kwargs)
+async def get_active_orders():
+    return await DatabaseService.get_active_orders()
 
 
-def get_active_orders():
-    return DatabaseService.get_active_orders()
+async def get_user_preferences(*args, **kwargs):
+    return await DatabaseService.get_user_preferences(*args, **kwargs)
 
 
-def get_user_preferences(*args, **kwargs):
-    return DatabaseService.get_user_preferences(*args, **kwargs)
+async def get_sales_report(*args, **kwargs):
+    return await DatabaseService.get_sales_report(*args, **kwargs)
@@ -0,0 +1,261 @@
+import asyncio
+import bisect
+import json
+import os
+import sqlite3
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from foodfit_bot.config.database import db
+from foodfit_bot.services.order_bus import OrderEvent, order_bus
+from foodfit_bot.services.order_lifecycle import OrderStatus
+
+logger = logging.getLogger(__name__)
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+DELIVERY_ZONES_FILE = os.getenv(
+    "DELIVERY_ZONES_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "delivery_zones.json"))
+# Время в пути для адреса, который не удалось отнести к зоне
+DELIVERY_DEFAULT_MINUTES = int(os.getenv("DELIVERY_DEFAULT_MINUTES", "45"))
+
+# Модель загрузки кухни: базовое время плюс время на каждый заказ в очереди
+KITCHEN_BASE_MINUTES = int(os.getenv("KITCHEN_BASE_MINUTES", "20"))
+KITCHEN_MINUTES_PER_ORDER = float(os.getenv("KITCHEN_MINUTES_PER_ORDER", "4"))
+KITCHEN_COOKS = max(1, int(os.getenv("KITCHEN_COOKS", "2")))
+
+# Пауза перед пересчетом ETA после изменения очереди кухни
+DELIVERY_REESTIMATE_DELAY = float(os.getenv("DELIVERY_REESTIMATE_DELAY", "5"))
+
+# Заказы в этих статусах еще на кухне и влияют на очередь
+KITCHEN_STATUS_LIMIT = int(OrderStatus.DELIVERY)
+
+
+class DeliveryZones:
+    """Офлайн-таблица зон доставки.
+
+    Файл зон задает клетку кухни, клетку каждой зоны на сетке города и
+    ключевые слова адреса (районы, улицы). При загрузке для каждой зоны
+    один раз считается время в пути от кухни по сетке, дальше адрес
+    относится к зоне по ключевым словам без обращения к внешним API.
+    """
+
+    def __init__(self, path: str = DELIVERY_ZONES_FILE):
+        self.path = path
+        self._travel: Dict[str, int] = {}
+        self._keywords: List[Tuple[str, str]] = []
+        self._loaded = False
+
+    def load(self) -> None:
+        """Читает файл зон и предрасчитывает время в пути"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                config = json.load(file)
+        except (OSError, ValueError) as e:
+            logger.error(f"Ошибка загрузки зон доставки из {self.path}: {e}")
+            config = {'zones': []}
+
+        kitchen_x, kitchen_y = config.get('kitchen_cell', (0, 0))
+        per_cell = config.get('minutes_per_cell', 4)
+        base = config.get('base_minutes', 10)
+
+        travel, keywords = {}, []
+        for zone in config.get('zones', []):
+            x, y = zone['cell']
+            travel[zone['name']] = base + round(per_cell * (abs(x - kitchen_x) + abs(y - kitchen_y)))
+            keywords.extend((keyword.lower(), zone['name']) for keyword in zone.get('keywords', []))
+
+        # Сначала проверяются более длинные ключевые слова
+        keywords.sort(key=lambda item: len(item[0]), reverse=True)
+        self._travel, self._keywords = travel, keywords
+        self._loaded = True
+        logger.info(f"Зоны доставки загружены: {len(travel)}")
+
+    def match(self, address: str) -> Optional[str]:
+        """Возвращает зону адреса или None"""
+        if not self._loaded:
+            self.load()
+        text = address.lower().replace('ё', 'е')
+        for keyword, zone in self._keywords:
+            if keyword in text:
+                return zone
+        return None
+
+    def travel_minutes(self, zone: Optional[str]) -> int:
+        """Время в пути от кухни до зоны в минутах"""
+        if not self._loaded:
+            self.load()
+        return self._travel.get(zone, DELIVERY_DEFAULT_MINUTES)
+
+
+def kitchen_minutes(position: int) -> float:
+    """Время до готовности заказа, перед которым в очереди position заказов"""
+    return KITCHEN_BASE_MINUTES + KITCHEN_MINUTES_PER_ORDER * position / KITCHEN_COOKS
+
+
+def estimate_eta(now: datetime, position: int, travel: int,
+                 requested: Optional[datetime] = None) -> datetime:
+    """
+    Оценивает время доставки
+    :param now: Текущее время
+    :param position: Количество заказов перед этим в очереди кухни
+    :param travel: Время в пути в минутах
+    :param requested: Желаемое время клиента
+    :return: Ожидаемое время доставки (не раньше желаемого)
+    """
+    eta = now + timedelta(minutes=kitchen_minutes(position) + travel)
+    if requested is not None and requested > eta:
+        eta = requested
+    return eta.replace(second=0, microsecond=0)
+
+
+class DeliveryPlanner:
+    """Доставки заказов: сохранение данных клиента и расчет ETA.
+
+    ETA = очередь кухни + время в пути до зоны адреса, но не раньше
+    желаемого времени. При изменении очереди (новый заказ, заказ ушел
+    с кухни) ETA всех ожидающих доставок пересчитываются одной пачкой:
+    одно чтение очереди и одна запись изменившихся значений.
+    """
+
+    def __init__(self, zones: Optional[DeliveryZones] = None,
+                 delay: float = DELIVERY_REESTIMATE_DELAY):
+        self.zones = zones or DeliveryZones()
+        self.delay = delay
+        self._task: Optional[asyncio.Task] = None
+        # Событие пришло после начала текущего пересчета — нужен еще один проход
+        self._dirty = False
+
+    # ---------------------- Доставки ----------------------
+    async def find_order(self, user_id: int) -> Optional[int]:
+        """Последний заказ пользователя, который еще на кухне и без доставки"""
+        try:
+            return await db.fetchval("""
+                SELECT o.order_id FROM orders o
+                WHERE o.user_id = ? AND o.status_code < ?
+                  AND NOT EXISTS (SELECT 1 FROM deliveries d WHERE d.order_id = o.order_id)
+                ORDER BY o.order_id DESC LIMIT 1
+            """, (user_id, KITCHEN_STATUS_LIMIT))
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка поиска заказа для доставки: {e}")
+            return None
+
+    async def create(self, order_id: int, user_id: int, address: str, phone: str,
+                     requested: Optional[datetime] = None) -> Optional[Dict]:
+        """
+        Сохраняет доставку заказа и рассчитывает ETA
+        :return: {'zone', 'eta'} или None при ошибке
+        """
+        zone = self.zones.match(address)
+        travel = self.zones.travel_minutes(zone)
+        now = datetime.now()
+        requested_text = requested.strftime(DATE_FORMAT) if requested else None
+
+        def _create(conn: sqlite3.Connection) -> datetime:
+            position = conn.execute(
+                "SELECT COUNT(*) FROM orders WHERE status_code < ? AND order_id < ?",
+                (KITCHEN_STATUS_LIMIT, order_id)).fetchone()[0]
+            eta = estimate_eta(now, position, travel, requested)
+            conn.execute("""
+                INSERT OR REPLACE INTO deliveries
+                    (order_id, user_id, address, zone, phone, requested_time, eta, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (order_id, user_id, address, zone, phone, requested_text,
+                  eta.strftime(DATE_FORMAT), now.strftime(DATE_FORMAT), now.strftime(DATE_FORMAT)))
+            return eta
+
+        try:
+            eta = await db.run(_create)
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка сохранения доставки: {e}")
+            return None
+        return {'zone': zone, 'eta': eta}
+
+    async def get(self, order_id: int) -> Optional[Dict]:
+        """Возвращает доставку заказа"""
+        try:
+            row = await db.fetchone(
+                "SELECT address, zone, phone, requested_time, eta FROM deliveries WHERE order_id = ?",
+                (order_id,))
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка получения доставки: {e}")
+            return None
+        if row is None:
+            return None
+        return {
+            'address': row[0],
+            'zone': row[1],
+            'phone': row[2],
+            'requested_time': row[3],
+            'eta': row[4]
+        }
+
+    # ---------------------- Пересчет ----------------------
+    def _reestimate(self, conn: sqlite3.Connection) -> int:
+        now = datetime.now()
+        queue = [row[0] for row in conn.execute(
+            "SELECT order_id FROM orders WHERE status_code < ? ORDER BY order_id",
+            (KITCHEN_STATUS_LIMIT,))]
+        rows = conn.execute("""
+            SELECT d.order_id, d.zone, d.requested_time, d.eta
+            FROM deliveries d JOIN orders o ON o.order_id = d.order_id
+            WHERE o.status_code < ?
+        """, (KITCHEN_STATUS_LIMIT,)).fetchall()
+
+        updates = []
+        for order_id, zone, requested, old_eta in rows:
+            position = bisect.bisect_left(queue, order_id)
+            requested_at = datetime.strptime(requested, DATE_FORMAT) if requested else None
+            eta = estimate_eta(now, position, self.zones.travel_minutes(zone), requested_at)
+            eta_text = eta.strftime(DATE_FORMAT)
+            if eta_text != old_eta:
+                updates.append((eta_text, now.strftime(DATE_FORMAT), order_id))
+
+        if updates:
+            conn.executemany(
+                "UPDATE deliveries SET eta = ?, updated_at = ? WHERE order_id = ?", updates)
+        return len(updates)
+
+    async def reestimate(self) -> int:
+        """
+        Пересчитывает ETA всех доставок, заказы которых еще на кухне
+        :return: Количество изменившихся ETA
+        """
+        try:
+            changed = await db.run(self._reestimate)
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка пересчета ETA доставок: {e}")
+            return 0
+        if changed:
+            logger.info(f"ETA доставок пересчитаны: изменено {changed}")
+        return changed
+
+    async def handle_event(self, event: OrderEvent) -> None:
+        """Любое событие заказа меняет очередь кухни — откладываем пересчет"""
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._reestimate_later())
+
+    async def _reestimate_later(self) -> None:
+        # Пока пересчет шел, могли прийти новые события: повторяем, пока их нет
+        while self._dirty:
+            await asyncio.sleep(self.delay)
+            self._dirty = False
+            await self.reestimate()
+
+    def start(self) -> None:
+        """Подписывается на события заказов"""
+        self.zones.load()
+        order_bus.subscribe(self.handle_event)
+
+    async def stop(self) -> None:
+        """Отписывается от событий и отменяет отложенный пересчет"""
+        order_bus.unsubscribe(self.handle_event)
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+delivery_planner = DeliveryPlanner()
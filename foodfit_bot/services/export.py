@@ -0,0 +1,212 @@
+import asyncio
+import csv
+import gzip
+import os
+import re
+import sqlite3
+import tempfile
+import time
+import logging
+import zipfile
+from typing import Iterable, Iterator, List, Optional, Sequence
+from xml.sax.saxutils import escape
+
+from foodfit_bot.config.database import Database, db
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "5000"))
+# Лимит Telegram на отправку файла ботом — 50 МБ
+EXPORT_MAX_BYTES = int(os.getenv("EXPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+# Лист XLSX вмещает 1 048 576 строк с заголовком; дальше выгрузка идет на следующий лист
+XLSX_SHEET_ROWS = 1_048_575
+
+# Управляющие символы, запрещенные в XML 1.0 (встречаются в именах пользователей)
+_XML_INVALID = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+FORMAT_CSV = 'csv'
+FORMAT_XLSX = 'xlsx'
+
+EXPORT_COLUMNS = (
+    'order_id', 'order_date', 'status', 'user_id', 'username', 'full_name',
+    'dish_id', 'dish_name', 'quantity', 'price', 'line_total', 'order_total'
+)
+
+# Позиция заказа на строку; порядок по индексу idx_orders_date без сортировки
+EXPORT_SQL = '''
+    SELECT o.order_id, o.order_date, o.status, o.user_id, u.username, u.full_name,
+           oi.dish_id, m.name, oi.quantity, oi.price, oi.quantity * oi.price, o.total_amount
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.order_id
+    LEFT JOIN users u ON u.user_id = o.user_id
+    LEFT JOIN menu m ON m.dish_id = oi.dish_id
+    WHERE o.order_date BETWEEN ? AND ?
+    ORDER BY o.order_date, o.order_id
+'''
+
+
+def iter_batches(cursor: sqlite3.Cursor, size: int = EXPORT_FETCH_SIZE) -> Iterator[List[tuple]]:
+    """Читает результат курсора пачками по size строк"""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield rows
+
+
+def write_csv(path: str, batches: Iterable[List[Sequence]]) -> int:
+    """
+    Пишет строки в CSV, сжатый gzip (с BOM, чтобы Excel узнал UTF-8)
+    :return: Количество строк данных
+    """
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8-sig', newline='', compresslevel=6) as file:
+        writer = csv.writer(file)
+        writer.writerow(EXPORT_COLUMNS)
+        for rows in batches:
+            writer.writerows(rows)
+            count += len(rows)
+    return count
+
+
+def _xlsx_cell(value) -> str:
+    # Адреса ячеек (r="A1") необязательны: без них файл меньше и пишется быстрее
+    if value is None:
+        return '<c/>'
+    if value.__class__ is int or value.__class__ is float:
+        return f'<c><v>{value}</v></c>'
+    text = escape(_XML_INVALID.sub('', str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def write_xlsx(path: str, batches: Iterable[List[Sequence]]) -> int:
+    """
+    Пишет строки в XLSX потоково: XML листа сжимается в zip по пачкам,
+    в памяти держится одна пачка. Без сторонних библиотек.
+    :return: Количество строк данных
+    """
+    header = ''.join(_xlsx_cell(name) for name in EXPORT_COLUMNS)
+    sheet_head = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                  '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                  f'<sheetData><row>{header}</row>')
+    sheet_tail = '</sheetData></worksheet>'
+
+    count, sheets = 0, 0
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        sheet, sheet_rows = None, 0
+        for rows in batches:
+            if sheet is None or sheet_rows + len(rows) > XLSX_SHEET_ROWS:
+                if sheet is not None:
+                    sheet.write(sheet_tail.encode())
+                    sheet.close()
+                sheets += 1
+                sheet = archive.open(f"xl/worksheets/sheet{sheets}.xml", 'w', force_zip64=True)
+                sheet.write(sheet_head.encode())
+                sheet_rows = 0
+            sheet.write(''.join(
+                ['<row>' + ''.join([_xlsx_cell(value) for value in row]) + '</row>' for row in rows]
+            ).encode())
+            sheet_rows += len(rows)
+            count += len(rows)
+        if sheet is None:
+            sheets = 1
+            archive.writestr("xl/worksheets/sheet1.xml", sheet_head + sheet_tail)
+        else:
+            sheet.write(sheet_tail.encode())
+            sheet.close()
+
+        overrides = ''.join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, sheets + 1))
+        archive.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            f'{overrides}</Types>'))
+        archive.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="xl/workbook.xml"/></Relationships>'))
+        archive.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+            + ''.join(f'<sheet name="Заказы {i}" sheetId="{i}" r:id="rId{i}"/>' for i in range(1, sheets + 1))
+            + '</sheets></workbook>'))
+        archive.writestr("xl/_rels/workbook.xml.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + ''.join(
+                f'<Relationship Id="rId{i}" '
+                'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+                f'Target="worksheets/sheet{i}.xml"/>' for i in range(1, sheets + 1))
+            + '</Relationships>'))
+    return count
+
+
+class OrderExporter:
+    """Выгрузка заказов с позициями и покупателями за период.
+
+    Выгрузка идет в отдельном потоке на собственном соединении: пул
+    Database и event loop не заняты, а в WAL-режиме чтение не мешает
+    записи заказов. Строки читаются курсором пачками и сразу пишутся в
+    сжатый файл, поэтому память не зависит от числа строк.
+    """
+
+    def __init__(self, database: Database = db):
+        self.database = database
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _export(self, date_from: str, date_to: str, fmt: str, path: str) -> int:
+        conn = self.database.connect()
+        try:
+            cursor = conn.execute(EXPORT_SQL, (f"{date_from} 00:00:00", f"{date_to} 23:59:59"))
+            writer = write_xlsx if fmt == FORMAT_XLSX else write_csv
+            return writer(path, iter_batches(cursor))
+        finally:
+            conn.close()
+
+    async def export(self, date_from: str, date_to: str, fmt: str = FORMAT_CSV) -> Optional[dict]:
+        """
+        Выгружает заказы во временный файл
+        :param date_from: Первый день "%Y-%m-%d"
+        :param date_to: Последний день "%Y-%m-%d" включительно
+        :param fmt: csv (сжимается gzip) или xlsx (zip по формату)
+        :return: {'path', 'filename', 'rows', 'size', 'seconds'} или None при ошибке;
+                 файл удаляет вызывающий
+        """
+        suffix = '.xlsx' if fmt == FORMAT_XLSX else '.csv.gz'
+        fd, path = tempfile.mkstemp(prefix="foodfit-orders-", suffix=suffix)
+        os.close(fd)
+
+        # Одновременно идет одна выгрузка, чтобы не занимать диск и потоки
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        started = time.perf_counter()
+        try:
+            async with self._lock:
+                rows = await asyncio.to_thread(self._export, date_from, date_to, fmt, path)
+        except (sqlite3.Error, OSError) as e:
+            logger.error(f"Ошибка выгрузки заказов: {e}")
+            os.remove(path)
+            return None
+
+        result = {
+            'path': path,
+            'filename': f"orders_{date_from}_{date_to}{suffix}",
+            'rows': rows,
+            'size': os.path.getsize(path),
+            'seconds': time.perf_counter() - started
+        }
+        logger.info(f"Выгрузка заказов {date_from}..{date_to}: {rows} строк, "
+                    f"{result['size'] / 1024 / 1024:.1f} МБ за {result['seconds']:.1f} с")
+        return result
+
+
+order_exporter = OrderExporter()
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import logging
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from foodfit_bot.config.database import Database, db
+
+logger = logging.getLogger(__name__)
+
+# Брошенные диалоги удаляются через FSM_STATE_TTL секунд после последнего изменения
+FSM_STATE_TTL = int(os.getenv("FSM_STATE_TTL", "86400"))
+# Окно склеивания записей состояния и данных одного пользователя
+FSM_FLUSH_MS = int(os.getenv("FSM_FLUSH_MS", "50"))
+FSM_PURGE_INTERVAL = int(os.getenv("FSM_PURGE_INTERVAL", "600"))
+
+_UNSET = object()
+
+
+class SQLiteStorage(BaseStorage):
+    """Хранилище FSM aiogram в таблице fsm_states.
+
+    Состояние диалогов переживает перезапуск и доступно нескольким
+    процессам бота, работающим с одной БД. Ключи строятся тем же
+    DefaultKeyBuilder, что и у RedisStorage.
+
+    Изменения копятся в памяти и пишутся одной пачкой раз в
+    FSM_FLUSH_MS: типичный обработчик делает set_state и update_data,
+    и обе операции попадают в одну запись. Ключ остается в ожидающих
+    изменениях, пока его запись не закоммичена, а чтение сначала смотрит
+    туда и только потом в БД, поэтому процесс всегда видит свои записи,
+    а другие процессы — с задержкой не больше окна.
+    """
+
+    def __init__(self, database: Database = db, ttl: int = FSM_STATE_TTL,
+                 flush_ms: int = FSM_FLUSH_MS, key_builder: Optional[KeyBuilder] = None):
+        self.database = database
+        self.ttl = ttl
+        self.window = flush_ms / 1000
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        # Номер последнего изменения ключа: запись снимает ключ из _pending,
+        # только если после снимка его больше не меняли
+        self._versions: Dict[str, int] = {}
+        self._version = 0
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._last_purge = time.time()
+
+    def _key(self, key: StorageKey) -> str:
+        return self.key_builder.build(key)
+
+    def _local(self, key: str, field: str) -> Any:
+        """Значение поля, еще не закоммиченное в БД (в том числе записываемое сейчас)"""
+        changes = self._pending.get(key)
+        if changes and field in changes:
+            return changes[field]
+        return _UNSET
+
+    # ---------------------- Чтение ----------------------
+    async def _read(self, key: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        try:
+            row = await self.database.fetchone(
+                "SELECT state, data FROM fsm_states WHERE key = ? AND expires_at > ?",
+                (key, time.time()))
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка чтения состояния FSM: {e}")
+            return None, {}
+        if row is None:
+            return None, {}
+        return row[0], json.loads(row[1]) if row[1] else {}
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        storage_key = self._key(key)
+        state = self._local(storage_key, 'state')
+        if state is not _UNSET:
+            return state
+        state, _ = await self._read(storage_key)
+        return state
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        storage_key = self._key(key)
+        data = self._local(storage_key, 'data')
+        if data is not _UNSET:
+            return dict(data)
+        _, data = await self._read(storage_key)
+        return data
+
+    # ---------------------- Запись ----------------------
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        self._change(self._key(key), 'state', value)
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        self._change(self._key(key), 'data', dict(data))
+
+    def _change(self, key: str, field: str, value: Any) -> None:
+        self._pending.setdefault(key, {})[field] = value
+        self._version += 1
+        self._versions[key] = self._version
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.window)
+        await self.flush()
+
+    async def flush(self) -> int:
+        """
+        Пишет накопленные изменения одной транзакцией
+        :return: Количество записанных ключей
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            written = await self._flush()
+        if self._pending:
+            # Изменения, пришедшие во время записи, или неудавшаяся запись.
+            # Внутри _flush_later задача еще не завершена, и без сброса
+            # _schedule_flush не запустил бы повторную запись
+            if self._flush_task is asyncio.current_task():
+                self._flush_task = None
+            self._schedule_flush()
+        return written
+
+    async def _flush(self) -> int:
+        # Снимок: изменения после него остаются в _pending и уйдут следующей записью
+        pending = {key: dict(changes) for key, changes in self._pending.items()}
+        if not pending:
+            return 0
+        versions = {key: self._versions[key] for key in pending}
+
+        now = time.time()
+        expires_at = now + self.ttl
+        purge = now - self._last_purge >= FSM_PURGE_INTERVAL
+        if purge:
+            self._last_purge = now
+
+        def _write(conn: sqlite3.Connection) -> None:
+            for key, changes in pending.items():
+                state = changes.get('state', _UNSET)
+                data = changes.get('data', _UNSET)
+                data_json = json.dumps(data, ensure_ascii=False) if data is not _UNSET else None
+                # Поля истекшей записи не наследуются новой
+                conn.execute("""
+                    INSERT INTO fsm_states (key, state, data, expires_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        state = CASE WHEN ? THEN excluded.state
+                                     WHEN fsm_states.expires_at <= ? THEN NULL ELSE state END,
+                        data = CASE WHEN ? THEN excluded.data
+                                    WHEN fsm_states.expires_at <= ? THEN '{}' ELSE data END,
+                        expires_at = excluded.expires_at
+                """, (key, None if state is _UNSET else state, data_json or '{}', expires_at,
+                      state is not _UNSET, now, data is not _UNSET, now))
+            # Пустые записи (состояние сброшено, данных нет) не храним
+            conn.executemany(
+                "DELETE FROM fsm_states WHERE key = ? AND state IS NULL AND data = '{}'",
+                [(key,) for key in pending])
+            if purge:
+                conn.execute("DELETE FROM fsm_states WHERE expires_at <= ?", (now,))
+
+        try:
+            await self.database.write_run(_write)
+        except sqlite3.Error as e:
+            # Изменения остаются в _pending, запись повторится
+            logger.error(f"Ошибка записи состояний FSM: {e}")
+            return 0
+
+        # Ключ уходит из _pending только после коммита, и только если
+        # за время записи его не меняли
+        for key, version in versions.items():
+            if self._versions.get(key) == version:
+                del self._pending[key]
+                del self._versions[key]
+        return len(pending)
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            await self._flush_task
+            self._flush_task = None
+        await self.flush()
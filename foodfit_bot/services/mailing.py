@@ -0,0 +1,364 @@
+import asyncio
+import os
+import socket
+import sqlite3
+import time
+import uuid
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramForbiddenError
+
+from foodfit_bot.config.database import db
+from foodfit_bot.keyboards.inline import build_mailing_stop_kb
+from foodfit_bot.services.send_scheduler import LANE_MARKETING, LANE_STAFF, send_lane
+
+logger = logging.getLogger(__name__)
+
+# Пользователи читаются пачками по первичному ключу; после каждой пачки
+# прогресс сохраняется, и после перезапуска рассылка продолжается с нее
+MAILING_CHUNK_SIZE = int(os.getenv("MAILING_CHUNK_SIZE", "200"))
+MAILING_CONCURRENCY = int(os.getenv("MAILING_CONCURRENCY", "25"))
+MAILING_PROGRESS_INTERVAL = float(os.getenv("MAILING_PROGRESS_INTERVAL", "15"))
+# Рассылку ведет один процесс: он держит аренду и продлевает ее каждую треть
+# срока, пока идет отправка; аренду упавшего процесса по истечении забирает другой
+MAILING_LEASE_SECONDS = float(os.getenv("MAILING_LEASE_SECONDS", "60"))
+
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_CANCELLED = 'cancelled'
+STATUS_TITLES = {
+    STATUS_RUNNING: 'идет',
+    STATUS_DONE: 'завершена',
+    STATUS_CANCELLED: 'остановлена',
+}
+
+RESULT_SENT = 'sent'
+RESULT_FAILED = 'failed'
+RESULT_BLOCKED = 'blocked'
+
+
+def format_report(mailing: Dict) -> str:
+    """Текст отчета о рассылке"""
+    processed = mailing['sent'] + mailing['failed'] + mailing['blocked']
+    rate = processed / mailing['send_seconds'] if mailing['send_seconds'] else 0.0
+    return (
+        f"📨 <b>Рассылка #{mailing['mailing_id']}</b>: {STATUS_TITLES.get(mailing['status'], mailing['status'])}\n\n"
+        f"Обработано: {processed} из {mailing['total']}\n"
+        f"✅ Доставлено: {mailing['sent']}\n"
+        f"⚠ Ошибок: {mailing['failed']}\n"
+        f"🚫 Заблокировали бота: {mailing['blocked']}\n"
+        f"⚡ Скорость: {rate:.1f} сообщ./с"
+    )
+
+
+class MailingService:
+    """Рассылка сообщения администратора всем пользователям.
+
+    Сообщение копируется (copy_message), поэтому рассылать можно текст,
+    фото и любые другие сообщения. Пользователи читаются из users
+    пачками по user_id > последнего обработанного, пачка отправляется
+    параллельно через общий планировщик отправок в полосе рассылок, и
+    после каждой пачки счетчики и последний user_id пишутся в mailings.
+    После перезапуска бота незавершенные рассылки продолжаются с
+    сохраненной позиции; повторно может уйти не больше одной пачки.
+
+    Если запущено несколько процессов бота (вебхук с несколькими
+    воркерами), рассылку ведет только тот, кто атомарно захватил ее
+    аренду (owner, lease_until). Остальные подхватывают рассылку, лишь
+    когда аренда истекла, то есть владелец остановился или упал.
+    """
+
+    def __init__(self, chunk_size: int = MAILING_CHUNK_SIZE,
+                 concurrency: int = MAILING_CONCURRENCY,
+                 progress_interval: float = MAILING_PROGRESS_INTERVAL,
+                 lease_seconds: float = MAILING_LEASE_SECONDS):
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.progress_interval = progress_interval
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._bot: Optional[Bot] = None
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._watch_task: Optional[asyncio.Task] = None
+
+    # ---------------------- Данные ----------------------
+    async def create(self, admin_id: int, from_chat_id: int, message_id: int) -> Optional[int]:
+        """
+        Создает рассылку сообщения
+        :param admin_id: ID администратора, которому придет отчет
+        :param from_chat_id: Чат с исходным сообщением
+        :param message_id: ID исходного сообщения
+        :return: ID рассылки или None при ошибке
+        """
+        def _create(conn: sqlite3.Connection) -> int:
+            total = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+            return conn.execute("""
+                INSERT INTO mailings (admin_id, from_chat_id, message_id, status, total, created_at,
+                                      owner, lease_until)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (admin_id, from_chat_id, message_id, STATUS_RUNNING, total,
+                  datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                  self.owner, time.time() + self.lease_seconds)).lastrowid
+
+        try:
+            return await db.run(_create)
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка создания рассылки: {e}")
+            return None
+
+    async def get(self, mailing_id: int) -> Optional[Dict]:
+        """Возвращает рассылку с прогрессом"""
+        try:
+            row = await db.fetchone("""
+                SELECT mailing_id, admin_id, from_chat_id, message_id, status, last_user_id,
+                       total, sent, failed, blocked, send_seconds
+                FROM mailings WHERE mailing_id = ?
+            """, (mailing_id,))
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка получения рассылки: {e}")
+            return None
+        if row is None:
+            return None
+        keys = ('mailing_id', 'admin_id', 'from_chat_id', 'message_id', 'status', 'last_user_id',
+                'total', 'sent', 'failed', 'blocked', 'send_seconds')
+        return dict(zip(keys, row))
+
+    async def _claim(self, mailing_id: int) -> bool:
+        """Атомарно захватывает аренду рассылки; True, если она теперь у этого процесса"""
+        now = time.time()
+        changed, _ = await db.write("""
+            UPDATE mailings SET owner = ?, lease_until = ?
+            WHERE mailing_id = ? AND status = ?
+              AND (owner IS NULL OR owner = ? OR lease_until IS NULL OR lease_until < ?)
+        """, (self.owner, now + self.lease_seconds, mailing_id, STATUS_RUNNING, self.owner, now))
+        return bool(changed)
+
+    async def _renew(self, mailing_id: int) -> bool:
+        """Продлевает аренду; False, если рассылку уже ведет другой процесс"""
+        changed, _ = await db.write(
+            "UPDATE mailings SET lease_until = ? WHERE mailing_id = ? AND owner = ?",
+            (time.time() + self.lease_seconds, mailing_id, self.owner))
+        return bool(changed)
+
+    async def _heartbeat(self, mailing_id: int, lost: asyncio.Event) -> None:
+        """Продлевает аренду во время отправки: пачка под лимитами может идти дольше аренды"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if not await self._renew(mailing_id):
+                    lost.set()
+                    return
+            except sqlite3.Error as e:
+                # Аренда еще действует: попробуем на следующем такте
+                logger.warning(f"Не удалось продлить аренду рассылки #{mailing_id}: {e}")
+
+    async def _next_chunk(self, last_user_id: int) -> List[int]:
+        rows = await db.fetchall(
+            "SELECT user_id FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?",
+            (last_user_id, self.chunk_size))
+        return [row[0] for row in rows]
+
+    async def _checkpoint(self, mailing_id: int, last_user_id: int,
+                          results: List[Tuple[int, str, Optional[str]]], seconds: float) -> bool:
+        """Сохраняет прогресс пачки и продлевает аренду; False, если аренду перехватили"""
+        counts = {RESULT_SENT: 0, RESULT_FAILED: 0, RESULT_BLOCKED: 0}
+        for _, result, _ in results:
+            counts[result] += 1
+        failures = [(mailing_id, user_id, error) for user_id, result, error in results if result != RESULT_SENT]
+
+        def _save(conn: sqlite3.Connection) -> bool:
+            owned = conn.execute("""
+                UPDATE mailings SET last_user_id = ?, sent = sent + ?, failed = failed + ?,
+                    blocked = blocked + ?, send_seconds = send_seconds + ?, lease_until = ?
+                WHERE mailing_id = ? AND owner = ?
+            """, (last_user_id, counts[RESULT_SENT], counts[RESULT_FAILED], counts[RESULT_BLOCKED],
+                  seconds, time.time() + self.lease_seconds, mailing_id, self.owner)).rowcount
+            if owned and failures:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO mailing_failures (mailing_id, user_id, error) VALUES (?, ?, ?)",
+                    failures)
+            return bool(owned)
+
+        return await db.write_run(_save)
+
+    async def _finish(self, mailing_id: int, status: str) -> None:
+        await db.write(
+            "UPDATE mailings SET status = ?, finished_at = ? WHERE mailing_id = ? AND status = ?",
+            (status, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), mailing_id, STATUS_RUNNING))
+
+    # ---------------------- Отправка ----------------------
+    async def _send_chunk(self, mailing: Dict, user_ids: List[int],
+                          lost: asyncio.Event) -> List[Tuple[int, str, Optional[str]]]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send(user_id: int) -> Tuple[int, str, Optional[str]]:
+            async with semaphore:
+                if lost.is_set():
+                    # Аренду забрали: остаток пачки отправит новый владелец, результат не сохраняется
+                    return user_id, RESULT_FAILED, "lease lost"
+                try:
+                    await self._bot.copy_message(
+                        chat_id=user_id,
+                        from_chat_id=mailing['from_chat_id'],
+                        message_id=mailing['message_id'])
+                    return user_id, RESULT_SENT, None
+                except TelegramForbiddenError as e:
+                    return user_id, RESULT_BLOCKED, str(e)
+                except (TelegramBadRequest, TelegramAPIError) as e:
+                    return user_id, RESULT_FAILED, str(e)
+                except Exception as e:
+                    logger.error(f"Ошибка отправки рассылки пользователю {user_id}: {e}")
+                    return user_id, RESULT_FAILED, str(e)
+
+        with send_lane(LANE_MARKETING):
+            return await asyncio.gather(*(send(user_id) for user_id in user_ids))
+
+    async def _report(self, mailing: Dict, message_id: Optional[int], final: bool = False) -> Optional[int]:
+        """Отправляет или обновляет сообщение о прогрессе у администратора"""
+        text = format_report(mailing)
+        keyboard = None if final else build_mailing_stop_kb(mailing['mailing_id'])
+        try:
+            with send_lane(LANE_STAFF):
+                if message_id is None:
+                    sent = await self._bot.send_message(mailing['admin_id'], text, reply_markup=keyboard)
+                    return sent.message_id
+                await self._bot.edit_message_text(
+                    text=text, chat_id=mailing['admin_id'], message_id=message_id, reply_markup=keyboard)
+        except TelegramAPIError as e:
+            logger.warning(f"Не удалось обновить отчет рассылки #{mailing['mailing_id']}: {e}")
+        return message_id
+
+    async def run(self, mailing_id: int) -> Optional[Dict]:
+        """
+        Выполняет рассылку с сохраненной позиции до конца
+        :return: Итоговое состояние рассылки
+        """
+        mailing = await self.get(mailing_id)
+        if mailing is None or mailing['status'] != STATUS_RUNNING:
+            return mailing
+        try:
+            if not await self._claim(mailing_id):
+                logger.info(f"Рассылка #{mailing_id} уже идет в другом процессе")
+                return None
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка захвата рассылки #{mailing_id}: {e}")
+            return None
+        # Прогресс мог сдвинуться, пока рассылку вел другой процесс
+        mailing = await self.get(mailing_id) or mailing
+
+        logger.info(f"Рассылка #{mailing_id}: старт с user_id > {mailing['last_user_id']}")
+        lost = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat(mailing_id, lost))
+        progress_message = await self._report(mailing, None)
+        last_report = time.monotonic()
+        last_user_id = mailing['last_user_id']
+        try:
+            while True:
+                user_ids = await self._next_chunk(last_user_id)
+                if not user_ids:
+                    break
+                started = time.monotonic()
+                results = await self._send_chunk(mailing, user_ids, lost)
+                last_user_id = user_ids[-1]
+                if lost.is_set() or not await self._checkpoint(
+                        mailing_id, last_user_id, results, time.monotonic() - started):
+                    logger.warning(f"Рассылка #{mailing_id}: аренду забрал другой процесс, останавливаемся")
+                    return None
+
+                if time.monotonic() - last_report >= self.progress_interval:
+                    mailing = await self.get(mailing_id) or mailing
+                    if mailing['status'] != STATUS_RUNNING:
+                        break
+                    progress_message = await self._report(mailing, progress_message)
+                    last_report = time.monotonic()
+            await self._finish(mailing_id, STATUS_DONE)
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка рассылки #{mailing_id}, продолжим после перезапуска: {e}")
+            return None
+        finally:
+            heartbeat.cancel()
+
+        mailing = await self.get(mailing_id)
+        if mailing is not None:
+            processed = mailing['sent'] + mailing['failed'] + mailing['blocked']
+            logger.info(
+                f"Рассылка #{mailing_id} {STATUS_TITLES.get(mailing['status'])}: {processed} из {mailing['total']}, "
+                f"ошибок {mailing['failed']}, заблокировали {mailing['blocked']}, "
+                f"{processed / mailing['send_seconds'] if mailing['send_seconds'] else 0:.1f} сообщ./с")
+            await self._report(mailing, progress_message, final=True)
+        return mailing
+
+    # ---------------------- Управление ----------------------
+    def launch(self, bot: Bot, mailing_id: int) -> None:
+        """Запускает рассылку в фоне"""
+        self._bot = bot
+        task = asyncio.create_task(self.run(mailing_id))
+        self._tasks[mailing_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(mailing_id, None))
+
+    async def cancel(self, mailing_id: int) -> bool:
+        """
+        Останавливает рассылку
+        :return: True, если рассылка шла и остановлена
+        """
+        try:
+            changed, _ = await db.write(
+                "UPDATE mailings SET status = ?, finished_at = ? WHERE mailing_id = ? AND status = ?",
+                (STATUS_CANCELLED, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), mailing_id, STATUS_RUNNING))
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка остановки рассылки: {e}")
+            return False
+        task = self._tasks.pop(mailing_id, None)
+        if task is not None:
+            task.cancel()
+        return bool(changed)
+
+    async def _resume_orphaned(self) -> None:
+        """Запускает незавершенные рассылки без действующей аренды"""
+        try:
+            rows = await db.fetchall("""
+                SELECT mailing_id FROM mailings
+                WHERE status = ? AND (owner IS NULL OR owner = ? OR lease_until IS NULL OR lease_until < ?)
+            """, (STATUS_RUNNING, self.owner, time.time()))
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка загрузки незавершенных рассылок: {e}")
+            return
+        for (mailing_id,) in rows:
+            if mailing_id not in self._tasks:
+                # Захват аренды — в run(): из нескольких процессов выиграет один
+                self.launch(self._bot, mailing_id)
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds)
+            await self._resume_orphaned()
+
+    async def start(self, bot: Bot) -> None:
+        """Продолжает рассылки, прерванные остановкой бота, и следит за брошенными"""
+        self._bot = bot
+        await self._resume_orphaned()
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        """Прерывает рассылки; их статус остается running, и они продолжатся при запуске"""
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        # Отпускаем аренду, чтобы другой процесс продолжил сразу, не дожидаясь ее истечения
+        try:
+            await db.write("UPDATE mailings SET owner = NULL, lease_until = NULL WHERE owner = ? AND status = ?",
+                           (self.owner, STATUS_RUNNING))
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка освобождения рассылок: {e}")
+
+
+mailing_service = MailingService()
@@ -0,0 +1,121 @@
+import os
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import FSInputFile, InputMediaPhoto, Message
+
+from foodfit_bot.config.database import db
+
+logger = logging.getLogger(__name__)
+
+# Ошибки Telegram, означающие, что сохраненный file_id больше не годится
+FILE_ID_ERRORS = ('wrong file identifier', 'file reference expired')
+
+
+def is_file_id_error(error: TelegramBadRequest) -> bool:
+    """Проверяет, что Telegram отверг именно file_id (а не подпись, разметку и т.п.)"""
+    text = str(error).lower()
+    return any(marker in text for marker in FILE_ID_ERRORS)
+
+
+class MediaRegistry:
+    """Реестр file_id для фото блюд.
+
+    В menu.photo хранится локальный путь к файлу. После первой отправки
+    Telegram возвращает file_id, который запоминается в media_files и
+    используется для всех последующих отправок вместо загрузки файла.
+    Если Telegram отвергает file_id, фото загружается заново.
+    """
+
+    def __init__(self):
+        self._file_ids: Dict[str, str] = {}
+        self._loaded = False
+
+    async def _load(self) -> None:
+        try:
+            rows = await db.fetchall("SELECT path, file_id FROM media_files")
+            self._file_ids = dict(rows)
+            self._loaded = True
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка загрузки реестра медиа: {e}")
+
+    async def get_file_id(self, path: str) -> Optional[str]:
+        """Возвращает сохраненный file_id для пути"""
+        if not self._loaded:
+            await self._load()
+        return self._file_ids.get(path)
+
+    async def remember(self, path: str, file_id: str) -> None:
+        """Запоминает file_id для пути"""
+        self._file_ids[path] = file_id
+        try:
+            await db.write(
+                "INSERT OR REPLACE INTO media_files (path, file_id, updated_at) VALUES (?, ?, ?)",
+                (path, file_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка сохранения file_id: {e}")
+
+    async def forget(self, path: str) -> None:
+        """Удаляет file_id для пути (фото изменено или удалено)"""
+        self._file_ids.pop(path, None)
+        try:
+            await db.write("DELETE FROM media_files WHERE path = ?", (path,))
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка удаления file_id: {e}")
+
+    async def answer_photo(self, message: Message, photo: str, **kwargs) -> Message:
+        """
+        Отправляет фото в чат сообщения, по возможности через file_id
+        :param message: Сообщение, в чат которого отправляется фото
+        :param photo: Локальный путь к фото (или file_id/URL)
+        :return: Отправленное сообщение
+        """
+        file_id = await self.get_file_id(photo)
+        if file_id:
+            try:
+                return await message.answer_photo(file_id, **kwargs)
+            except TelegramBadRequest as e:
+                if not is_file_id_error(e):
+                    raise
+                logger.warning(f"file_id для {photo} недействителен, загружаем заново: {e}")
+                await self.forget(photo)
+
+        source = FSInputFile(photo) if os.path.exists(photo) else photo
+        sent = await message.answer_photo(source, **kwargs)
+        if sent.photo:
+            await self.remember(photo, sent.photo[-1].file_id)
+        return sent
+
+    async def edit_photo(self, message: Message, photo: str, caption: Optional[str] = None,
+                         reply_markup=None) -> Message:
+        """
+        Заменяет фото и подпись в уже отправленном сообщении
+        :param message: Сообщение с фото
+        :param photo: Локальный путь к новому фото (или file_id/URL)
+        :return: Отредактированное сообщение
+        """
+        file_id = await self.get_file_id(photo)
+        if file_id:
+            try:
+                return await message.edit_media(
+                    InputMediaPhoto(media=file_id, caption=caption),
+                    reply_markup=reply_markup)
+            except TelegramBadRequest as e:
+                if not is_file_id_error(e):
+                    raise
+                logger.warning(f"file_id для {photo} недействителен, загружаем заново: {e}")
+                await self.forget(photo)
+
+        source = FSInputFile(photo) if os.path.exists(photo) else photo
+        edited = await message.edit_media(
+            InputMediaPhoto(media=source, caption=caption),
+            reply_markup=reply_markup)
+        if isinstance(edited, Message) and edited.photo:
+            await self.remember(photo, edited.photo[-1].file_id)
+        return edited
+
+
+media_registry = MediaRegistry()
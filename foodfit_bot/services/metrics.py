@@ -0,0 +1,297 @@
+import asyncio
+import contextvars
+import os
+import time
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.types import TelegramObject
+
+from foodfit_bot.config.database import Database
+
+logger = logging.getLogger(__name__)
+
+# Эндпоинт /metrics в формате Prometheus; 0 — не поднимать сервер
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9101"))
+# Период сводки в логе, секунд; 0 — не писать сводку
+METRICS_LOG_INTERVAL = int(os.getenv("METRICS_LOG_INTERVAL", "300"))
+METRICS_LOG_TOP = 10
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class UpdateStats:
+    """Счетчики одного обновления: SQL, вызовы Bot API и LLM"""
+
+    __slots__ = ('sql_statements', 'sql_seconds', 'api_calls', 'api_seconds', 'llm_seconds')
+
+    def __init__(self):
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.api_calls = 0
+        self.api_seconds = 0.0
+        self.llm_seconds = 0.0
+
+
+_current: contextvars.ContextVar[Optional[UpdateStats]] = contextvars.ContextVar(
+    "update_stats", default=None)
+
+
+class HandlerMetrics:
+    """Накопленные метрики одного обработчика"""
+
+    def __init__(self):
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.api_calls = 0
+        self.api_seconds = 0.0
+        self.llm_seconds = 0.0
+
+    def observe(self, seconds: float, stats: UpdateStats, failed: bool) -> None:
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.errors += failed
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.sql_statements += stats.sql_statements
+        self.sql_seconds += stats.sql_seconds
+        self.api_calls += stats.api_calls
+        self.api_seconds += stats.api_seconds
+        self.llm_seconds += stats.llm_seconds
+
+
+class MetricsRegistry:
+    """Метрики обработчиков обновлений.
+
+    MetricsMiddleware открывает UpdateStats на время обработчика, а
+    обертка запросов БД, middleware сессии бота и AIClient дописывают в
+    него SQL, вызовы Bot API и время LLM. По завершении обработчика
+    счетчики складываются в накопленные метрики (отдаются на /metrics)
+    и в оконные (сводка в логе раз в METRICS_LOG_INTERVAL).
+    """
+
+    def __init__(self):
+        self.handlers: Dict[str, HandlerMetrics] = {}
+        self.window: Dict[str, HandlerMetrics] = {}
+        self.api_methods: Dict[str, int] = {}
+        self.collectors: List[Tuple[str, str, str, str, Callable[[], Dict[str, Any]]]] = []
+        self._runner: Optional[web.AppRunner] = None
+        self._log_task: Optional[asyncio.Task] = None
+
+    # ---------------------- Сбор ----------------------
+    def observe(self, handler: str, seconds: float, stats: UpdateStats, failed: bool) -> None:
+        """Учитывает одно выполнение обработчика"""
+        for metrics in (self.handlers, self.window):
+            if handler not in metrics:
+                metrics[handler] = HandlerMetrics()
+            metrics[handler].observe(seconds, stats, failed)
+
+    def trace_sql(self, func: Callable) -> Callable:
+        """Обертка func(conn) для Database.tracer: число SQL-выражений и время в БД"""
+        stats = _current.get()
+        if stats is None:
+            return func
+
+        def traced(conn):
+            counter = [0]
+
+            def count(_statement):
+                counter[0] += 1
+
+            conn.set_trace_callback(count)
+            started = time.perf_counter()
+            try:
+                return func(conn)
+            finally:
+                stats.sql_seconds += time.perf_counter() - started
+                stats.sql_statements += counter[0]
+                conn.set_trace_callback(None)
+        return traced
+
+    def record_api_call(self, method: str, seconds: float) -> None:
+        """Учитывает вызов Bot API"""
+        self.api_methods[method] = self.api_methods.get(method, 0) + 1
+        stats = _current.get()
+        if stats is not None:
+            stats.api_calls += 1
+            stats.api_seconds += seconds
+
+    @staticmethod
+    def record_llm(seconds: float) -> None:
+        """Учитывает время запроса к LLM в текущем обновлении"""
+        stats = _current.get()
+        if stats is not None:
+            stats.llm_seconds += seconds
+
+    def register(self, name: str, kind: str, help_text: str, label: str,
+                 collect: Callable[[], Dict[str, Any]]) -> None:
+        """
+        Добавляет метрику другого сервиса в /metrics
+        :param kind: Тип Prometheus: gauge или counter
+        :param label: Имя метки для ключей словаря collect()
+        :param collect: Функция, возвращающая {значение метки: значение}
+        """
+        self.collectors.append((name, kind, help_text, label, collect))
+
+    # ---------------------- Экспорт ----------------------
+    def render(self) -> str:
+        """Метрики в текстовом формате Prometheus"""
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        family("foodfit_handler_duration_seconds", "histogram", "Время обработчика обновления")
+        for handler, m in sorted(self.handlers.items()):
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS, m.buckets):
+                cumulative += count
+                lines.append(f'foodfit_handler_duration_seconds_bucket{{handler="{handler}",le="{bound}"}} {cumulative}')
+            lines.append(f'foodfit_handler_duration_seconds_bucket{{handler="{handler}",le="+Inf"}} {m.count}')
+            lines.append(f'foodfit_handler_duration_seconds_sum{{handler="{handler}"}} {m.seconds:.6f}')
+            lines.append(f'foodfit_handler_duration_seconds_count{{handler="{handler}"}} {m.count}')
+
+        counters: Tuple[Tuple[str, str, str], ...] = (
+            ("foodfit_handler_errors_total", "errors", "Обработчики, завершившиеся исключением"),
+            ("foodfit_handler_sql_statements_total", "sql_statements", "SQL-выражения в обработчиках"),
+            ("foodfit_handler_sql_seconds_total", "sql_seconds", "Время выполнения SQL в обработчиках"),
+            ("foodfit_handler_api_calls_total", "api_calls", "Вызовы Bot API из обработчиков"),
+            ("foodfit_handler_api_seconds_total", "api_seconds", "Время вызовов Bot API из обработчиков"),
+            ("foodfit_handler_llm_seconds_total", "llm_seconds", "Время запросов к LLM из обработчиков"),
+        )
+        for name, field, help_text in counters:
+            family(name, "counter", help_text)
+            for handler, m in sorted(self.handlers.items()):
+                value = getattr(m, field)
+                value = f"{value:.6f}" if isinstance(value, float) else value
+                lines.append(f'{name}{{handler="{handler}"}} {value}')
+
+        family("foodfit_bot_api_calls_total", "counter", "Вызовы Bot API по методам")
+        for method, count in sorted(self.api_methods.items()):
+            lines.append(f'foodfit_bot_api_calls_total{{method="{method}"}} {count}')
+
+        for name, kind, help_text, label, collect in self.collectors:
+            family(name, kind, help_text)
+            for key, value in sorted(collect().items()):
+                lines.append(f'{name}{{{label}="{key}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def log_summary(self) -> None:
+        """Пишет в лог самые медленные обработчики за окно и начинает новое окно"""
+        window, self.window = self.window, {}
+        if not window:
+            return
+        top = sorted(window.items(), key=lambda item: item[1].seconds, reverse=True)[:METRICS_LOG_TOP]
+        lines = [
+            f"{handler}: {m.count} шт., среднее {m.seconds / m.count * 1000:.1f} мс, "
+            f"макс {m.max_seconds * 1000:.1f} мс, SQL {m.sql_statements / m.count:.1f} "
+            f"выраж./{m.sql_seconds / m.count * 1000:.1f} мс, API {m.api_calls / m.count:.1f}, "
+            f"LLM {m.llm_seconds / m.count * 1000:.1f} мс, ошибок {m.errors}"
+            for handler, m in top
+        ]
+        logger.info("Метрики обработчиков:\n" + "\n".join(lines))
+
+    # ---------------------- Запуск ----------------------
+    def install(self, dp: Dispatcher, bot: Bot, database: Database) -> None:
+        """Подключает middleware к диспетчеру и сессии бота, обертку — к БД"""
+        middleware = MetricsMiddleware(self)
+        for observer in (dp.message, dp.callback_query):
+            observer.middleware(middleware)
+        bot.session.middleware(ApiCallMiddleware(self))
+        database.tracer = self.trace_sql
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.render(), content_type="text/plain", charset="utf-8")
+
+    async def start(self, host: str = METRICS_HOST, port: int = METRICS_PORT,
+                    interval: int = METRICS_LOG_INTERVAL) -> None:
+        """Поднимает HTTP-эндпоинт /metrics и периодическую сводку в логе"""
+        if port:
+            app = web.Application()
+            app.router.add_get("/metrics", self.handle_metrics)
+            self._runner = web.AppRunner(app)
+            await self._runner.setup()
+            await web.TCPSite(self._runner, host, port).start()
+            logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+        if interval and self._log_task is None:
+            self._log_task = asyncio.create_task(self._log_loop(interval))
+
+    async def _log_loop(self, interval: int) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self.log_summary()
+
+    async def stop(self) -> None:
+        """Останавливает эндпоинт и сводку"""
+        if self._log_task is not None:
+            self._log_task.cancel()
+            self._log_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def handler_name(data: Dict[str, Any]) -> str:
+    """Имя обработчика вида 'cart.add_to_cart'"""
+    handler = data.get('handler')
+    callback = getattr(handler, 'callback', None)
+    if callback is None:
+        return 'unknown'
+    module = getattr(callback, '__module__', '') or ''
+    return f"{module.rsplit('.', 1)[-1]}.{getattr(callback, '__name__', 'handler')}"
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Замеряет время обработчика и собирает счетчики обновления"""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        stats = UpdateStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await handler(event, data)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            _current.reset(token)
+            self.registry.observe(handler_name(data), time.perf_counter() - started, stats, failed)
+
+
+class ApiCallMiddleware(BaseRequestMiddleware):
+    """Считает вызовы Bot API и время ответа"""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+
+    async def __call__(self, make_request, bot, method):
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            self.registry.record_api_call(method.__api_method__, time.perf_counter() - started)
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,231 @@
+import asyncio
+import os
+import sqlite3
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from foodfit_bot.config.database import db
+from foodfit_bot.services.database_service import DatabaseService
+from foodfit_bot.services.order_bus import (
+    ACTIVE_STATUSES, ORDER_CREATED, OrderEvent, order_bus
+)
+from foodfit_bot.services.send_scheduler import LANE_STAFF, send_lane
+from foodfit_bot.utils.helpers import format_order_date
+
+logger = logging.getLogger(__name__)
+
+# Не чаще одного редактирования доски за интервал; изменения внутри окна
+# склеиваются в одно редактирование
+STAFF_BOARD_INTERVAL = float(os.getenv("STAFF_BOARD_INTERVAL", "3"))
+STAFF_BOARD_COALESCE = float(os.getenv("STAFF_BOARD_COALESCE", "1"))
+STAFF_BOARD_MAX_ORDERS = 20
+
+
+class StaffOrderBoard:
+    """Живая доска активных заказов для персонала.
+
+    Список активных заказов загружается из БД один раз и дальше
+    поддерживается событиями order_bus. В каждом чате персонала доска -
+    это одно закрепленное сообщение, которое редактируется при
+    изменениях: не чаще STAFF_BOARD_INTERVAL секунд, а пачка заказов,
+    пришедших в течение STAFF_BOARD_COALESCE секунд, дает одно
+    редактирование.
+    """
+
+    def __init__(self, interval: float = STAFF_BOARD_INTERVAL,
+                 coalesce: float = STAFF_BOARD_COALESCE):
+        self.interval = interval
+        self.coalesce = coalesce
+        self.edits = 0
+        self._orders: Dict[int, Dict] = {}
+        self._boards: Dict[int, int] = {}
+        self._loaded = False
+        self._bot: Optional[Bot] = None
+        self._dirty = False
+        self._flush_task: Optional[asyncio.Task] = None
+        self._last_edit = 0.0
+        self._rendered: Optional[Tuple[str, str]] = None
+        self._load_lock: Optional[asyncio.Lock] = None
+
+    # ---------------------- Состояние ----------------------
+    async def start(self, bot: Bot) -> None:
+        """Подключает доску к боту и шине событий"""
+        self._bot = bot
+        order_bus.subscribe(self.handle_event)
+        await self.ensure_loaded()
+
+    async def stop(self) -> None:
+        """Отписывается от событий и дописывает отложенное редактирование"""
+        order_bus.unsubscribe(self.handle_event)
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if self._dirty:
+            self._dirty = False
+            await self._edit_boards()
+
+    async def ensure_loaded(self) -> None:
+        """Загружает активные заказы и доски из БД при первом обращении"""
+        if self._loaded:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if self._loaded:
+                return
+            orders = await DatabaseService.get_active_orders()
+            try:
+                boards = await db.fetchall("SELECT chat_id, message_id FROM staff_boards")
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка загрузки досок заказов: {e}")
+                boards = []
+            self._orders = {order['order_id']: order for order in orders}
+            self._boards = dict(boards)
+            self._loaded = True
+
+    def orders(self) -> List[Dict]:
+        """Активные заказы, новые сверху"""
+        return sorted(self._orders.values(), key=lambda o: (o['order_date'], o['order_id']), reverse=True)
+
+    async def handle_event(self, event: OrderEvent) -> None:
+        """Применяет событие заказа к доске"""
+        if not self._loaded:
+            # Загрузка из БД уже увидит это изменение
+            await self.ensure_loaded()
+        elif event.status not in ACTIVE_STATUSES:
+            self._orders.pop(event.order_id, None)
+        elif event.order_id in self._orders:
+            self._orders[event.order_id]['status'] = event.status
+        elif event.kind == ORDER_CREATED and event.data:
+            name = await db.fetchval(
+                "SELECT full_name FROM users WHERE user_id = ?", (event.data['user_id'],))
+            self._orders[event.order_id] = {
+                'order_id': event.order_id,
+                'customer_name': name,
+                'order_date': event.data['order_date'],
+                'total_amount': event.data['total_amount'],
+                'status': event.status
+            }
+        else:
+            order = await DatabaseService.get_order_details(event.order_id)
+            if order:
+                self._orders[event.order_id] = {
+                    'order_id': order['order_id'],
+                    'customer_name': order['customer_name'],
+                    'order_date': order['order_date'],
+                    'total_amount': order['total_amount'],
+                    'status': event.status
+                }
+        self._mark_dirty()
+
+    # ---------------------- Отрисовка ----------------------
+    def render(self) -> Tuple[str, InlineKeyboardMarkup]:
+        """Текст и клавиатура доски"""
+        orders = self.orders()
+        if not orders:
+            text = "📊 <b>Активные заказы</b>\n\n📭 Нет активных заказов"
+        else:
+            lines = [
+                f"🆔 <b>#{order['order_id']}</b> · {order['customer_name']} · "
+                f"{format_order_date(order['order_date'])} · {order['total_amount']}₽ · {order['status']}"
+                for order in orders[:STAFF_BOARD_MAX_ORDERS]
+            ]
+            if len(orders) > STAFF_BOARD_MAX_ORDERS:
+                lines.append(f"… и еще {len(orders) - STAFF_BOARD_MAX_ORDERS}")
+            text = f"📊 <b>Активные заказы ({len(orders)})</b>\n\n" + "\n".join(lines)
+
+        builder = InlineKeyboardBuilder()
+        for order in orders[:STAFF_BOARD_MAX_ORDERS]:
+            order_id = order['order_id']
+            builder.row(
+                InlineKeyboardButton(text=f"✅ #{order_id}", callback_data=f"complete_order_{order_id}"),
+                InlineKeyboardButton(text="🍳", callback_data=f"cooking_order_{order_id}"),
+                InlineKeyboardButton(text="📦", callback_data=f"to_delivery_{order_id}"),
+                InlineKeyboardButton(text="ℹ️", callback_data=f"order_details_{order_id}")
+            )
+        return text, builder.as_markup()
+
+    def is_board(self, message: Message) -> bool:
+        """Является ли сообщение доской заказов"""
+        return self._boards.get(message.chat.id) == message.message_id
+
+    async def post(self, message: Message) -> None:
+        """Отправляет доску в чат, закрепляет ее и заменяет прежнюю доску чата"""
+        await self.ensure_loaded()
+        if self._bot is None:
+            self._bot = message.bot
+
+        text, keyboard = self.render()
+        with send_lane(LANE_STAFF):
+            board = await message.answer(text, reply_markup=keyboard)
+        chat_id = message.chat.id
+        previous = self._boards.get(chat_id)
+        self._boards[chat_id] = board.message_id
+
+        try:
+            if previous is not None:
+                await self._bot.unpin_chat_message(chat_id=chat_id, message_id=previous)
+            await self._bot.pin_chat_message(
+                chat_id=chat_id, message_id=board.message_id, disable_notification=True)
+        except TelegramBadRequest as e:
+            logger.warning(f"Не удалось закрепить доску заказов в чате {chat_id}: {e}")
+
+        try:
+            await db.write(
+                "INSERT OR REPLACE INTO staff_boards (chat_id, message_id) VALUES (?, ?)",
+                (chat_id, board.message_id))
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка сохранения доски заказов: {e}")
+
+    # ---------------------- Редактирование ----------------------
+    def _mark_dirty(self) -> None:
+        self._dirty = True
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        while self._dirty:
+            delay = max(self.coalesce, self._last_edit + self.interval - time.monotonic())
+            await asyncio.sleep(delay)
+            self._dirty = False
+            await self._edit_boards()
+            self._last_edit = time.monotonic()
+
+    async def _edit_boards(self) -> None:
+        if self._bot is None or not self._boards:
+            return
+        text, keyboard = self.render()
+        signature = (text, keyboard.model_dump_json())
+        if signature == self._rendered:
+            return
+        self._rendered = signature
+
+        for chat_id, message_id in list(self._boards.items()):
+            try:
+                with send_lane(LANE_STAFF):
+                    await self._bot.edit_message_text(
+                        text=text, chat_id=chat_id, message_id=message_id, reply_markup=keyboard)
+                self.edits += 1
+            except TelegramBadRequest as e:
+                if "not modified" in str(e):
+                    continue
+                logger.warning(f"Доска заказов в чате {chat_id} недоступна: {e}")
+                await self._forget(chat_id)
+            except Exception as e:
+                logger.error(f"Ошибка обновления доски заказов в чате {chat_id}: {e}")
+
+    async def _forget(self, chat_id: int) -> None:
+        self._boards.pop(chat_id, None)
+        try:
+            await db.write("DELETE FROM staff_boards WHERE chat_id = ?", (chat_id,))
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка удаления доски заказов: {e}")
+
+
+order_board = StaffOrderBoard()
@@ -0,0 +1,58 @@
+import logging
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from foodfit_bot.services.order_lifecycle import STATUS_NAMES, OrderStatus, is_active
+
+logger = logging.getLogger(__name__)
+
+# Типы событий заказа
+ORDER_CREATED = "created"
+ORDER_STATUS_CHANGED = "status_changed"
+ORDER_COMPLETED = "completed"
+
+ACTIVE_STATUSES = tuple(name for code, name in STATUS_NAMES.items() if is_active(code))
+COMPLETED_STATUS = STATUS_NAMES[OrderStatus.COMPLETED]
+
+
+class OrderEvent(NamedTuple):
+    kind: str
+    order_id: int
+    status: str
+    data: Optional[Dict] = None
+
+
+Subscriber = Callable[[OrderEvent], Awaitable[None]]
+
+
+class OrderEventBus:
+    """Шина событий заказов внутри процесса.
+
+    DatabaseService публикует событие после фиксации изменения заказа,
+    подписчики (например, доска активных заказов персонала) обновляют
+    свое состояние без повторных запросов к БД. Ошибка подписчика
+    логируется и не влияет на публикацию и других подписчиков.
+    """
+
+    def __init__(self):
+        self._subscribers: List[Subscriber] = []
+
+    def subscribe(self, subscriber: Subscriber) -> None:
+        """Добавляет подписчика на все события заказов"""
+        if subscriber not in self._subscribers:
+            self._subscribers.append(subscriber)
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        """Удаляет подписчика"""
+        if subscriber in self._subscribers:
+            self._subscribers.remove(subscriber)
+
+    async def publish(self, event: OrderEvent) -> None:
+        """Передает событие всем подписчикам по очереди"""
+        for subscriber in list(self._subscribers):
+            try:
+                await subscriber(event)
+            except Exception as e:
+                logger.error(f"Ошибка обработки события заказа {event.kind} #{event.order_id}: {e}")
+
+
+order_bus = OrderEventBus()
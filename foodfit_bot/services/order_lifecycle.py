@@ -0,0 +1,125 @@
+import sqlite3
+from enum import IntEnum
+from typing import Dict, List, Optional, Tuple
+
+
+class OrderStatus(IntEnum):
+    """Коды статусов заказа. Активные статусы меньше COMPLETED"""
+    ACCEPTED = 0
+    COOKING = 1
+    DELIVERY = 2
+    COMPLETED = 3
+    CANCELLED = 4
+
+
+STATUS_NAMES: Dict[OrderStatus, str] = {
+    OrderStatus.ACCEPTED: 'принят',
+    OrderStatus.COOKING: 'готовится',
+    OrderStatus.DELIVERY: 'в доставке',
+    OrderStatus.COMPLETED: 'завершен',
+    OrderStatus.CANCELLED: 'отменен',
+}
+STATUS_CODES: Dict[str, OrderStatus] = {name: code for code, name in STATUS_NAMES.items()}
+
+# Допустимые переходы; завершенный и отмененный заказы не меняются
+TRANSITIONS: Dict[OrderStatus, Tuple[OrderStatus, ...]] = {
+    OrderStatus.ACCEPTED: (OrderStatus.COOKING, OrderStatus.DELIVERY,
+                           OrderStatus.COMPLETED, OrderStatus.CANCELLED),
+    OrderStatus.COOKING: (OrderStatus.DELIVERY, OrderStatus.COMPLETED, OrderStatus.CANCELLED),
+    OrderStatus.DELIVERY: (OrderStatus.COMPLETED, OrderStatus.CANCELLED),
+    OrderStatus.COMPLETED: (),
+    OrderStatus.CANCELLED: (),
+}
+
+# Этапы для метрик кухни: (этап, статус начала этапа, статусы окончания)
+STAGE_COOK = 'cook'
+STAGE_DELIVER = 'deliver'
+STAGES = (
+    (STAGE_COOK, OrderStatus.ACCEPTED, (OrderStatus.DELIVERY, OrderStatus.COMPLETED)),
+    (STAGE_DELIVER, OrderStatus.DELIVERY, (OrderStatus.COMPLETED,)),
+)
+STAGE_TITLES = {
+    STAGE_COOK: 'Приготовление (от приема до выдачи)',
+    STAGE_DELIVER: 'Доставка',
+}
+
+
+class InvalidTransition(Exception):
+    """Переход между статусами заказа не разрешен"""
+
+
+def is_active(code: int) -> bool:
+    """Активен ли заказ с указанным кодом статуса"""
+    return code < OrderStatus.COMPLETED
+
+
+def record_created(conn: sqlite3.Connection, order_id: int, at: str) -> None:
+    """Записывает событие создания заказа"""
+    conn.execute(
+        "INSERT INTO order_events (order_id, status_code, created_at) VALUES (?, ?, ?)",
+        (order_id, int(OrderStatus.ACCEPTED), at))
+
+
+def apply_transition(conn: sqlite3.Connection, order_id: int, new_code: OrderStatus,
+                     at: str) -> Optional[OrderStatus]:
+    """
+    Переводит заказ в новый статус внутри транзакции: обновляет заказ,
+    дописывает order_events и инкрементально обновляет order_stage_metrics
+    :param conn: Соединение в открытой транзакции
+    :param order_id: ID заказа
+    :param new_code: Новый статус
+    :param at: Время перехода "%Y-%m-%d %H:%M:%S"
+    :return: Прежний статус или None, если заказа нет
+    :raises InvalidTransition: Если переход не разрешен
+    """
+    row = conn.execute("SELECT status_code FROM orders WHERE order_id = ?", (order_id,)).fetchone()
+    if row is None:
+        return None
+    old_code = OrderStatus(row[0])
+    if new_code not in TRANSITIONS[old_code]:
+        raise InvalidTransition(f"{STATUS_NAMES[old_code]} -> {STATUS_NAMES[new_code]}")
+
+    conn.execute(
+        "UPDATE orders SET status = ?, status_code = ? WHERE order_id = ? AND status_code = ?",
+        (STATUS_NAMES[new_code], int(new_code), order_id, int(old_code)))
+    conn.execute(
+        "INSERT INTO order_events (order_id, status_code, created_at) VALUES (?, ?, ?)",
+        (order_id, int(new_code), at))
+
+    for stage, start_code, end_codes in STAGES:
+        # Этап приготовления заканчивается один раз — при первом выходе из кухни
+        if new_code not in end_codes or (stage == STAGE_COOK and old_code == OrderStatus.DELIVERY):
+            continue
+        started = conn.execute(
+            """SELECT created_at FROM order_events
+            WHERE order_id = ? AND status_code = ? ORDER BY event_id LIMIT 1""",
+            (order_id, int(start_code))).fetchone()
+        if started is None:
+            continue
+        conn.execute("""
+            INSERT INTO order_stage_metrics (stage, samples, total_seconds, max_seconds)
+            VALUES (?, 1, MAX(0, (julianday(?) - julianday(?)) * 86400),
+                    MAX(0, (julianday(?) - julianday(?)) * 86400))
+            ON CONFLICT(stage) DO UPDATE SET
+                samples = samples + 1,
+                total_seconds = total_seconds + excluded.total_seconds,
+                max_seconds = MAX(max_seconds, excluded.max_seconds)
+        """, (stage, at, started[0], at, started[0]))
+    return old_code
+
+
+def read_stage_metrics(conn: sqlite3.Connection) -> List[Dict]:
+    """Возвращает метрики этапов: количество, среднее и максимум в секундах"""
+    rows = dict((row[0], row[1:]) for row in conn.execute(
+        "SELECT stage, samples, total_seconds, max_seconds FROM order_stage_metrics"))
+    metrics = []
+    for stage, _, _ in STAGES:
+        samples, total, maximum = rows.get(stage, (0, 0.0, 0.0))
+        metrics.append({
+            'stage': stage,
+            'title': STAGE_TITLES[stage],
+            'samples': samples,
+            'avg_seconds': total / samples if samples else 0.0,
+            'max_seconds': maximum
+        })
+    return metrics
@@ -0,0 +1,396 @@
+import asyncio
+import re
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from foodfit_bot.config.database import db
+
+logger = logging.getLogger(__name__)
+
+PROMO_PERCENT = 'percent'
+PROMO_FIXED = 'fixed'
+PROMO_DISH = 'dish'
+PROMO_KINDS = {
+    PROMO_PERCENT: 'скидка на заказ, %',
+    PROMO_FIXED: 'скидка на заказ, ₽',
+    PROMO_DISH: 'скидка на блюдо, %',
+}
+
+# Код "-" в описании акции: скидка применяется автоматически, без ввода кода
+AUTO_CODE = '-'
+
+PROMO_COLUMNS = ('promo_id', 'code', 'kind', 'value', 'dish_id', 'min_total', 'first_order',
+                 'starts_at', 'ends_at', 'hour_from', 'hour_to')
+
+# Позиция корзины для расчета: (dish_id, quantity, price)
+CartLine = Tuple[int, int, int]
+
+
+class CheckoutContext:
+    """Данные оформления, от которых зависят условия акций"""
+
+    __slots__ = ('now', 'hour', 'subtotal', '_first_order', '_is_first')
+
+    def __init__(self, now: str, subtotal: int, first_order: Callable[[], bool]):
+        self.now = now
+        self.hour = int(now[11:13])
+        self.subtotal = subtotal
+        self._first_order = first_order
+        self._is_first: Optional[bool] = None
+
+    @property
+    def first_order(self) -> bool:
+        # Запрос к БД делается, только если дошло до акции на первый заказ
+        if self._is_first is None:
+            self._is_first = self._first_order()
+        return self._is_first
+
+
+class CompiledPromo:
+    """Акция, условия которой собраны в список проверок.
+
+    Проверки создаются только для заданных условий и идут от дешевых к
+    дорогим: акция без условий применяется без единой проверки, а
+    "первый заказ" спрашивает БД последним.
+    """
+
+    __slots__ = ('promo_id', 'code', 'kind', 'value', 'dish_id', 'conditions', 'row')
+
+    def __init__(self, row: Dict):
+        self.row = row
+        self.promo_id = row['promo_id']
+        self.code = row['code']
+        self.kind = row['kind']
+        self.value = row['value']
+        self.dish_id = row['dish_id']
+
+        conditions: List[Callable[[CheckoutContext], bool]] = []
+        if row['starts_at']:
+            starts_at = row['starts_at']
+            conditions.append(lambda ctx: ctx.now >= starts_at)
+        if row['ends_at']:
+            ends_at = row['ends_at']
+            conditions.append(lambda ctx: ctx.now <= ends_at)
+        if row['hour_from'] is not None and row['hour_to'] is not None:
+            hour_from, hour_to = row['hour_from'], row['hour_to']
+            if hour_from <= hour_to:
+                conditions.append(lambda ctx: hour_from <= ctx.hour < hour_to)
+            else:
+                # Окно через полночь, например 22-2
+                conditions.append(lambda ctx: ctx.hour >= hour_from or ctx.hour < hour_to)
+        if row['min_total']:
+            min_total = row['min_total']
+            conditions.append(lambda ctx: ctx.subtotal >= min_total)
+        if row['first_order']:
+            conditions.append(lambda ctx: ctx.first_order)
+        self.conditions = tuple(conditions)
+
+    def applies(self, ctx: CheckoutContext) -> bool:
+        for condition in self.conditions:
+            if not condition(ctx):
+                return False
+        return True
+
+    def order_discount(self, subtotal: int) -> int:
+        """Скидка акции на весь заказ"""
+        if self.kind == PROMO_PERCENT:
+            return subtotal * self.value // 100
+        return min(self.value, subtotal)
+
+
+class PromoResult(NamedTuple):
+    subtotal: int
+    discount: int
+    promo: Optional[CompiledPromo]
+
+    @property
+    def total(self) -> int:
+        return self.subtotal - self.discount
+
+
+class PromoSet:
+    """Снимок активных акций, разложенный для расчета за один проход.
+
+    Автоматические скидки на заказ отсортированы по убыванию размера,
+    поэтому первая подошедшая — лучшая в своем виде. Скидки на блюда
+    лежат в словаре по dish_id: позиция корзины смотрит только акции
+    своего блюда. Время расчета зависит от корзины, а не от числа акций.
+    """
+
+    def __init__(self, promos: Sequence[CompiledPromo]):
+        self.by_code: Dict[str, CompiledPromo] = {}
+        self.dish_rules: Dict[int, List[CompiledPromo]] = {}
+        percent, fixed = [], []
+        for promo in promos:
+            if promo.code:
+                self.by_code[promo.code] = promo
+            elif promo.kind == PROMO_DISH:
+                self.dish_rules.setdefault(promo.dish_id, []).append(promo)
+            elif promo.kind == PROMO_PERCENT:
+                percent.append(promo)
+            else:
+                fixed.append(promo)
+        self.percent_rules = sorted(percent, key=lambda p: -p.value)
+        self.fixed_rules = sorted(fixed, key=lambda p: -p.value)
+        for rules in self.dish_rules.values():
+            rules.sort(key=lambda p: -p.value)
+        self.count = len(promos)
+
+    def evaluate(self, lines: Sequence[CartLine], now: str,
+                 first_order: Callable[[], bool], code: Optional[str] = None) -> PromoResult:
+        """
+        Подбирает лучшую скидку для корзины. Скидки не суммируются:
+        применяется одна акция с наибольшей скидкой (введенный код
+        соревнуется с автоматическими акциями).
+        :param lines: Позиции корзины (dish_id, quantity, price)
+        :param now: Время оформления "%Y-%m-%d %H:%M:%S"
+        :param first_order: Проверка, что у пользователя нет других заказов
+        :param code: Введенный промокод
+        :return: Сумма без скидки, скидка и примененная акция
+        """
+        coded = self.by_code.get(normalize_code(code)) if code else None
+        subtotal = 0
+        dish_lines: List[Tuple[List[CompiledPromo], int]] = []
+        coded_line = 0
+        # Единственный проход по корзине: сумма и позиции, к которым есть акции
+        for dish_id, quantity, price in lines:
+            line = quantity * price
+            subtotal += line
+            rules = self.dish_rules.get(dish_id)
+            if rules is not None:
+                dish_lines.append((rules, line))
+            if coded is not None and coded.kind == PROMO_DISH and coded.dish_id == dish_id:
+                coded_line = line
+
+        ctx = CheckoutContext(now, subtotal, first_order)
+        best, best_discount = None, 0
+        for rules in (self.percent_rules, self.fixed_rules):
+            for promo in rules:
+                discount = promo.order_discount(subtotal)
+                if discount <= best_discount:
+                    # Дальше по списку скидки только меньше
+                    break
+                if promo.applies(ctx):
+                    best, best_discount = promo, discount
+                    break
+        for rules, line in dish_lines:
+            for promo in rules:
+                discount = line * promo.value // 100
+                if discount <= best_discount:
+                    break
+                if promo.applies(ctx):
+                    best, best_discount = promo, discount
+                    break
+        if coded is not None:
+            discount = coded_line * coded.value // 100 if coded.kind == PROMO_DISH \
+                else coded.order_discount(subtotal)
+            if discount > best_discount and coded.applies(ctx):
+                best, best_discount = coded, discount
+
+        return PromoResult(subtotal, best_discount, best)
+
+
+def normalize_code(code: str) -> str:
+    return code.strip().upper()
+
+
+def describe_promo(promo: Dict) -> str:
+    """Краткое описание акции для администратора и покупателя"""
+    code = promo['code'] or 'автоматически'
+    if promo['kind'] == PROMO_FIXED:
+        text = f"−{promo['value']}₽ на заказ"
+    elif promo['kind'] == PROMO_DISH:
+        text = f"−{promo['value']}% на блюдо #{promo['dish_id']}"
+    else:
+        text = f"−{promo['value']}% на заказ"
+    conditions = []
+    if promo['min_total']:
+        conditions.append(f"от {promo['min_total']}₽")
+    if promo['first_order']:
+        conditions.append("первый заказ")
+    if promo['hour_from'] is not None and promo['hour_to'] is not None:
+        conditions.append(f"с {promo['hour_from']}:00 до {promo['hour_to']}:00")
+    if promo['starts_at']:
+        conditions.append(f"с {promo['starts_at'][:10]}")
+    if promo['ends_at']:
+        conditions.append(f"по {promo['ends_at'][:10]}")
+    suffix = f" ({', '.join(conditions)})" if conditions else ""
+    return f"🎟 {code}: {text}{suffix}"
+
+
+def _parse_day(value: str) -> str:
+    for fmt in ("%d.%m.%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    raise ValueError(f"Не удалось распознать дату: {value}")
+
+
+def parse_promo(text: str) -> Dict:
+    """
+    Разбирает описание акции от администратора:
+    "КОД тип значение [dish=ID] [min=СУММА] [first] [hours=15-17] [from=ДАТА] [to=ДАТА]",
+    код "-" — автоматическая скидка без кода
+    :param text: Текст сообщения
+    :return: Поля акции для PromoEngine.create
+    :raises ValueError: Если описание некорректно (текст ошибки для пользователя)
+    """
+    parts = text.split()
+    if len(parts) < 3:
+        raise ValueError("Нужно минимум три поля: код, тип и значение")
+    code, kind, value = parts[0], parts[1].lower(), parts[2]
+    if kind not in PROMO_KINDS:
+        raise ValueError(f"Неизвестный тип: {kind}. Допустимы: {', '.join(PROMO_KINDS)}")
+    if not value.isdigit() or int(value) <= 0:
+        raise ValueError("Значение должно быть положительным целым числом")
+    if kind != PROMO_FIXED and int(value) > 100:
+        raise ValueError("Процент скидки не может быть больше 100")
+    if code != AUTO_CODE and not re.fullmatch(r"[A-Za-zА-Яа-я0-9_]{3,32}", code):
+        raise ValueError("Код: от 3 до 32 букв, цифр или _")
+
+    promo = {
+        'code': None if code == AUTO_CODE else normalize_code(code),
+        'kind': kind,
+        'value': int(value),
+        'dish_id': None,
+        'min_total': 0,
+        'first_order': 0,
+        'starts_at': None,
+        'ends_at': None,
+        'hour_from': None,
+        'hour_to': None,
+    }
+    for option in parts[3:]:
+        name, _, arg = option.partition('=')
+        name = name.lower()
+        if name == 'first' and not arg:
+            promo['first_order'] = 1
+        elif name == 'dish' and arg.isdigit():
+            promo['dish_id'] = int(arg)
+        elif name == 'min' and arg.isdigit():
+            promo['min_total'] = int(arg)
+        elif name == 'hours' and re.fullmatch(r"\d{1,2}-\d{1,2}", arg):
+            hour_from, hour_to = (int(h) for h in arg.split('-'))
+            if hour_from > 23 or hour_to > 24 or hour_from == hour_to:
+                raise ValueError("Часы указываются как 15-17 (от 0 до 24)")
+            promo['hour_from'], promo['hour_to'] = hour_from, hour_to
+        elif name == 'from' and arg:
+            promo['starts_at'] = f"{_parse_day(arg)} 00:00:00"
+        elif name == 'to' and arg:
+            promo['ends_at'] = f"{_parse_day(arg)} 23:59:59"
+        else:
+            raise ValueError(f"Непонятный параметр: {option}")
+
+    if kind == PROMO_DISH and promo['dish_id'] is None:
+        raise ValueError("Для скидки на блюдо укажите dish=ID")
+    if kind != PROMO_DISH and promo['dish_id'] is not None:
+        raise ValueError("dish=ID указывается только для типа dish")
+    return promo
+
+
+class PromoEngine:
+    """Кэш активных акций в памяти.
+
+    Акции загружаются одним запросом и компилируются в PromoSet, который
+    оформление заказа использует без обращения к таблице promos. После
+    создания или отключения акции вызывается invalidate(), и следующее
+    оформление перезагружает снимок (как MenuCatalog для меню).
+    """
+
+    def __init__(self):
+        self._promos = PromoSet(())
+        self._version = 0
+        self._loaded_version = -1
+        self._lock: Optional[asyncio.Lock] = None
+
+    def invalidate(self) -> None:
+        """Помечает снимок устаревшим (вызывается после изменения акций)"""
+        self._version += 1
+
+    @staticmethod
+    def _load(conn: sqlite3.Connection) -> List[tuple]:
+        # Уже закончившиеся акции в снимок не попадают
+        return conn.execute(f"""
+            SELECT {', '.join(PROMO_COLUMNS)} FROM promos
+            WHERE active = 1 AND (ends_at IS NULL OR ends_at >= ?)
+        """, (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),)).fetchall()
+
+    async def promos(self) -> PromoSet:
+        """Возвращает актуальный снимок акций"""
+        if self._loaded_version == self._version:
+            return self._promos
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if self._loaded_version != self._version:
+                version = self._version
+                try:
+                    rows = await db.run(self._load)
+                except sqlite3.Error as e:
+                    logger.error(f"Ошибка загрузки акций: {e}")
+                    raise
+                self._promos = PromoSet([CompiledPromo(dict(zip(PROMO_COLUMNS, row))) for row in rows])
+                self._loaded_version = version
+                logger.info(f"Акции загружены: {self._promos.count}, версия {version}")
+        return self._promos
+
+    async def quote(self, user_id: int, lines: Sequence[CartLine], code: Optional[str] = None) -> PromoResult:
+        """
+        Предварительный расчет скидки для корзины (до оформления)
+        :param user_id: ID пользователя
+        :param lines: Позиции корзины (dish_id, quantity, price)
+        :param code: Введенный промокод
+        """
+        promos = await self.promos()
+        try:
+            first = await db.fetchval("SELECT NOT EXISTS (SELECT 1 FROM orders WHERE user_id = ?)", (user_id,))
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка проверки первого заказа: {e}")
+            first = 0
+        return promos.evaluate(lines, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), lambda: first == 1, code)
+
+    # ---------------------- Управление ----------------------
+    async def create(self, promo: Dict) -> Optional[int]:
+        """
+        Создает акцию
+        :param promo: Поля акции (как parse_promo)
+        :return: ID акции или None, если код уже занят или ошибка
+        """
+        columns = [column for column in PROMO_COLUMNS if column != 'promo_id']
+        try:
+            _, promo_id = await db.write(
+                f"INSERT INTO promos ({', '.join(columns)}, created_at) "
+                f"VALUES ({', '.join('?' * len(columns))}, ?)",
+                [promo[column] for column in columns] + [datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
+        except sqlite3.IntegrityError:
+            return None
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка создания акции: {e}")
+            return None
+        self.invalidate()
+        return promo_id
+
+    async def disable(self, promo_id: int) -> bool:
+        """Отключает акцию"""
+        try:
+            changed, _ = await db.write("UPDATE promos SET active = 0 WHERE promo_id = ? AND active = 1", (promo_id,))
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка отключения акции: {e}")
+            return False
+        self.invalidate()
+        return bool(changed)
+
+    async def list_active(self) -> List[Dict]:
+        """Активные акции для администратора"""
+        promos = await self.promos()
+        rows = [promo.row for promo in promos.by_code.values()]
+        rows += [promo.row for promo in promos.percent_rules + promos.fixed_rules]
+        rows += [promo.row for rules in promos.dish_rules.values() for promo in rules]
+        return sorted(rows, key=lambda row: row['promo_id'])
+
+
+promo_engine = PromoEngine()
@@ -0,0 +1,161 @@
+import sqlite3
+from typing import Dict, Sequence, Tuple
+
+from foodfit_bot.services.order_lifecycle import OrderStatus
+
+TOP_DISHES = 5
+
+# Выручка блюда — доля позиции в сумме заказа после скидки, чтобы выручка
+# блюд сходилась с daily_sales.revenue: скидка делится пропорционально позициям
+_NET_LINE_SQL = '''CASE WHEN o.discount > 0
+    THEN oi.quantity * oi.price * o.total_amount * 1.0 / (o.total_amount + o.discount)
+    ELSE oi.quantity * oi.price END'''
+
+# Вклад одного заказа в дневные агрегаты; sign = 1 при создании, -1 при отмене.
+# Калории берутся из позиции заказа, а не из меню: правка блюда не меняет историю
+_ORDER_SALES_SQL = '''
+    INSERT INTO daily_sales (day, orders, revenue, items, calories)
+    SELECT substr(o.order_date, 1, 10), ?, ? * o.total_amount,
+           ? * COALESCE(SUM(oi.quantity), 0), ? * COALESCE(SUM(oi.quantity * COALESCE(oi.calories, 0)), 0)
+    FROM orders o
+    LEFT JOIN order_items oi ON oi.order_id = o.order_id
+    WHERE o.order_id = ?
+    GROUP BY o.order_id
+    ON CONFLICT(day) DO UPDATE SET
+        orders = orders + excluded.orders,
+        revenue = revenue + excluded.revenue,
+        items = items + excluded.items,
+        calories = calories + excluded.calories
+'''
+
+_DAY_UPSERT_SQL = '''
+    INSERT INTO daily_sales (day, orders, revenue, items, calories) VALUES (?, 1, ?, ?, ?)
+    ON CONFLICT(day) DO UPDATE SET
+        orders = orders + 1,
+        revenue = revenue + excluded.revenue,
+        items = items + excluded.items,
+        calories = calories + excluded.calories
+'''
+
+_DISH_UPSERT_SQL = '''
+    INSERT INTO daily_dish_sales (day, dish_id, quantity, revenue) VALUES (?, ?, ?, ?)
+    ON CONFLICT(day, dish_id) DO UPDATE SET
+        quantity = quantity + excluded.quantity,
+        revenue = revenue + excluded.revenue
+'''
+
+_DISH_SALES_SQL = f'''
+    INSERT INTO daily_dish_sales (day, dish_id, quantity, revenue)
+    SELECT substr(o.order_date, 1, 10), oi.dish_id, ? * SUM(oi.quantity), ? * SUM({_NET_LINE_SQL})
+    FROM orders o JOIN order_items oi ON oi.order_id = o.order_id
+    WHERE o.order_id = ?
+    GROUP BY oi.dish_id
+    ON CONFLICT(day, dish_id) DO UPDATE SET
+        quantity = quantity + excluded.quantity,
+        revenue = revenue + excluded.revenue
+'''
+
+
+def _apply_order(conn: sqlite3.Connection, order_id: int, sign: int) -> None:
+    conn.execute(_ORDER_SALES_SQL, (sign, sign, sign, sign, order_id))
+    conn.execute(_DISH_SALES_SQL, (sign, sign, order_id))
+
+
+def record_order(conn: sqlite3.Connection, order_date: str, total: float, discount: float,
+                 lines: Sequence[Tuple]) -> None:
+    """
+    Добавляет созданный заказ в дневные агрегаты (в транзакции оформления).
+    Позиции уже прочитаны при оформлении, поэтому заказ не перечитывается.
+    :param order_date: Дата заказа "%Y-%m-%d %H:%M:%S"
+    :param total: Сумма заказа после скидки
+    :param discount: Скидка заказа, делится между позициями пропорционально
+    :param lines: Позиции (dish_id, quantity, price, calories, ...)
+    """
+    day = order_date[:10]
+    conn.execute(_DAY_UPSERT_SQL, (day, total, sum(line[1] for line in lines),
+                                   sum(line[1] * line[3] for line in lines)))
+    conn.executemany(_DISH_UPSERT_SQL, [
+        (day, line[0], line[1],
+         line[1] * line[2] * total / (total + discount) if discount > 0 else line[1] * line[2])
+        for line in lines])
+
+
+def remove_order(conn: sqlite3.Connection, order_id: int) -> None:
+    """Вычитает отмененный заказ из дневных агрегатов"""
+    _apply_order(conn, order_id, -1)
+
+
+def rebuild_rollups(conn: sqlite3.Connection) -> None:
+    """Пересчитывает агрегаты с нуля по всем неотмененным заказам"""
+    cancelled = int(OrderStatus.CANCELLED)
+    conn.execute("DELETE FROM daily_sales")
+    conn.execute("DELETE FROM daily_dish_sales")
+    conn.execute('''
+        INSERT INTO daily_sales (day, orders, revenue, items, calories)
+        SELECT day, COUNT(*), SUM(total_amount), SUM(items), SUM(calories)
+        FROM (
+            SELECT substr(o.order_date, 1, 10) AS day, o.total_amount,
+                   COALESCE(SUM(oi.quantity), 0) AS items,
+                   COALESCE(SUM(oi.quantity * COALESCE(oi.calories, 0)), 0) AS calories
+            FROM orders o
+            LEFT JOIN order_items oi ON oi.order_id = o.order_id
+            WHERE o.status_code != ?
+            GROUP BY o.order_id
+        )
+        GROUP BY day
+    ''', (cancelled,))
+    conn.execute(f'''
+        INSERT INTO daily_dish_sales (day, dish_id, quantity, revenue)
+        SELECT substr(o.order_date, 1, 10), oi.dish_id, SUM(oi.quantity), SUM({_NET_LINE_SQL})
+        FROM orders o JOIN order_items oi ON oi.order_id = o.order_id
+        WHERE o.status_code != ?
+        GROUP BY 1, 2
+    ''', (cancelled,))
+
+
+def read_report(conn: sqlite3.Connection, date_from: str, date_to: str, top: int = TOP_DISHES) -> Dict:
+    """
+    Отчет о продажах за период по дневным агрегатам
+    :param date_from: Первый день "%Y-%m-%d"
+    :param date_to: Последний день "%Y-%m-%d" включительно
+    :param top: Сколько самых продаваемых блюд вернуть
+    :return: Заказы, выручка, средний чек, порции, калории, по дням и топ блюд
+             (выручка блюд — с учетом скидок, как и общая)
+    """
+    orders, revenue, items, calories = conn.execute('''
+        SELECT COALESCE(SUM(orders), 0), COALESCE(SUM(revenue), 0),
+               COALESCE(SUM(items), 0), COALESCE(SUM(calories), 0)
+        FROM daily_sales WHERE day BETWEEN ? AND ?
+    ''', (date_from, date_to)).fetchone()
+    days = conn.execute('''
+        SELECT day, orders, revenue FROM daily_sales
+        WHERE day BETWEEN ? AND ? AND orders > 0 ORDER BY day
+    ''', (date_from, date_to)).fetchall()
+    # Названия подставляются только для топа, а не для каждой строки агрегатов
+    top_dishes = conn.execute('''
+        SELECT s.dish_id, COALESCE(m.name, 'Блюдо #' || s.dish_id), s.quantity, s.revenue
+        FROM (
+            SELECT dish_id, SUM(quantity) AS quantity, SUM(revenue) AS revenue
+            FROM daily_dish_sales
+            WHERE day BETWEEN ? AND ?
+            GROUP BY dish_id
+            HAVING quantity > 0
+            ORDER BY quantity DESC, dish_id
+            LIMIT ?
+        ) s LEFT JOIN menu m ON m.dish_id = s.dish_id
+        ORDER BY s.quantity DESC, s.dish_id
+    ''', (date_from, date_to, top)).fetchall()
+
+    return {
+        'date_from': date_from,
+        'date_to': date_to,
+        'orders': orders,
+        'revenue': revenue,
+        'average_basket': revenue / orders if orders else 0.0,
+        'items': items,
+        'calories': calories,
+        'days': [{'day': d[0], 'orders': d[1], 'revenue': d[2]} for d in days],
+        'top_dishes': [
+            {'dish_id': d[0], 'name': d[1], 'quantity': d[2], 'revenue': d[3]} for d in top_dishes
+        ]
+    }
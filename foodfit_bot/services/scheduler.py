@@ -0,0 +1,226 @@
+import asyncio
+import os
+import sqlite3
+import time
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from foodfit_bot.config.database import db
+from foodfit_bot.services.ai_service import AIService
+from foodfit_bot.services.database_service import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+# Окно низкой нагрузки, в котором пересчитываются рекомендации
+OFF_PEAK_START_HOUR = int(os.getenv("OFF_PEAK_START_HOUR", "3"))
+OFF_PEAK_END_HOUR = int(os.getenv("OFF_PEAK_END_HOUR", "6"))
+RECOMMENDATION_BATCH_SIZE = int(os.getenv("RECOMMENDATION_BATCH_SIZE", "50"))
+RECOMMENDATION_KEEP_DAYS = 3
+# Пауза между попытками сгенерировать предложение дня после ошибки LLM
+SPECIAL_RETRY_SECONDS = int(os.getenv("SPECIAL_RETRY_SECONDS", "300"))
+
+
+def _day(value: Optional[date] = None) -> str:
+    return (value or date.today()).strftime("%Y-%m-%d")
+
+
+class DailyContentScheduler:
+    """Фоновый расчет предложения дня и персональных рекомендаций.
+
+    Предложение дня генерируется один раз в сутки, рекомендации -
+    пачками по RECOMMENDATION_BATCH_SIZE пользователей в окне низкой
+    нагрузки. Обработчики читают готовый результат из памяти или по
+    первичному ключу, не обращаясь к LLM. Если предложения дня нет
+    (LLM была недоступна), чтение запускает повторную генерацию в фоне;
+    рекомендацию для пользователя без готовой строки генерируют один
+    раз по запросу и сохраняют.
+    """
+
+    def __init__(self):
+        self._specials: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._special_task: Optional[asyncio.Task] = None
+        self._special_attempt = 0.0
+
+    # ---------------------- Чтение ----------------------
+    async def get_daily_special(self) -> Optional[str]:
+        """Возвращает предложение дня из памяти или БД"""
+        day = _day()
+        special = self._specials.get(day)
+        if special is None:
+            try:
+                special = await db.fetchval("SELECT text FROM daily_specials WHERE day = ?", (day,))
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка чтения предложения дня: {e}")
+                return None
+            if special is not None:
+                self._specials = {day: special}
+            else:
+                self._retry_special()
+        return special
+
+    def _retry_special(self) -> None:
+        """Запускает генерацию предложения дня в фоне, не чаще SPECIAL_RETRY_SECONDS"""
+        now = time.monotonic()
+        if self._special_task is not None and not self._special_task.done():
+            return
+        if now - self._special_attempt < SPECIAL_RETRY_SECONDS:
+            return
+        self._special_attempt = now
+
+        async def _retry() -> None:
+            try:
+                await self.precompute_special()
+            except Exception as e:
+                logger.error(f"Ошибка расчета предложения дня: {e}")
+
+        self._special_task = asyncio.create_task(_retry())
+
+    async def get_recommendation(self, user_id: int) -> Optional[str]:
+        """Возвращает сегодняшнюю рекомендацию пользователя, при отсутствии генерирует ее"""
+        day = _day()
+        try:
+            recommendation = await db.fetchval(
+                "SELECT text FROM user_recommendations WHERE user_id = ? AND day = ?",
+                (user_id, day))
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка чтения рекомендации: {e}")
+            return None
+        if recommendation is not None:
+            return recommendation
+
+        # Новый пользователь или не попал в ночной расчет: считаем по запросу,
+        # повторные запросы за день читают сохраненную строку (и ai_cache)
+        _, recommendation = await self._recommend(user_id)
+        if recommendation:
+            try:
+                await db.write(
+                    "INSERT OR IGNORE INTO user_recommendations (user_id, day, text) VALUES (?, ?, ?)",
+                    (user_id, day, recommendation))
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка сохранения рекомендации: {e}")
+        return recommendation
+
+    # ---------------------- Расчет ----------------------
+    async def precompute_special(self, day: Optional[date] = None) -> Optional[str]:
+        """Генерирует предложение дня, если его еще нет"""
+        day = day or date.today()
+        key = _day(day)
+        existing = await db.fetchval("SELECT text FROM daily_specials WHERE day = ?", (key,))
+        if existing is not None:
+            self._specials = {key: existing}
+            return existing
+
+        special = await AIService.generate_daily_special(datetime.combine(day, datetime.min.time()))
+        if special is None:
+            # Заглушку не сохраняем, иначе она закрыла бы день от повторных попыток
+            logger.warning(f"Предложение дня на {key} не сгенерировано, повторим позже")
+            return None
+        await db.write(
+            "INSERT OR REPLACE INTO daily_specials (day, text, created_at) VALUES (?, ?, ?)",
+            (key, special, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        self._specials = {key: special}
+        logger.info(f"Предложение дня на {key} рассчитано")
+        return special
+
+    async def _next_users(self, after_user_id: int, day: str) -> List[int]:
+        """Следующая пачка пользователей с заказами и без рекомендации на день"""
+        rows = await db.fetchall("""
+            SELECT u.user_id FROM users u
+            WHERE u.user_id > ?
+              AND EXISTS (SELECT 1 FROM orders o WHERE o.user_id = u.user_id)
+              AND NOT EXISTS (
+                  SELECT 1 FROM user_recommendations r
+                  WHERE r.user_id = u.user_id AND r.day = ?
+              )
+            ORDER BY u.user_id
+            LIMIT ?
+        """, (after_user_id, day, RECOMMENDATION_BATCH_SIZE))
+        return [row[0] for row in rows]
+
+    @staticmethod
+    async def _recommend(user_id: int) -> Tuple[int, Optional[str]]:
+        preferences = await DatabaseService.get_user_preferences(user_id)
+        text = (
+            f"Диета: {preferences['diet'] or 'не указана'}; "
+            f"Недавно заказывал: {', '.join(preferences['last_orders']) or 'нет данных'}"
+        )
+        return user_id, await AIService.generate_daily_recommendation(text)
+
+    async def precompute_recommendations(self, day: Optional[date] = None) -> int:
+        """
+        Рассчитывает рекомендации для всех активных пользователей пачками
+        :return: Количество сохраненных рекомендаций
+        """
+        key = _day(day)
+        saved, last_user_id = 0, 0
+        while True:
+            user_ids = await self._next_users(last_user_id, key)
+            if not user_ids:
+                break
+            last_user_id = user_ids[-1]
+
+            results = await asyncio.gather(*(self._recommend(user_id) for user_id in user_ids))
+            rows = [(user_id, key, text) for user_id, text in results if text]
+            if rows:
+                await db.executemany(
+                    "INSERT OR REPLACE INTO user_recommendations (user_id, day, text) VALUES (?, ?, ?)",
+                    rows)
+                saved += len(rows)
+
+        await db.execute(
+            "DELETE FROM user_recommendations WHERE day < ?",
+            (_day(date.today() - timedelta(days=RECOMMENDATION_KEEP_DAYS)),))
+        logger.info(f"Рекомендации на {key}: сохранено {saved}")
+        return saved
+
+    # ---------------------- Планирование ----------------------
+    @staticmethod
+    def _seconds_until_off_peak(now: datetime) -> float:
+        if OFF_PEAK_START_HOUR <= now.hour < OFF_PEAK_END_HOUR:
+            return 0
+        start = now.replace(hour=OFF_PEAK_START_HOUR, minute=0, second=0, microsecond=0)
+        if start <= now:
+            start += timedelta(days=1)
+        return (start - now).total_seconds()
+
+    async def _run(self) -> None:
+        # Предложение дня нужно сразу, не дожидаясь ночного окна
+        try:
+            await self.precompute_special()
+        except Exception as e:
+            logger.error(f"Ошибка расчета предложения дня: {e}")
+
+        while True:
+            await asyncio.sleep(self._seconds_until_off_peak(datetime.now()))
+            try:
+                await self.precompute_special()
+                await self.precompute_recommendations()
+            except Exception as e:
+                logger.error(f"Ошибка фонового расчета рекомендаций: {e}")
+            # Не запускаем повторно в том же окне
+            now = datetime.now()
+            end = now.replace(hour=OFF_PEAK_END_HOUR, minute=0, second=0, microsecond=0)
+            await asyncio.sleep(max((end - now).total_seconds(), 0) + 1)
+
+    def start(self) -> None:
+        """Запускает фоновую задачу"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="daily-content-scheduler")
+
+    async def stop(self) -> None:
+        """Останавливает фоновую задачу"""
+        if self._special_task is not None:
+            self._special_task.cancel()
+            self._special_task = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+scheduler = DailyContentScheduler()
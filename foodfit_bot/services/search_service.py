@@ -0,0 +1,192 @@
+import re
+import heapq
+import asyncio
+import logging
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Set
+
+from foodfit_bot.services.catalog import DishRecord, MenuCatalog, catalog
+
+logger = logging.getLogger(__name__)
+
+# Поля блюда, совпадения в которых дают дополнительный вес к ранжированию
+# (совпадение в описании дает 1, в тегах 2, в названии 3)
+BOOSTED_FIELDS = (('name', 2), ('tags', 1))
+# Минимальная доля триграмм запроса, которые должны совпасть
+MIN_MATCH_RATIO = 0.5
+SEARCH_LIMIT = 20
+
+_non_word = re.compile(r'[^\w]+')
+
+
+def normalize(text: Optional[str]) -> str:
+    """Приводит текст к нижнему регистру, заменяет ё на е и убирает пунктуацию"""
+    if not text:
+        return ""
+    return _non_word.sub(' ', text.lower().replace('ё', 'е')).strip()
+
+
+def trigrams(text: str) -> Set[str]:
+    """Триграммы слов нормализованного текста (с пробелами по краям слова)"""
+    grams = set()
+    for word in text.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class DishSearchIndex:
+    """Триграммный инвертированный индекс по названию, тегам и описанию.
+
+    Индекс строится по каталогу меню и перестраивается, когда меняется
+    версия каталога (после правок блюд в админке). Триграммы дают поиск
+    без учета регистра, ё/е и с устойчивостью к опечаткам; результаты
+    ранжируются по числу совпавших триграмм с бонусом за название и теги.
+    """
+
+    def __init__(self, source: Optional[MenuCatalog]):
+        self.source = source
+        self._records: Sequence[DishRecord] = ()
+        self._names: List[str] = []
+        self._postings: Dict[str, array] = {}
+        self._bitmaps: Dict[str, bytearray] = {}
+        self._boosted: Dict[str, Dict[str, array]] = {field: {} for field, _ in BOOSTED_FIELDS}
+        self._version = -1
+        self._lock: Optional[asyncio.Lock] = None
+
+    @staticmethod
+    def _add(postings: Dict[str, array], grams: Set[str], doc: int) -> None:
+        for gram in grams:
+            docs = postings.get(gram)
+            if docs is None:
+                docs = postings[gram] = array('I')
+            docs.append(doc)
+
+    def build(self, records: Sequence[DishRecord]) -> None:
+        """Строит индекс по списку блюд"""
+        postings: Dict[str, array] = {}
+        boosted: Dict[str, Dict[str, array]] = {field: {} for field, _ in BOOSTED_FIELDS}
+        names = []
+        for doc, record in enumerate(records):
+            name = normalize(record.name)
+            name_grams = trigrams(name)
+            tag_grams = trigrams(normalize(record.tags))
+            self._add(boosted['name'], name_grams, doc)
+            self._add(boosted['tags'], tag_grams, doc)
+            self._add(postings, name_grams | tag_grams | trigrams(normalize(record.description)), doc)
+            names.append(name)
+
+        # Для частых триграмм храним битовую карту: она не больше массива
+        # и позволяет проверить принадлежность блюда за O(1)
+        bitmaps: Dict[str, bytearray] = {}
+        threshold = max(len(records) // 32, 1)
+        for gram, docs in postings.items():
+            if len(docs) > threshold:
+                bitmap = bytearray(len(records) // 8 + 1)
+                for doc in docs:
+                    bitmap[doc >> 3] |= 1 << (doc & 7)
+                bitmaps[gram] = bitmap
+
+        self._records = records
+        self._names = names
+        self._postings = postings
+        self._bitmaps = bitmaps
+        self._boosted = boosted
+
+    async def ensure_built(self) -> None:
+        """Перестраивает индекс, если каталог изменился"""
+        version, records = await self.source.versioned_records()
+        if self._version == version:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if self._version == version:
+                return
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.build, records)
+            self._version = version
+            logger.info(f"Поисковый индекс перестроен: {len(records)} блюд")
+
+    def query(self, text: str, limit: int = SEARCH_LIMIT) -> List[DishRecord]:
+        """
+        Ищет блюда по уже построенному индексу
+        :param text: Поисковый запрос
+        :param limit: Максимум результатов
+        :return: Блюда в порядке релевантности
+        """
+        query = normalize(text)
+        grams = trigrams(query)
+        if not grams:
+            return []
+
+        min_matches = max(1, int(len(grams) * MIN_MATCH_RATIO))
+        present = sorted(
+            ((gram, self._postings[gram]) for gram in grams if gram in self._postings),
+            key=lambda item: len(item[1]))
+        if len(present) < min_matches:
+            return []
+
+        # Блюдо с min_matches совпадениями обязано содержать хотя бы одну из
+        # len(present) - min_matches + 1 самых редких триграмм, поэтому
+        # кандидатов набираем только по ним (Counter.update работает на C)
+        rare = len(present) - min_matches + 1
+        matches: Counter = Counter()
+        for _, docs in present[:rare]:
+            matches.update(docs)
+
+        for gram, docs in present[rare:]:
+            bitmap = self._bitmaps.get(gram)
+            # Проверка по карте идет в Python, поэтому выгодна, только если
+            # кандидатов заметно меньше, чем блюд с этой триграммой
+            if bitmap is None or len(matches) * 4 > len(docs):
+                matches.update(docs)
+                continue
+            for doc in matches:
+                if bitmap[doc >> 3] & (1 << (doc & 7)):
+                    matches[doc] += 1
+
+        candidates = [doc for doc, count in matches.items() if count >= min_matches]
+        if not candidates:
+            return []
+
+        # Бонусы за название и теги добавляем в тот же счетчик, чтобы
+        # отбор лучших шел по ключу без вызова Python-функции
+        for field, weight in BOOSTED_FIELDS:
+            field_postings = self._boosted[field]
+            for gram in grams:
+                docs = field_postings.get(gram)
+                if docs is not None:
+                    for _ in range(weight):
+                        matches.update(docs)
+
+        # Точное вхождение запроса в название поднимаем выше остальных
+        name_grams = [self._boosted['name'].get(gram) for gram in grams]
+        if all(docs is not None for docs in name_grams):
+            for doc in min(name_grams, key=len):
+                if query in self._names[doc]:
+                    matches[doc] += 3 * len(grams)
+
+        best = heapq.nlargest(limit, candidates, key=matches.__getitem__)
+        best.sort(key=lambda doc: (-matches[doc], self._names[doc]))
+        return [self._records[doc] for doc in best]
+
+    async def search(self, text: str, limit: int = SEARCH_LIMIT) -> List[Dict]:
+        """Ищет блюда и возвращает их в формате DatabaseService.search_dishes"""
+        await self.ensure_built()
+        return [{
+            'dish_id': record.dish_id,
+            'name': record.name,
+            'price': record.price,
+            'calories': record.calories,
+            'tags': record.tags
+        } for record in self.query(text, limit)]
+
+
+search_index = DishSearchIndex(catalog)
+
+
+async def search_menu(*args, **kwargs):
+    return await search_index.search(*args, **kwargs)
@@ -0,0 +1,264 @@
+import asyncio
+import contextlib
+import contextvars
+import os
+import time
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import TelegramObject
+
+logger = logging.getLogger(__name__)
+
+# Лимиты Telegram: около 30 сообщений в секунду на бота и около одного
+# в секунду в один чат; короткая пачка в чат (страница меню) допускается
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+SEND_GLOBAL_BURST = float(os.getenv("SEND_GLOBAL_BURST", "30"))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))
+SEND_CHAT_BURST = float(os.getenv("SEND_CHAT_BURST", "5"))
+# Повторы запроса после 429 с retry_after
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))
+SEND_MAX_TRACKED_CHATS = 10000
+
+# Полосы приоритета: меньшее значение обслуживается раньше
+LANE_STAFF = 0
+LANE_INTERACTIVE = 1
+LANE_MARKETING = 2
+LANE_NAMES = {LANE_STAFF: 'staff', LANE_INTERACTIVE: 'interactive', LANE_MARKETING: 'marketing'}
+
+# Методы, на которые действуют лимиты отправки
+LIMITED_PREFIXES = ('send', 'copyMessage', 'forwardMessage', 'editMessage')
+
+_lane: contextvars.ContextVar[int] = contextvars.ContextVar("send_lane", default=LANE_INTERACTIVE)
+
+
+@contextlib.contextmanager
+def send_lane(lane: int) -> Iterator[None]:
+    """Отправки внутри блока идут в указанной полосе приоритета"""
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Через сколько секунд будет доступен токен"""
+        self._refill(now)
+        wait = max(0.0, self.updated - now)
+        if self.tokens < 1:
+            wait += (1 - self.tokens) / self.rate
+        return wait
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def pause(self, now: float, seconds: float) -> None:
+        """Запрещает отправку на seconds секунд (ответ 429), после паузы доступен один токен"""
+        self.tokens = min(1.0, self.capacity)
+        self.updated = max(self.updated, now + seconds)
+
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class SendScheduler:
+    """Общий планировщик исходящих сообщений бота.
+
+    Каждая отправка берет токен из общей корзины бота и из корзины
+    своего чата. Если токенов нет, отправка ждет в очереди своей полосы:
+    сначала обслуживаются уведомления персонала, затем ответы
+    пользователям, затем рассылки. Чат без токенов не задерживает
+    очереди других чатов. Ответ 429 ставит чат (или весь бот) на паузу
+    на retry_after, после чего запрос повторяется.
+    """
+
+    def __init__(self, global_rate: float = SEND_GLOBAL_RATE, global_burst: float = SEND_GLOBAL_BURST,
+                 chat_rate: float = SEND_CHAT_RATE, chat_burst: float = SEND_CHAT_BURST):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._global = TokenBucket(global_rate, global_burst, time.monotonic())
+        self._chats: Dict[Any, TokenBucket] = {}
+        self._lanes: Dict[int, Deque[Tuple[Any, asyncio.Future]]] = {lane: deque() for lane in LANE_NAMES}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._pump_task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.delayed = 0
+        self.retries = 0
+
+    # ---------------------- Очередь ----------------------
+    def depth(self) -> Dict[int, int]:
+        """Количество ожидающих отправок по полосам"""
+        return {lane: len(waiters) for lane, waiters in self._lanes.items()}
+
+    def _bucket(self, chat_id: Any, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= SEND_MAX_TRACKED_CHATS:
+                self._chats = {key: b for key, b in self._chats.items() if not b.is_idle(now)}
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst, now)
+        return bucket
+
+    def _try_take(self, chat_id: Any, now: float) -> bool:
+        if self._global.wait_time(now) > 0:
+            return False
+        if chat_id is not None:
+            bucket = self._bucket(chat_id, now)
+            if bucket.wait_time(now) > 0:
+                return False
+            bucket.take()
+        self._global.take()
+        return True
+
+    async def acquire(self, chat_id: Any, lane: Optional[int] = None) -> None:
+        """
+        Ждет разрешения на отправку в чат
+        :param chat_id: ID чата или None для запросов без чата
+        :param lane: Полоса приоритета, по умолчанию из send_lane()
+        """
+        lane = _lane.get() if lane is None else lane
+        queued = any(self._lanes[l] for l in LANE_NAMES if l <= lane)
+        if not queued and self._try_take(chat_id, time.monotonic()):
+            self.sent += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._lanes[lane].append((chat_id, future))
+        self.delayed += 1
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        await future
+
+    async def _pump(self) -> None:
+        while any(self._lanes.values()):
+            self._wakeup.clear()
+            now = time.monotonic()
+            delay = self._grant(now)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _grant(self, now: float) -> float:
+        """Выдает токены ожидающим по приоритету, возвращает паузу до следующей попытки"""
+        delay = 1.0
+        for lane in sorted(self._lanes):
+            waiters = self._lanes[lane]
+            remaining: Deque[Tuple[Any, asyncio.Future]] = deque()
+            while waiters:
+                chat_id, future = waiters.popleft()
+                if future.done():
+                    continue
+                global_wait = self._global.wait_time(now)
+                if global_wait > 0:
+                    waiters.appendleft((chat_id, future))
+                    waiters.extendleft(reversed(remaining))
+                    return min(delay, global_wait)
+                chat_wait = self._bucket(chat_id, now).wait_time(now) if chat_id is not None else 0.0
+                if chat_wait > 0:
+                    # Чат исчерпал лимит — пропускаем его, не задерживая остальных
+                    remaining.append((chat_id, future))
+                    delay = min(delay, chat_wait)
+                    continue
+                if chat_id is not None:
+                    self._chats[chat_id].take()
+                self._global.take()
+                self.sent += 1
+                future.set_result(None)
+            self._lanes[lane] = remaining
+        return delay
+
+    def pause(self, chat_id: Any, seconds: float) -> None:
+        """Приостанавливает отправку в чат (или всему боту) после 429"""
+        now = time.monotonic()
+        bucket = self._bucket(chat_id, now) if chat_id is not None else self._global
+        bucket.pause(now, seconds)
+
+    # ---------------------- Подключение ----------------------
+    def install(self, bot: Bot) -> None:
+        """Пропускает отправки бота через планировщик"""
+        bot.session.middleware(SendThrottleMiddleware(self))
+
+    def queue_metrics(self) -> Dict[str, int]:
+        """Глубина очередей по полосам для метрик"""
+        return {LANE_NAMES[lane]: count for lane, count in self.depth().items()}
+
+    def send_metrics(self) -> Dict[str, int]:
+        """Счетчики отправок: сразу, после ожидания в очереди, повторы после 429"""
+        return {'sent': self.sent, 'delayed': self.delayed, 'retried': self.retries}
+
+
+class SendThrottleMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: лимиты отправки и повтор после retry_after"""
+
+    def __init__(self, scheduler: SendScheduler, max_retries: int = SEND_MAX_RETRIES):
+        self.scheduler = scheduler
+        self.max_retries = max_retries
+
+    async def __call__(self, make_request, bot, method):
+        if not method.__api_method__.startswith(LIMITED_PREFIXES):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, 'chat_id', None)
+        for attempt in range(self.max_retries + 1):
+            await self.scheduler.acquire(chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                self.scheduler.retries += 1
+                logger.warning(
+                    f"429 для {method.__api_method__} в чат {chat_id}: пауза {e.retry_after} с")
+                self.scheduler.pause(chat_id, e.retry_after)
+
+
+class SendLaneMiddleware(BaseMiddleware):
+    """Middleware роутера: ответы его обработчиков идут в заданной полосе.
+
+    Флаг обработчика send_lane (flags={"send_lane": LANE_STAFF}) задает
+    полосу для отдельного обработчика роутера со смешанной аудиторией.
+    """
+
+    def __init__(self, lane: Optional[int] = None):
+        self.lane = lane
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        lane = get_flag(data, "send_lane", default=self.lane)
+        if lane is None:
+            return await handler(event, data)
+        with send_lane(lane):
+            return await handler(event, data)
+
+
+send_scheduler = SendScheduler()
@@ -0,0 +1,175 @@
+import asyncio
+import hmac
+import os
+import logging
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+# Общий размер очереди обновлений; при заполнении вебхук отвечает 503,
+# и Telegram повторит доставку позже
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+WEBHOOK_WORKERS = max(1, int(os.getenv("WEBHOOK_WORKERS", "16")))
+# Сколько секунд при остановке дорабатываются уже принятые обновления
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30"))
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def shard_key(data: Dict[str, Any]) -> int:
+    """
+    Ключ очереди для обновления: ID пользователя или чата
+    :param data: JSON обновления Telegram
+    :return: Ключ; обновления с одним ключом обрабатываются по порядку
+    """
+    for value in data.values():
+        if not isinstance(value, dict):
+            continue
+        for field in ('from', 'user', 'chat'):
+            owner = value.get(field)
+            if isinstance(owner, dict) and 'id' in owner:
+                return owner['id']
+        message = value.get('message')
+        if isinstance(message, dict) and isinstance(message.get('chat'), dict):
+            return message['chat']['id']
+    return data.get('update_id', 0)
+
+
+class UpdateQueue:
+    """Ограниченная очередь обновлений с пулом обработчиков.
+
+    Обновления раскладываются по WEBHOOK_WORKERS очередям по ключу
+    пользователя: разные пользователи обрабатываются параллельно, а
+    обновления одного пользователя — строго по порядку, как при
+    long polling (FSM и корзина не увидят гонок одного пользователя).
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot, workers: int = WEBHOOK_WORKERS,
+                 size: int = WEBHOOK_QUEUE_SIZE):
+        self.dp = dp
+        self.bot = bot
+        per_worker = max(1, size // workers)
+        self._queues: List[asyncio.Queue] = [asyncio.Queue(maxsize=per_worker) for _ in range(workers)]
+        self._workers: List[asyncio.Task] = []
+        self.accepted = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+
+    @property
+    def depth(self) -> int:
+        """Количество обновлений в очередях"""
+        return sum(queue.qsize() for queue in self._queues)
+
+    def start(self) -> None:
+        """Запускает обработчиков"""
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._work(queue)) for queue in self._queues]
+
+    def put(self, data: Dict[str, Any]) -> bool:
+        """
+        Ставит обновление в очередь без ожидания
+        :return: False, если очередь пользователя заполнена
+        """
+        queue = self._queues[shard_key(data) % len(self._queues)]
+        try:
+            queue.put_nowait(data)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+    async def _work(self, queue: asyncio.Queue) -> None:
+        while True:
+            data = await queue.get()
+            try:
+                update = Update.model_validate(data, context={"bot": self.bot})
+                await self.dp.feed_update(self.bot, update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Ошибка обработки обновления {data.get('update_id')}: {e}")
+            finally:
+                queue.task_done()
+
+    async def drain(self, timeout: float = WEBHOOK_DRAIN_TIMEOUT) -> bool:
+        """
+        Дожидается обработки принятых обновлений и останавливает обработчиков
+        :return: True, если очередь опустела до истечения timeout
+        """
+        drained = True
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues)), timeout)
+        except asyncio.TimeoutError:
+            drained = False
+            logger.warning(f"Не дождались обработки {self.depth} обновлений при остановке")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        return drained
+
+
+class WebhookServer:
+    """HTTP-сервер вебхука на aiohttp.
+
+    Обработчик запроса только проверяет секрет и кладет JSON в
+    UpdateQueue, поэтому Telegram получает ответ сразу, а обработка
+    идет в пуле обработчиков теми же роутерами, что и при polling.
+    """
+
+    def __init__(self, dp: Dispatcher, bot: Bot, path: str = "/webhook",
+                 secret: Optional[str] = None, queue: Optional[UpdateQueue] = None):
+        self.dp = dp
+        self.bot = bot
+        self.path = path
+        self.secret = secret
+        self.queue = queue or UpdateQueue(dp, bot)
+        self._accepting = False
+        self._runner: Optional[web.AppRunner] = None
+
+    def make_app(self) -> web.Application:
+        """Создает приложение aiohttp с маршрутом вебхука"""
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Принимает обновление от Telegram"""
+        if self.secret and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            return web.Response(status=401)
+        if not self._accepting:
+            return web.Response(status=503)
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        if not self.queue.put(data):
+            return web.Response(status=503)
+        return web.Response()
+
+    async def start(self, host: str, port: int) -> None:
+        """Запускает обработчиков и HTTP-сервер"""
+        self.queue.start()
+        self._accepting = True
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"Вебхук слушает {host}:{port}{self.path}")
+
+    async def stop(self) -> None:
+        """Перестает принимать обновления, дорабатывает очередь и останавливает сервер"""
+        self._accepting = False
+        drained = await self.queue.drain()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        logger.info(
+            f"Вебхук остановлен: обработано {self.queue.processed}, ошибок {self.queue.failed}, "
+            f"отклонено {self.queue.rejected}, очередь {'пуста' if drained else 'не пуста'}")
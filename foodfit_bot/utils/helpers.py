@@ -1,6 +1,6 @@
 import re
 from datetime import datetime
-from typing import Optional, Union, Dict, List
+from typing import Optional, Union, Dict, List, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -132,6 +132,25 @@ def parse_time_input(time_str: str) -> Optional[datetime]:
         return None
 
 
+def parse_date_range(text: str) -> Optional[Tuple[str, str]]:
+    """
+    Парсит период из одной или двух дат
+    :param text: Строка вида "01.05.2024 - 31.05.2024" или "2024-05-01 2024-05-31"
+    :return: (первый день, последний день) в формате "%Y-%m-%d" или None
+    """
+    dates = []
+    for match in re.findall(r'\d{4}-\d{2}-\d{2}|\d{1,2}\.\d{1,2}\.\d{4}', text or ''):
+        try:
+            fmt = "%Y-%m-%d" if '-' in match else "%d.%m.%Y"
+            dates.append(datetime.strptime(match, fmt).date())
+        except ValueError:
+            return None
+    if not 1 <= len(dates) <= 2:
+        return None
+    start, end = min(dates), max(dates)
+    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+
 def calculate_delivery_time(address: str) -> int:
     """
     Рассчитывает примерное время доставки в минутах
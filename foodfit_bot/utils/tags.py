@@ -0,0 +1,62 @@
+import sqlite3
+from typing import List, Optional
+
+# Синонимы приводятся к одному каноническому тегу
+TAG_SYNONYMS = {
+    'vegan': 'веган',
+    'веганское': 'веган',
+    'веганский': 'веган',
+    'gluten free': 'без глютена',
+    'gluten-free': 'без глютена',
+    'острый': 'острое',
+    'острая': 'острое',
+    'spicy': 'острое',
+    'мясное': 'мясо',
+    'мясной': 'мясо',
+    'meat': 'мясо',
+}
+
+# Фильтры меню и соответствующие им канонические теги
+FILTER_TAGS = {
+    'vegan': 'веган',
+    'gluten_free': 'без глютена',
+    'spicy': 'острое',
+    'meat': 'мясо',
+}
+
+
+def normalize_tag(tag: str) -> str:
+    """
+    Приводит тег к каноническому виду
+    :param tag: Тег в том виде, как его ввел администратор
+    :return: Тег в нижнем регистре без лишних пробелов, с учетом синонимов
+    """
+    clean = ' '.join(tag.lower().replace('ё', 'е').split())
+    return TAG_SYNONYMS.get(clean, clean)
+
+
+def parse_tags(text: Optional[str]) -> List[str]:
+    """
+    Разбирает строку тегов через запятую
+    :param text: Строка вида "веган, без глютена"
+    :return: Список уникальных канонических тегов в исходном порядке
+    """
+    if not text:
+        return []
+    tags = []
+    for part in text.split(','):
+        tag = normalize_tag(part)
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+def save_dish_tags(conn: sqlite3.Connection, dish_id: int, text: Optional[str]) -> None:
+    """Перезаписывает связи блюда с тегами в таблице dish_tags"""
+    conn.execute("DELETE FROM dish_tags WHERE dish_id = ?", (dish_id,))
+    for tag in parse_tags(text):
+        conn.execute("INSERT OR IGNORE INTO tags (name) VALUES (?)", (tag,))
+        tag_id = conn.execute("SELECT tag_id FROM tags WHERE name = ?", (tag,)).fetchone()[0]
+        conn.execute(
+            "INSERT OR IGNORE INTO dish_tags (dish_id, tag_id) VALUES (?, ?)",
+            (dish_id, tag_id))